@@ -0,0 +1,229 @@
+"""
+A reproducible benchmark of the game engine, checked against a stored baseline.
+
+Each case plays a fixed number of games between two of the starter decks
+in data/decks, built from the basic card set, with a fixed seed, so every
+run plays exactly the same games. For each case the suite reports:
+
+games_per_sec,turns_per_sec -- the best of several timed runs
+peak_kib_per_game -- the peak memory traced (tracemalloc) while playing a game,
+  above what was in use before it
+retained_blocks_per_turn -- memory blocks still allocated after the games,
+  per turn played. Should be about 0; growth means games are leaking objects
+
+CPython doesn't count allocations, so the memory figures are these two
+measurements rather than an allocation count.
+
+Run it with python benchmark.py. --save_baseline stores the results
+(data/benchmarks/engine_baseline.json by default), and later runs report
+any metric that is worse than the baseline by more than --tolerance and
+exit with status 1. Throughput depends on the machine, so save the
+baseline on the machine the checks run on. --profile also prints where
+the time went (see profiling.py).
+
+python benchmark.py --render times make_game_card on a fixed card with
+each way of drawing outlined text (see make_card_image.add_text_PIL) and
+reports how much the two images differ.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from collections import namedtuple
+from rorschach.code.deck import load_decklist
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.rng import GameRNG
+
+DEFAULT_BASELINE_FP = "../data/benchmarks/engine_baseline.json"
+DECK_DIR = "../data/decks/"
+
+BenchmarkCase = namedtuple("BenchmarkCase",["name","deck_1","deck_2","n_games","seed"])
+
+BENCHMARK_CASES = (
+  BenchmarkCase("bloodmagic_vs_frost_wyrm","Bloodmagic_starter_deck.txt","Frost_Wyrm_starter_deck.txt",200,1),
+  BenchmarkCase("goblins_vs_king_kyber","Goblin_Colonizers_starter_deck.txt","King_Kyber_starter_deck.txt",200,2),
+  BenchmarkCase("frost_wyrm_vs_goblins","Frost_Wyrm_starter_deck.txt","Goblin_Colonizers_starter_deck.txt",200,3),
+)
+
+#For each metric, whether bigger is better
+METRICS = {"games_per_sec":True,"turns_per_sec":True,"peak_kib_per_game":False,"retained_blocks_per_turn":False}
+
+def play_case(case,card_library,decklists,profiler=None):
+    """Play the case's games. Returns the number of turns played"""
+    rng = GameRNG(case.seed)
+    turns = 0
+    for i in range(case.n_games):
+        result = simulate_game(decklists[0],decklists[1],card_library,max_turns=100,\
+          rng=rng.stream(i),profiler=profiler)
+        turns += result.turns
+    return turns
+
+def run_case(case,card_library,repeats=3,profiler=None):
+    """Return a dict of metric name to value for one BenchmarkCase
+
+    repeats -- timed runs; the fastest is reported
+    profiler -- a GameProfiler to time one extra (untimed) run with
+    """
+    decklists = [load_decklist(os.path.join(DECK_DIR,deck)) for deck in (case.deck_1,case.deck_2)]
+    best_seconds = None
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        turns = play_case(case,card_library,decklists)
+        seconds = time.perf_counter() - start_time
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    peak = 0
+    rng = GameRNG(case.seed)
+    for i in range(case.n_games):
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        simulate_game(decklists[0],decklists[1],card_library,max_turns=100,rng=rng.stream(i))
+        peak += tracemalloc.get_traced_memory()[1] - start_memory
+    tracemalloc.stop()
+    gc.collect()
+    retained_blocks = sys.getallocatedblocks() - blocks
+
+    if profiler is not None:
+        play_case(case,card_library,decklists,profiler=profiler)
+
+    return {"games_per_sec":case.n_games/best_seconds,"turns_per_sec":turns/best_seconds,\
+      "peak_kib_per_game":peak/1024/case.n_games,"retained_blocks_per_turn":max(0,retained_blocks)/turns,\
+      "turns":turns}
+
+def run_benchmarks(cases=BENCHMARK_CASES,card_library=None,repeats=3,profiler=None):
+    """Run each case and return a dict of case name to its metrics (see run_case)"""
+    if card_library is None:
+        card_library = load_card_library()
+    return {case.name:run_case(case,card_library,repeats=repeats,profiler=profiler) for case in cases}
+
+def compare_to_baseline(results,baseline,tolerance=0.25):
+    """Return a list of messages, one for each metric worse than baseline by more than tolerance
+
+    tolerance -- the allowed fractional change, e.g. 0.25 allows 25% fewer
+      games/sec. Counts (turns) must match exactly, since the games are seeded
+    retained_blocks_per_turn is allowed up to 1 regardless, as a few blocks
+      (e.g. interned strings) can be kept by the first run of a case
+    """
+    regressions = []
+    for case_name,metrics in results.items():
+        if case_name not in baseline:
+            continue
+        expected = baseline[case_name]
+        if "turns" in expected and metrics["turns"] != expected["turns"]:
+            regressions.append(f"{case_name}: played {metrics['turns']} turns, baseline played "\
+              f"{expected['turns']}. The games are no longer the same")
+        for metric,bigger_is_better in METRICS.items():
+            if metric not in expected:
+                continue
+            value = metrics[metric]
+            limit = expected[metric]*(1 - tolerance) if bigger_is_better else expected[metric]*(1 + tolerance)
+            if metric == "retained_blocks_per_turn":
+                limit = max(limit,1.0)
+            if (bigger_is_better and value < limit) or (not bigger_is_better and value > limit):
+                regressions.append(f"{case_name}: {metric} {value:.2f} (baseline {expected[metric]:.2f})")
+    return regressions
+
+#A card with a portrait in data/images, drawn with a fixed background
+RENDER_CARD = {"title":"Archer","location":"Kingdom of Kyberia","attack":3,"health":1,"cost":3,\
+  "card_text":"Action — Attack Opponent\nRanged","card_type":"Human and Warrior",\
+  "card_portrait_filename":"kingdom_of_kyberia__archer__1.png","card_back_filename":"card_back_Earth-01.jpg"}
+
+def benchmark_card_render(outline_methods=("projection","stroke"),repeats=1):
+    """Time make_game_card on RENDER_CARD with each outline method
+
+    Returns a dict of outline method to seconds per card (best of repeats), plus
+    "mean_pixel_difference" and "changed_pixel_fraction" (pixels that differ by more
+    than 64 in any channel) between the first two methods' images
+    """
+    #Rendering pulls in matplotlib and PIL, so only import it when benchmarking rendering
+    from PIL import Image,ImageChops
+    from rorschach.code.make_card_image import make_game_card
+    results = {}
+    images = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for outline_method in outline_methods:
+            method_dir = os.path.join(output_dir,outline_method)
+            os.makedirs(method_dir)
+            best_seconds = None
+            for i in range(repeats):
+                start_time = time.perf_counter()
+                filename = make_game_card(output_dir=method_dir,outline_method=outline_method,**RENDER_CARD)
+                seconds = time.perf_counter() - start_time
+                if best_seconds is None or seconds < best_seconds:
+                    best_seconds = seconds
+            results[outline_method] = best_seconds
+            location_dir = os.path.join(method_dir,os.listdir(method_dir)[0])
+            with Image.open(os.path.join(location_dir,filename)) as image:
+                images.append(image.convert("RGB"))
+    if len(images) > 1:
+        difference = ImageChops.difference(images[0],images[1])
+        histogram = difference.histogram()
+        n_pixels = images[0].width*images[0].height
+        results["mean_pixel_difference"] = sum(i % 256 * count for i,count in enumerate(histogram))/(3*n_pixels)
+        changed = difference.convert("L").point(lambda value:255 if value > 64 else 0).histogram()[255]
+        results["changed_pixel_fraction"] = changed/n_pixels
+    return results
+
+def load_baseline(filepath=DEFAULT_BASELINE_FP):
+    with open(filepath) as f:
+        return json.load(f)
+
+def save_baseline(results,filepath=DEFAULT_BASELINE_FP):
+    os.makedirs(os.path.dirname(filepath),exist_ok=True)
+    with open(filepath,"w") as f:
+        json.dump(results,f,indent=2,sort_keys=True)
+        f.write("\n")
+
+def format_results(results,delimiter="\t"):
+    """Return the results as a text table, one case per row"""
+    columns = ["case"] + list(METRICS)
+    lines = [delimiter.join(columns)]
+    for case_name,metrics in results.items():
+        lines.append(delimiter.join([case_name]+[f"{metrics[metric]:.2f}" for metric in METRICS]))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    from rorschach.code.profiling import GameProfiler
+    parser = argparse.ArgumentParser(description="Benchmark the game engine against a stored baseline")
+    parser.add_argument("--baseline",default=DEFAULT_BASELINE_FP)
+    parser.add_argument("--save_baseline",action="store_true",help="Store these results as the baseline")
+    parser.add_argument("--tolerance",type=float,default=0.25)
+    parser.add_argument("--repeats",type=int,default=3)
+    parser.add_argument("--profile",action="store_true",help="Also print time per phase, effect and target type")
+    parser.add_argument("--render",action="store_true",\
+      help="Instead, time card rendering with each text outline method")
+    args = parser.parse_args()
+
+    if args.render:
+        render_results = benchmark_card_render(repeats=args.repeats)
+        for name,value in render_results.items():
+            print(f"{name}\t{value:.4f}")
+        print(f"Speedup: {render_results['projection']/render_results['stroke']:.1f}x")
+        sys.exit(0)
+
+    profiler = GameProfiler() if args.profile else None
+    results = run_benchmarks(repeats=args.repeats,profiler=profiler)
+    print(format_results(results))
+    if profiler is not None:
+        print()
+        print(profiler.report())
+    if args.save_baseline:
+        save_baseline(results,args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        regressions = compare_to_baseline(results,load_baseline(args.baseline),tolerance=args.tolerance)
+        for regression in regressions:
+            print("REGRESSION",regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against",args.baseline)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save_baseline to store one")
@@ -0,0 +1,99 @@
+"""
+A player's board: the creatures they have in play.
+"""
+from rorschach.code.zone import Zone
+
+class Board(Zone):
+    """The creatures a player has in play, indexed by static ability, type and damage
+
+    A Board is a Zone (see zone.py), so membership, append and remove are
+    O(1), and it keeps its indexes up to date as creatures enter and
+    leave. Creatures call updateDamaged when their health changes (see
+    Creature.takeDamage and Creature.healDamage).
+
+    Each index is a dict used as an ordered set, so lookups are O(1).
+    Creatures only join the end of the board, so the ability and type
+    indexes are in board order.
+    """
+
+    def __init__(self,creatures=()):
+        Zone.__init__(self)
+        self.reindex()
+        self.extend(creatures)
+
+    def reindex(self):
+        """Rebuild every index from the creatures on the board"""
+        self.ByAbility = {}
+        self.ByType = {}
+        self.Damaged = {}
+        for creature in self.Cards:
+            self.addToIndexes(creature)
+
+    def addToIndexes(self,creature):
+        for ability in creature.StaticAbilities:
+            self.ByAbility.setdefault(ability,{})[creature] = None
+        for creature_type in creature.Types:
+            self.ByType.setdefault(creature_type,{})[creature] = None
+        if creature.isDamaged():
+            self.Damaged[creature] = None
+
+    def removeFromIndexes(self,creature):
+        for ability in creature.StaticAbilities:
+            self.ByAbility[ability].pop(creature,None)
+        for creature_type in creature.Types:
+            self.ByType[creature_type].pop(creature,None)
+        self.Damaged.pop(creature,None)
+
+    def updateDamaged(self,creature):
+        """Update the damaged index after creature's health changes"""
+        if creature not in self.Cards:
+            return
+        if creature.isDamaged():
+            self.Damaged[creature] = None
+        else:
+            self.Damaged.pop(creature,None)
+
+    def append(self,creature):
+        handle = Zone.append(self,creature)
+        self.addToIndexes(creature)
+        return handle
+
+    def remove(self,creature):
+        Zone.remove(self,creature)
+        self.removeFromIndexes(creature)
+        return creature
+
+    def clear(self):
+        Zone.clear(self)
+        self.reindex()
+
+    def hasAbility(self,ability):
+        """Return True if any creature on the board has ability"""
+        return bool(self.ByAbility.get(ability))
+
+    def withAbility(self,ability,excluding=None):
+        """Return a list of creatures with ability, in board order
+        excluding -- leave out creatures that also have this ability
+        """
+        creatures = self.ByAbility.get(ability)
+        if not creatures:
+            return []
+        excluded = self.ByAbility.get(excluding)
+        if not excluded:
+            return list(creatures)
+        return [c for c in creatures if c not in excluded]
+
+    def withoutAbility(self,ability):
+        """Return a list of creatures without ability, in board order"""
+        excluded = self.ByAbility.get(ability)
+        if not excluded:
+            return list(self.Cards)
+        return [c for c in self.Cards if c not in excluded]
+
+    def withType(self,creature_type):
+        """Return a list of creatures of creature_type, in board order"""
+        return list(self.ByType.get(creature_type,()))
+
+    def damaged(self):
+        """Return a list of damaged creatures, in the order they were damaged"""
+        return list(self.Damaged)
@@ -1,154 +1,303 @@
 from random import shuffle,choice
 from collections import deque,defaultdict
-import pandas as pd
 import  ast
-from rorschach.code.make_card_image import make_game_card
 from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name,\
   get_location_dir
 import os
 from os import listdir
+from rorschach.code.tsv import read_tsv
+from rorschach.code.card_art import get_card_image_index
+from rorschach.code.render_cache import cached_game_card
+from rorschach.code.traits import STATIC_ABILITIES,CREATURE_TYPES,FLYING,RANGED,PARASITIC
 from rorschach.code.effect import EffectSet,Effect,DealDamage,Draw,GainManaCrystals,Heal,DiscardRandom
 from rorschach.code.player import Player
+from rorschach.code.profiling import EFFECT,TARGET
 
 class CardSet(object):
     """Represents a set of cards
     """        
-    def __init__(self,set_data_fp,effect_library):
+    def __init__(self,set_data_fp=None,effect_library=None,records=None):
         """A CardSet represents the set of cards that can be in the game
 
         set_data_fp: the path to the .tsv text file holding card data
         effect_library: reference to an EffectSet object defining game effects
+        records: already parsed card data (see read_card_records), used
+          instead of reading set_data_fp (e.g. when loaded from card_cache)
         """
         self.EffectLibrary = effect_library
-        card_data = pd.read_csv(set_data_fp,sep="\t")
-        card_data.dropna(axis=0,how="all", inplace=True) 
-        card_data.dropna(axis=1,how="all", inplace=True) 
-        cards_to_make = list(card_data["card_name"])
-        card_data.set_index("card_name",inplace=True,drop=False)
-        self.CardData = card_data
+        if records is None:
+            records = read_card_records(set_data_fp)
+        self.CardRecords = records
+        cards_to_make = [record["card_name"] for record in records]
+        self.Prototypes = self.makePrototypes(records)
         self.Cards = self.makeCards(cards_to_make) 
 
+    def makePrototypes(self,records):
+        """Compile a CardPrototype for each card record, keyed by card name"""
+        card_makers = {"Creature":Creature,"Spell":Spell}
+        prototypes = {}
+        for card_as_dict in records:
+            card_class = card_makers[card_as_dict["supertype"]]
+            prototype = CardPrototype(card_class=card_class,effect_library=self.EffectLibrary,**card_as_dict)
+            prototypes[prototype.Name] = prototype
+        return prototypes
+
     def makeCards(self,card_names,copies=1):
         """Generate cards of a given type
         card_names: a list of the names of the cards to make
         copies: the number of copies of each card to make 
         """
-
-        #It is the responsibility of each card
-        #maker to colllect any information needed
-        #from a dict representing the textual data in the
-        #data sheet.
-
         cards = []
         for card_name in card_names:
+            prototype = self.getPrototype(card_name)
             for i in range(copies):
-                curr_card = self.makeCard(card_name)
-                cards.append(curr_card)
+                cards.append(prototype.makeCard())
         return cards
 
+    def getPrototype(self,card_name):
+        """Return the CardPrototype for a card name (ignoring surrounding whitespace)"""
+        return self.Prototypes[card_name.strip()]
+
     def makeCard(self,card_name):
         """Generate a card of the given type"""
+        return self.getPrototype(card_name).makeCard()
 
-        card_makers = {"Creature":Creature,"Spell":Spell}
-
-        card_supertype = self.CardData.loc[card_name,"supertype"]
-
-        card_as_dict = self.CardData.loc[card_name,:].to_dict()
+def read_card_records(set_data_fp):
+    """Read a card data .tsv into a list of dicts, one per card
 
+    Empty values are dropped and effect text is parsed, so the records
+    are plain data that can be cached (see card_cache)
+    """
+    records = []
+    for card_as_dict in read_tsv(set_data_fp):
         ##drop empty values:
-        card_as_dict = {k:v for k,v in card_as_dict.items() if (v and not pd.isna(v))}
-        card_as_dict["effect_library"]=self.EffectLibrary
-
-        #Make the card with the appropriate class for its supertype
-        print("ABOUT TO MAKE CARD:",card_as_dict)
-        card = card_makers[card_supertype](**card_as_dict)
-        return card 
- 
-class Card(object):
-    """Superclass for Cards such as Spells and Creatures"""
-    def __init__(self):
-        pass
- 
-    def setUpEffects(self,effect_text,effect_library,numeric_params=["magnitude"]):
-        """Set up effects
+        card_as_dict = {k:v for k,v in card_as_dict.items() if v}
+        if "effects" in card_as_dict:
+            card_as_dict["effects"] = ast.literal_eval(card_as_dict["effects"])
+        records.append(card_as_dict)
+    return records
+
+class CardPrototype(object):
+    """The parsed, shared definition of a card
+
+    A prototype is compiled once per card in a CardSet. Every copy of the card
+    is a small state object (current health, controller, dead flag, effect targets)
+    that points back to its prototype. Prototypes should not be modified once built.
+    """
+    def __init__(self,card_class,card_name,effect_library,supertype="Creature",mana_cost=0,\
+      location="",power=0,toughness=0,effects=None,static_abilities="",behavior=None,\
+      types="",portrait_fp=None,card_back_filename="random",faction=""):
+        """Parse the data for a card
+        card_class -- the Card subclass (e.g. Creature) used for copies of this card
+        card_name -- the name of the card
+        effect_library -- reference to an EffectSet object defining game effects
+        effects -- a dict of effect name: effect params, or its text
+        static_abilities,types -- comma-separated text
+        other arguments match the columns of the card data file
         """
-        self.Effects = []
+        self.CardClass = card_class
+        self.Name = card_name.strip()
+        self.CardType = supertype
+        self.Cost = int(mana_cost)
+        self.Location = location
+        self.Power = int(power)
+        self.Toughness = int(toughness)
+        if behavior is None:
+            behavior = "Attack Random Enemy" if supertype == "Creature" else "Temporary Effect"
+        self.Behavior = behavior
+        #Abilities and types are interned as bitmasks (see traits.py).
+        #Unknown abilities are an error in the card data
+        try:
+            self.Types,self.TypeMask = CREATURE_TYPES.parse(types)
+            self.StaticAbilities,self.AbilityMask = STATIC_ABILITIES.parse(static_abilities)
+        except ValueError as e:
+            raise ValueError(f"{self.Name}: {e}")
+        self.Portrait = portrait_fp
+        self.CardBackFilename = card_back_filename
+        self.Faction = faction
         self.EffectLibrary = effect_library
-        
-        if not effect_text:
-            return False
-        print(f"Setting up effects: {effect_text}")
+        self.EffectTemplates = self.parseEffects(effects)
+        self.CardText = self.makeCardText()
+        #Card art is resolved lazily (see CardImageFilepath), so building
+        #prototypes and cards never touches the filesystem
+        self._CardImageFilepath = None
+
+    def __repr__(self):
+        return f"CardPrototype({self.Name})"
+
+    def parseEffects(self,effects,numeric_params=["magnitude"]):
+        """Parse effects (a dict or its text) into a tuple of (effect name,effect params) templates"""
+        if not effects:
+            return ()
         
         #Effect text should be a dict of effect name: magnitude
-        effect_dict = ast.literal_eval(effect_text)
-        for effect_name,effect_params in effect_dict.items():
+        effect_templates = []
+        if isinstance(effects,str):
+            effects = ast.literal_eval(effects)
+        for effect_name,effect_params in effects.items():
             #effect params are passed on to makeEffect as a kwargs
             #convert numeric params to ints
+            effect_params = dict(effect_params)
             for p in numeric_params:
                 if p in effect_params:
                     effect_params[p] = int(effect_params[p])
-            effect = effect_library.makeEffect(effect_name,**effect_params)
-            self.Effects.append(effect)
-        return True
+            effect_templates.append((effect_name,effect_params))
+        return tuple(effect_templates)
+
+    def makeEffects(self):
+        """Return fresh Effect objects for one copy of this card"""
+        return [self.EffectLibrary.makeEffect(effect_name,**effect_params)\
+          for effect_name,effect_params in self.EffectTemplates]
+
+    def makeCardText(self):
+        """Return the rules text printed on the card"""
+        effect_text = ", ".join([str(effect) for effect in self.makeEffects()])
+        if self.CardType != "Creature":
+            return effect_text
+        return "Action — "+self.Behavior + "\n" + effect_text +"\n " + ", ".join(self.StaticAbilities)
+
+    @property
+    def CardImageFilepath(self):
+        """The path to this card's image, resolved on first access"""
+        if self._CardImageFilepath is None:
+            self._CardImageFilepath = self.makeCardImage()
+        return self._CardImageFilepath
+
+    def makeCardImage(self,card_image_base_dir="../data/images/cards"):
+        """Return the card image filepath, rendering the card if no image with its current
+        stats, text and art exists yet (see render_cache.cached_game_card)"""
+        if self.Types:
+            card_type = " and ".join(self.Types) 
+        else:
+            card_type = self.CardType
+        if self.CardType == "Creature":
+            power,toughness = self.Power,self.Toughness
+        else:
+            power,toughness = None,None
+
+        card_image_dir = get_location_dir(self.Location,\
+          base_dir = card_image_base_dir)
+        card_image_index = get_card_image_index(card_image_dir)
+
+        #The render cache only renders the card if its stats, text or art changed
+        #since its image was made (see render_cache.py). It checks this directory's
+        #in-memory index first, so an up to date card touches no directory listing
+        card_filename = cached_game_card(self.Name,\
+          location = self.Location,\
+          card_back_filename=self.CardBackFilename,\
+          attack=power,health=toughness,\
+          cost=self.Cost,card_text = self.CardText,card_type=card_type,faction=self.Faction,\
+          output_dir=card_image_base_dir)
+        card_image_index.add(card_filename)
+        return card_image_index.filepath(card_filename)
+
+    def makeCard(self,controller=None):
+        """Return a new copy of this card"""
+        return self.CardClass.fromPrototype(self,controller=controller)
+ 
+class Card(object):
+    """Superclass for Cards such as Spells and Creatures"""
+
+    #Attributes that can change during a game. Everything else
+    #comes from the card's prototype
+    StateAttributes = ("Controller",)
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def fromPrototype(cls,prototype,controller=None):
+        """Make a copy of a card from its CardPrototype without re-parsing any card data"""
+        card = cls.__new__(cls)
+        card.setUpFromPrototype(prototype,controller)
+        return card
+
+    def setUpFromPrototype(self,prototype,controller=None):
+        """Point this card at its prototype and set up per-copy state"""
+        self.Prototype = prototype
+        self.Name = prototype.Name
+        self.Cost = prototype.Cost
+        self.CardType = prototype.CardType
+        self.Types = prototype.Types
+        self.TypeMask = prototype.TypeMask
+        self.Behavior = prototype.Behavior
+        self.Location = prototype.Location
+        self.Portrait = prototype.Portrait
+        self.CardBackFilename = prototype.CardBackFilename
+        self.Faction = prototype.Faction
+        self.Effects = prototype.makeEffects()
+        self.setController(controller)
  
+    @property
+    def CardImageFilepath(self):
+        """The path to this card's image (shared by all copies, resolved on first access)"""
+        return self.Prototype.CardImageFilepath
+
+    def getState(self):
+        """Return a dict of this card's mutable state (see StateAttributes)"""
+        attributes = self.__dict__
+        return {k:attributes[k] for k in self.StateAttributes}
+
+    def setState(self,state):
+        """Restore state returned by getState"""
+        self.__dict__.update(state)
+
+    def clone(self,players):
+        """Return a copy of this card that shares its prototype
+        players -- a dict mapping each original Player to its clone
+        """
+        card = object.__new__(self.__class__)
+        card.__dict__ = self.__dict__.copy()
+        if self.Controller is not None:
+            card.Controller = players.get(self.Controller,self.Controller)
+        if self.Effects:
+            card.Effects = [effect.clone(players.get(effect.Controller,effect.Controller))\
+              for effect in self.Effects]
+        return card
+
     def getTargets(self):
         """Get targets for each effect in the card ability, return False if missing targets"""
         required_targets_assigned = True
+        controller = self.Controller
+        events = controller.Game.Events
+        profiler = controller.Game.Profiler
         for effect in self.Effects:
-            for target_type,n_targets in effect.RequiredTargets.items():
-                print("Looking for target of type:",target_type," x",n_targets)        
-                effect.Targets = []                
-                if target_type == "random enemy minion":
-                    targets = self.Controller.getRandomEnemyMinions(n=n_targets)                
-                elif target_type == "all minions":
-                    targets = self.Controller.getAllMinions()
-                elif target_type == "all enemy minions":
-                    targets = self.Controller.getAllEnemyMinions()                
-                elif target_type == "random friendly minion":
-                    targets = self.Controller.getRandomFriendlyMinions(n=n_targets)                
-                elif target_type == "random friendly damaged minions":
-                    targets = self.Controller.getRandomFriendlyDamagedMinions(n=n_targets)
-                elif target_type == "controller":
-                    targets = [effect.Controller]
-                elif target_type == "opponent":
-                    targets = [effect.Controller.Opponent]
-                elif target_type == "all players":
-                    targets = [effect.Controller,effect.Controller.Opponent]
+            for target_type,n_targets,select,has_targets in effect.TargetSelectors:
+                if events.wants("looking for targets"):
+                    events.publish("looking for targets",{"card":self,"target type":target_type,\
+                      "n targets":n_targets})
+                if profiler is None:
+                    targets = select(controller,n_targets)
                 else:
-                    raise NotImplementedError(f"Target type {target_type} is not recognized")
+                    targets = profiler.call(TARGET,target_type,select,controller,n_targets)
                 effect.Targets = targets
                 if not targets:
                     required_targets_assigned = False
         return required_targets_assigned
-       
 
-    def makeCardImage(self,card_back_filename="random",text="",power=None,toughness=None,faction=""):
-        cost = self.Cost  
-        if self.Types:
-            card_type = " and ".join(self.Types) 
-        else:
-            card_type = self.CardType
+    def hasLegalTargets(self,controller=None):
+        """Return True if getTargets would find targets for every effect
 
-        card_name = self.Name
-        card_image_dir = get_location_dir(self.Location,\
-          base_dir = "../data/images/cards")
-        card_filename = filename_from_card_name(self.Name,self.Location)
-
-        if card_filename not in listdir(card_image_dir):
-            card_image_fp = make_game_card(card_name,\
-              location = self.Location,\
-              card_portrait_filename="generate",\
-              card_back_filename=card_back_filename,\
-              attack=power,health=toughness,\
-              cost=cost,card_text = text,card_type=card_type,faction=faction)
-        else:
-            card_image_fp = os.path.join(card_image_dir,card_filename)
-        return card_image_fp
+        Unlike getTargets this changes nothing: no targets are chosen or stored
+        controller -- the Player who would play the card (default: self.Controller)
+        """
+        if controller is None:
+            controller = self.Controller
+        for effect in self.Effects:
+            for target_type,n_targets,select,has_targets in effect.TargetSelectors:
+                if not has_targets(controller,n_targets):
+                    return False
+        return True
 
     def activate(self):
         """Resolve the effects of the card's activated ability"""
-        for i,effect in enumerate(self.Effects):
-            effect.activate()
+        game = self.Controller.Game if self.Controller is not None else None
+        profiler = game.Profiler if game is not None else None
+        for effect in self.Effects:
+            if profiler is None:
+                effect.activate()
+            else:
+                profiler.call(EFFECT,effect.EffectType,effect.activate)
     
     def setController(self,controller):
         """Set the controller of this Spell and its effects"""
@@ -158,14 +307,14 @@ class Card(object):
  
     def hasType(self,card_type):
         """Return True if the creature has a specific creature type"""
-        if card_type in self.Types:
+        if self.TypeMask & CREATURE_TYPES.bit(card_type):
             return True
         else:
             return False            
 
 class Spell(Card):
     def __init__(self,card_name,mana_cost,effects,effect_library,\
-      location="",behavior="Temporary Effect",controller = None,types=[],supertype="Spell",portrait_fp=None,\
+      location="",behavior="Temporary Effect",controller = None,types="",supertype="Spell",portrait_fp=None,\
       card_back_filename="random",faction=""):
         """A Spell 
         card_name -- the name of the card
@@ -173,24 +322,10 @@ class Spell(Card):
         effects -- a list of Effect objects
         """
 
-        self.Name = card_name
-        self.Cost = mana_cost
-        self.CardType = supertype
-        self.Types = types
-        self.Behavior = behavior
-        self.setUpEffects(effects,effect_library)
-        self.setController(controller)
-        self.Portrait = portrait_fp
-        self.Location = location
-        print("Current Location:",location)
-        self.CardBackFilename = card_back_filename
-        self.Faction = faction
-
-        if self.Effects:
-            card_text = ", ".join([str(effect) for effect in self.Effects])
-        else:
-            card_text = ""
-        self.CardImageFilepath = self.makeCardImage(self.CardBackFilename,text=card_text,faction=faction)
+        prototype = CardPrototype(Spell,card_name,effect_library,supertype=supertype,\
+          mana_cost=mana_cost,location=location,effects=effects,behavior=behavior,\
+          types=types,portrait_fp=portrait_fp,card_back_filename=card_back_filename,faction=faction)
+        self.setUpFromPrototype(prototype,controller)
     
     def __repr__(self):
         effects = self.Effects
@@ -228,39 +363,34 @@ class Location(Card):
         self.CardImageFilepath = self.makeCardImage(card_back_filename,text=card_text,power=self.Power,toughness=self.Toughness,faction=self.Faction) 
 
 class Creature(Card):
+
+    StateAttributes = ("Controller","CurrentHealth","Dead","Power","Toughness",\
+      "StaticAbilities","AbilityMask","Influence","Corruption")
+
     def __init__(self,card_name,effect_library,mana_cost=0,location="",\
         power=0,toughness=0,\
         effects="{}",controller=None,static_abilities="",\
         behavior="Attack Random Enemy",supertype="Creature",types="",portrait_fp=None,card_back_filename="random",faction=""):
         """Make a new creature card
         """
-        
-        self.Name = card_name
-        self.Dead = False
-        self.Power = int(power)
-        self.Toughness = int(toughness)
-        self.Controller = controller
-        self.Cost = int(mana_cost)
-        self.CardType = supertype
-        self.Behavior = behavior
-        self.Location = location
+        prototype = CardPrototype(Creature,card_name,effect_library,supertype=supertype,\
+          mana_cost=mana_cost,location=location,power=power,toughness=toughness,\
+          effects=effects,static_abilities=static_abilities,behavior=behavior,types=types,\
+          portrait_fp=portrait_fp,card_back_filename=card_back_filename,faction=faction)
+        self.setUpFromPrototype(prototype,controller)
+
+    def setUpFromPrototype(self,prototype,controller=None):
+        """Set up a creature copy, including its mutable combat state"""
+        Card.setUpFromPrototype(self,prototype,controller)
+        self.Power = prototype.Power
+        self.Toughness = prototype.Toughness
         self.CurrentHealth = self.Toughness
-        self.StaticAbilities = static_abilities.split(",")
-        self.BaseStaticAbilties = self.StaticAbilities
-        self.CardType = supertype 
-        self.Types = types.split(",")
-        self.setUpEffects(effects,effect_library)
-        self.setController(controller)
+        self.Dead = False
+        self.StaticAbilities = prototype.StaticAbilities
+        self.AbilityMask = prototype.AbilityMask
+        self.BaseStaticAbilties = prototype.StaticAbilities
         self.Influence = 0
         self.Corruption = 0
-        self.Faction = faction
-
-        #Set up card image
-        self.Portrait = portrait_fp
-        print("Current Location:",location)
-        self.CardBackFilename = card_back_filename
-        card_text = "Action — "+self.Behavior + "\n" + ", ".join([str(effect) for effect in self.Effects]) +"\n " + ", ".join(self.StaticAbilities)
-        self.CardImageFilepath = self.makeCardImage(card_back_filename,text=card_text,power=self.Power,toughness=self.Toughness,faction=self.Faction)
 
     def __repr__(self):
         if self.checkIfDead():
@@ -289,42 +419,43 @@ class Creature(Card):
     def attack(self,target):
         """Resolve an attack"""
 
-        print(f"{self.Name} attacks {target.Name} for {self.Power} damage")        
+        events = self.Controller.Game.Events
+        if events.wants("creature attacks"):
+            events.publish("creature attacks",{"player":self.Controller,"creature":self,"target":target})
         damage_dealt = self.dealDamage(target,self.Power)
-        print(f"After all abilities are resolved, {target.Name} takes {damage_dealt} damage")
+        if events.wants("attack resolved"):
+            events.publish("attack resolved",{"creature":self,"target":target,"damage":damage_dealt})
         
         #Ranged creatures only suffer damage when defending,
         #and only deal damage when attacking
         if "Creature" in target.CardType and\
-            "Ranged" not in target.StaticAbilities and\
-            "Ranged" not in self.StaticAbilities:
-            print(f"{self.Name} takes {target.Power} damage during its attack")
+            not (target.AbilityMask | self.AbilityMask) & RANGED:
+            if events.wants("counterattack"):
+                events.publish("counterattack",{"creature":self,"target":target,"damage":target.Power})
             target.dealDamage(target=self,amount=target.Power)
-        elif "Ranged" in self.StaticAbilities:
-            print(f"{target.Name} doesn't get a chance to attack back because {self.Name} is Ranged")
+        elif self.AbilityMask & RANGED:
+            if events.wants("ranged attack"):
+                events.publish("ranged attack",{"creature":self,"target":target})
  
-        if "Parasitic" in self.StaticAbilities:
-            print(f"{self.Name} parasitises {target.Name} for {damage_dealt} Health")            
+        if self.AbilityMask & PARASITIC:
+            if events.wants("parasitise"):
+                events.publish("parasitise",{"creature":self,"target":target,"amount":damage_dealt})
             self.healDamage(damage_dealt)
  
     def canAttack(self,target):
         """Return True if it is possible, in general, to attack target"""
 
         if "Player" in target.CardType:
-            print(f"{target.Name} is a player, so {self.Name} can attack it")
             return True
 
         if "Creature" not in target.CardType:
-            print(f"{target.Name} is not a player or creature, so {self.Name} can't attack it")
             return False
         
-        if "Flying" in target.StaticAbilities\
-          and "Flying" not in self.StaticAbilities\
-            and "Ranged" not in self.StaticAbilities:
-            print(f"{target.Name} is Flying, but {self.Name} doesn't have Flying or Ranged, so {self.Name} can't attack it")
+        if target.AbilityMask & FLYING and not self.AbilityMask & (FLYING|RANGED):
+            #Flying targets can only be attacked by Flying or Ranged creatures
             return False
-       
-        print(f"No special rules apply, {self.Name} can attack {target.Name}") 
+
+        #No special rules apply
         return True
  
     def dealDamage(self,target,amount=1,damage_type="physical"):
@@ -342,21 +473,33 @@ class Creature(Card):
         self.CurrentHealth = max(0,self.CurrentHealth)
         if self.checkIfDead():
             self.die()
+        elif self.Controller is not None:
+            self.Controller.Board.updateDamaged(self)
         return damage_taken
 
     def healDamage(self,amount=1):
         """Heal a certain amount of damage"""
         self.CurrentHealth += amount
         self.CurrentHealth = min(self.CurrentHealth,self.Toughness)
+        if self.Controller is not None:
+            self.Controller.Board.updateDamaged(self)
  
     def die(self):
         """Remove the creature"""
         self.Dead = True
-        for i,creature in enumerate(self.Controller.Board):
-                if creature == self:
-                    self.Controller.Board.pop(i)
-                    self.Controller.Game.Interface.report(f"{self.Name} dies","creature dies",{"player":self.Controller,"creature":self})
-                    break #don't kill later copies
+        board = self.Controller.Board
+        if self in board:
+            board.remove(self)
+            events = self.Controller.Game.Events
+            if events.wants("creature dies"):
+                events.publish("creature dies",{"player":self.Controller,"creature":self})
+
+    def revive(self):
+        """Bring a dead creature back at full health, e.g. when it is resurrected"""
+        self.Dead = False
+        self.CurrentHealth = self.Toughness
+        if self.Controller is not None:
+            self.Controller.Board.updateDamaged(self)
     
     def isDamaged(self):
         """Return True if the creature is currently damaged"""
@@ -367,7 +510,7 @@ class Creature(Card):
 
     def hasAbility(self,ability):
         """Return True if the creature has a specified static ability"""
-        if ability in self.StaticAbilities:
+        if self.AbilityMask & STATIC_ABILITIES.bit(ability):
             return True
         else:
             return False
@@ -0,0 +1,123 @@
+"""
+Find existing card images without scanning the disk for every card.
+
+Each card image also has pre-scaled variants (CARD_IMAGE_VARIANTS), so
+the arcade views can load a texture about the size they draw the card at
+rather than the full 825x1125 image (see pick_card_image).
+"""
+import os
+
+#The full size of a rendered card image (see make_card_image.make_game_card)
+CARD_IMAGE_SIZE = (825,1125)
+
+#Pre-scaled copies of every card image, smallest first, as (name, scale of the
+#full size image). The scales are the ones the arcade views draw cards at
+CARD_IMAGE_VARIANTS = (("thumbnail",0.10),("board",0.15),("enlarged",0.25))
+
+class CardImageIndex(object):
+    """An in-memory index of the image files in one card image directory"""
+
+    def __init__(self,directory):
+        """Scan directory once
+        directory -- the directory holding card images for one location
+        """
+        self.Directory = directory
+        self.Filenames = set()
+        if os.path.isdir(directory):
+            self.Filenames.update(os.listdir(directory))
+
+    def __contains__(self,filename):
+        return filename in self.Filenames
+
+    def __len__(self):
+        return len(self.Filenames)
+
+    def add(self,filename):
+        """Record a newly written image file"""
+        self.Filenames.add(filename)
+
+    def filepath(self,filename):
+        """Return the full path to filename in this directory"""
+        return os.path.join(self.Directory,filename)
+
+#One index per directory, built the first time it is needed
+_card_image_indexes = {}
+
+def get_card_image_index(directory):
+    """Return the (cached) CardImageIndex for directory"""
+    index = _card_image_indexes.get(directory)
+    if index is None:
+        index = CardImageIndex(directory)
+        _card_image_indexes[directory] = index
+    return index
+
+def clear_card_image_indexes():
+    """Forget all cached indexes (e.g. after images were changed outside the game)"""
+    _card_image_indexes.clear()
+
+#Card background listings by directory, as (directory mtime, filenames)
+_card_back_lists = {}
+
+def list_card_backs(card_back_dir):
+    """Return the sorted .png and .jpg filenames in card_back_dir (cached until the directory changes)
+
+    The renderer (make_card_image) and the render cache's background pick both
+    list backgrounds here, so they always agree on which backgrounds exist
+    """
+    mtime = os.stat(card_back_dir).st_mtime_ns
+    cached = _card_back_lists.get(card_back_dir)
+    if cached is None or cached[0] != mtime:
+        cached = _card_back_lists[card_back_dir] = \
+          (mtime,sorted(f for f in os.listdir(card_back_dir) if f.endswith(".png") or f.endswith(".jpg")))
+    return cached[1]
+
+def clear_card_back_lists():
+    """Forget all cached card background listings"""
+    _card_back_lists.clear()
+
+def variant_size(scale):
+    """Return the (width,height) in pixels of a card image variant at scale"""
+    return tuple(max(1,int(round(length*scale))) for length in CARD_IMAGE_SIZE)
+
+def variant_filepath(image_fp,variant_name):
+    """Return where a card image's variant is stored: in a subdirectory named after the variant"""
+    directory,filename = os.path.split(image_fp)
+    return os.path.join(directory,variant_name,filename)
+
+def make_card_image_variants(image_fp,variants=CARD_IMAGE_VARIANTS):
+    """Write every variant of the card image at image_fp. Returns their filepaths"""
+    #Only import PIL when images are being made
+    from PIL import Image
+    filepaths = []
+    with Image.open(image_fp) as image:
+        image.load()
+        for variant_name,scale in variants:
+            variant_fp = variant_filepath(image_fp,variant_name)
+            os.makedirs(os.path.dirname(variant_fp),exist_ok=True)
+            #Write under a temporary name and rename, so a half written variant is never loaded
+            temp_fp = f"{variant_fp}.{os.getpid()}.tmp"
+            image.resize(variant_size(scale),Image.LANCZOS).save(temp_fp,format="PNG",compress_level=6)
+            os.replace(temp_fp,variant_fp)
+            filepaths.append(variant_fp)
+    return filepaths
+
+def pick_card_image(image_fp,scale,variants=CARD_IMAGE_VARIANTS):
+    """Return the smallest image of a card that is as big as the card drawn at scale
+
+    Variants rounded down to whole pixels still count (e.g. 82 pixels wide for 0.10)
+
+    image_fp -- the full size card image
+    scale -- how big the card is drawn, relative to the full size image
+
+    Returns (filepath,image_scale), where image_scale is the chosen image's size
+    relative to the full size image, so it should be drawn at scale/image_scale.
+    Falls back to the full size image if no variant is big enough or exists
+    """
+    for variant_name,variant_scale in variants:
+        width,height = variant_size(variant_scale)
+        image_scale = width/CARD_IMAGE_SIZE[0]
+        if image_scale >= scale - 0.001:
+            variant_fp = variant_filepath(image_fp,variant_name)
+            if os.path.exists(variant_fp):
+                return variant_fp,image_scale
+    return image_fp,1.0
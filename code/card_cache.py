@@ -0,0 +1,100 @@
+"""
+A compiled cache of the card set and effect library, for fast startup.
+
+Reading the card and effect .tsv files and running ast.literal_eval on
+every effect and target string dominates startup time for the draft
+screen and for every simulation worker. load_card_set parses the files once and
+pickles the parsed records (see read_card_records and
+read_effect_records) to a cache file named after a hash of the files'
+contents, so the cache is rebuilt automatically whenever either file
+changes. Prototypes are still built from the records on load, so
+abilities and creature types are registered (see traits.py) as usual.
+"""
+import os
+import pickle
+import hashlib
+from rorschach.code.card import CardSet,read_card_records
+from rorschach.code.effect import EffectSet,read_effect_records
+
+#Bump this when the record format changes, so old cache files are ignored
+CACHE_VERSION = 1
+DEFAULT_CARD_DATA_FP = "../data/card_data/basic_card_set.txt"
+DEFAULT_EFFECT_DATA_FP = "../data/effect_data/effect_data.txt"
+
+def source_hash(*filepaths):
+    """Return a hex digest of the cache version and the contents of filepaths"""
+    digest = hashlib.sha256(f"card cache v{CACHE_VERSION}".encode())
+    for filepath in filepaths:
+        with open(filepath,"rb") as f:
+            digest.update(f.read())
+        #Separate files, so moving bytes between them changes the hash
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def cache_filepath(card_data_fp,effect_data_fp,cache_dir=None):
+    """Return the cache file for the current contents of the card and effect data
+
+    cache_dir -- defaults to a cache directory beside the card data's directory
+      (data/cache for data/card_data)
+    """
+    if cache_dir is None:
+        data_dir = os.path.dirname(os.path.dirname(os.path.abspath(card_data_fp)))
+        cache_dir = os.path.join(data_dir,"cache")
+    card_set_name = os.path.splitext(os.path.basename(card_data_fp))[0]
+    digest = source_hash(card_data_fp,effect_data_fp)
+    return os.path.join(cache_dir,f"{card_set_name}.{digest[:16]}.pickle")
+
+def read_records(card_data_fp,effect_data_fp):
+    """Parse the card and effect data files into a dict of records"""
+    return {"cards":read_card_records(card_data_fp),"effects":read_effect_records(effect_data_fp)}
+
+def write_cache(filepath,records):
+    """Write records to filepath, replacing stale cache files for the same card set
+
+    The file is written under a temporary name and then renamed, so other
+    processes never read a partly written cache
+    """
+    cache_dir = os.path.dirname(filepath)
+    os.makedirs(cache_dir,exist_ok=True)
+    temp_filepath = f"{filepath}.{os.getpid()}.tmp"
+    with open(temp_filepath,"wb") as f:
+        pickle.dump(records,f,protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_filepath,filepath)
+    card_set_name = os.path.basename(filepath).split(".")[0]
+    for filename in os.listdir(cache_dir):
+        if filename.startswith(card_set_name+".") and filename.endswith(".pickle") and\
+          os.path.join(cache_dir,filename) != filepath:
+            os.remove(os.path.join(cache_dir,filename))
+
+def load_records(card_data_fp=DEFAULT_CARD_DATA_FP,effect_data_fp=DEFAULT_EFFECT_DATA_FP,\
+  cache_dir=None):
+    """Return parsed card and effect records, from the cache if it is up to date
+
+    If the cache can't be written (e.g. a read-only directory) the
+    records are still returned, just not cached
+    """
+    filepath = cache_filepath(card_data_fp,effect_data_fp,cache_dir=cache_dir)
+    try:
+        with open(filepath,"rb") as f:
+            return pickle.load(f)
+    except (OSError,EOFError,pickle.UnpicklingError):
+        pass
+    records = read_records(card_data_fp,effect_data_fp)
+    try:
+        write_cache(filepath,records)
+    except OSError as e:
+        print(f"Couldn't write card cache {filepath}: {e}")
+    return records
+
+def load_card_set(card_data_fp=DEFAULT_CARD_DATA_FP,effect_data_fp=DEFAULT_EFFECT_DATA_FP,\
+  cache_dir=None,use_cache=True):
+    """Load an EffectSet and the CardSet that uses it, through the cache
+
+    use_cache -- if False, always parse the data files and leave the cache alone
+    """
+    if use_cache:
+        records = load_records(card_data_fp,effect_data_fp,cache_dir=cache_dir)
+    else:
+        records = read_records(card_data_fp,effect_data_fp)
+    effect_library = EffectSet(records=records["effects"])
+    return CardSet(effect_library=effect_library,records=records["cards"])
@@ -0,0 +1,272 @@
+"""
+Card sprites shared by the arcade views.
+
+Each distinct card face (one texture per image file, see
+card_art.pick_card_image) is read from disk once by CardTextures and
+uploaded to one texture atlas that every card SpriteList draws from.
+CardImage sprites come from a CardSpritePool: a view acquires a sprite
+for each card it shows and releases them when it is hidden, so the next
+view reuses them instead of making new ones. Switching between the Map,
+Draft and Game views therefore doesn't read any card PNGs again.
+
+Every copy of a card still gets its own sprite, since copies can be on
+screen in different places at once, but copies share one texture.
+
+CardSpritePool.acquireAsync returns a sprite straight away showing a
+placeholder card back, and CardTextures finds (rendering it first if
+need be) and decodes the card's image on background worker threads.
+Requests with a lower priority number are loaded first. The view calls
+CardTextures.poll from on_update, which swaps finished textures in on
+the main thread, where arcade needs them made.
+"""
+import queue
+import itertools
+import threading
+import arcade
+from rorschach.code.card_art import pick_card_image,variant_size
+
+#The placeholder is drawn at this scale of a full size card (see CardTextures.getPlaceholder)
+PLACEHOLDER_SCALE = 0.25
+PLACEHOLDER_COLOR = (47,79,79,255)
+
+class CardTextures(object):
+    """Card face textures, each loaded from disk once, and the atlas they are drawn from"""
+
+    def __init__(self,atlas_size=(2048,2048),n_workers=2):
+        """
+        atlas_size -- the starting size of the texture atlas. It grows if it fills up
+        n_workers -- background threads loading textures (see requestCard).
+          Started the first time a texture is requested
+        """
+        self.Textures = {}
+        self.AtlasSize = atlas_size
+        self.Atlas = None
+        self.Placeholder = None
+        #Textures read from disk, for checking that views share them
+        self.Loads = 0
+
+        self.NWorkers = n_workers
+        self.Workers = []
+        #(priority,request number,sprite,card,scale) waiting for a worker
+        self.Requests = queue.PriorityQueue()
+        #Loads the workers have finished, waiting for poll
+        self.Loaded = queue.SimpleQueue()
+        self.RequestNumbers = itertools.count()
+
+    def get(self,filepath):
+        """Return the texture for an image file, loading it the first time"""
+        texture = self.Textures.get(filepath)
+        if texture is None:
+            texture = self.Textures[filepath] = arcade.load_texture(filepath,hit_box_algorithm="None")
+            self.Loads += 1
+        return texture
+
+    def getPlaceholder(self):
+        """Return the texture shown until a card's texture is loaded: a plain card back"""
+        if self.Placeholder is None:
+            from PIL import Image,ImageDraw
+            width,height = variant_size(PLACEHOLDER_SCALE)
+            image = Image.new("RGBA",(width,height),PLACEHOLDER_COLOR)
+            ImageDraw.Draw(image).rectangle([(0,0),(width-1,height-1)],outline=(0,0,0,255),width=4)
+            self.Placeholder = arcade.Texture("card placeholder",image=image,hit_box_algorithm="None")
+        return self.Placeholder
+
+    def requestCard(self,sprite,card,scale,priority=0):
+        """Load card's texture for sprite in the background (see poll). Lower priorities load first"""
+        request_number = next(self.RequestNumbers)
+        sprite.LoadRequest = request_number
+        self.Requests.put((priority,request_number,sprite,card,scale))
+        while len(self.Workers) < self.NWorkers:
+            worker = threading.Thread(target=self.work,name="card texture loader",daemon=True)
+            worker.start()
+            self.Workers.append(worker)
+
+    def work(self):
+        """Worker thread: load requested textures until the process exits"""
+        while True:
+            self.loadNext()
+
+    def loadNext(self):
+        """Wait for the next request, find (rendering if need be) and decode its card image
+        and queue the result for poll. Returns False if the request was dropped"""
+        #Only import PIL where images are decoded
+        from PIL import Image
+        priority,request_number,sprite,card,scale = self.Requests.get()
+        if sprite.LoadRequest != request_number:
+            #The sprite was released (and maybe reused) since it was requested
+            return False
+        try:
+            #Rendering holds render_cache's lock, so it is safe alongside the main thread
+            card_image_fp = card.CardImageFilepath
+            texture_fp,texture_scale = pick_card_image(card_image_fp,scale)
+            image = None
+            if texture_fp not in self.Textures:
+                with Image.open(texture_fp) as texture_image:
+                    image = texture_image.convert("RGBA")
+            self.Loaded.put((request_number,sprite,card_image_fp,texture_fp,image,None))
+        except Exception as e:
+            self.Loaded.put((request_number,sprite,None,None,None,e))
+        return True
+
+    def poll(self,max_textures=32):
+        """Show the textures the workers have loaded. Call it every frame, from the main thread
+
+        max_textures -- the most textures to make in one call, so a frame never
+          waits long on them
+
+        Returns the number of sprites updated
+        """
+        updated = 0
+        while updated < max_textures:
+            try:
+                request_number,sprite,card_image_fp,texture_fp,image,error = self.Loaded.get_nowait()
+            except queue.Empty:
+                break
+            if sprite.LoadRequest != request_number:
+                #The sprite was released (and maybe reused) since it was requested
+                continue
+            sprite.LoadRequest = None
+            if error is not None:
+                print(f"Couldn't load the image for {sprite.Card.Name}: {error!r}")
+                continue
+            if texture_fp not in self.Textures and image is not None:
+                self.Textures[texture_fp] = arcade.Texture(texture_fp,image=image,hit_box_algorithm="None")
+                self.Loads += 1
+            sprite.showCardImage(card_image_fp)
+            updated += 1
+        return updated
+
+    def getAtlas(self):
+        """Return the shared TextureAtlas, made the first time (it needs an open window)"""
+        if self.Atlas is None:
+            self.Atlas = arcade.TextureAtlas(self.AtlasSize)
+        return self.Atlas
+
+    def spriteList(self):
+        """Return a new SpriteList for card sprites that draws from the shared atlas"""
+        return arcade.SpriteList(atlas=self.getAtlas())
+
+class CardImage(arcade.Sprite):
+    """ Card sprite """
+
+    def __init__(self, card_image_fp=None, scale=1,card=None,textures=None):
+        """ Card constructor
+
+        card_image_fp -- the full size card image, or None to show a placeholder
+          until showCardImage is called
+        scale -- how big to draw the card, relative to the full size image. The
+          sprite's texture is the smallest pre-scaled variant that is big
+          enough (see card_art.pick_card_image)
+        textures -- the CardTextures to load textures from (default: the shared one)
+        """
+
+        self.CardImage = card_image_fp
+        self.Textures = textures if textures is not None else get_card_sprite_pool().Textures
+        self.Active = True
+        self.Card = None
+        self.setCard(card)
+        #The number of the background load (see CardTextures.requestCard) this sprite waits for
+        self.LoadRequest = None
+        self.CardScale = scale
+        if card_image_fp is None:
+            self.TextureFilepath,texture_scale = None,PLACEHOLDER_SCALE
+            texture = self.Textures.getPlaceholder()
+        else:
+            self.TextureFilepath,texture_scale = pick_card_image(card_image_fp,scale)
+            texture = self.Textures.get(self.TextureFilepath)
+        # Call the parent
+        super().__init__(scale=scale/texture_scale,texture=texture,hit_box_algorithm="None")
+
+    def setCard(self,card):
+        """Show card (a Card, or None) with this sprite"""
+        self.Card = card
+        if self.Card:
+            self.Card.CardImage = self
+
+    def setCardScale(self,scale):
+        """Draw the card at scale (relative to the full size image), switching to a bigger or
+        smaller variant of the image if there is a better fit"""
+        if self.CardImage is None:
+            texture_filepath,texture_scale = None,PLACEHOLDER_SCALE
+            self.texture = self.Textures.getPlaceholder()
+        else:
+            texture_filepath,texture_scale = pick_card_image(self.CardImage,scale)
+            if texture_filepath != self.TextureFilepath:
+                self.texture = self.Textures.get(texture_filepath)
+        self.TextureFilepath = texture_filepath
+        self.CardScale = scale
+        self.scale = scale/texture_scale
+
+    def showCardImage(self,card_image_fp):
+        """Show card image card_image_fp (None for the placeholder) at the current scale"""
+        self.CardImage = card_image_fp
+        self.setCardScale(self.CardScale)
+
+class CardSpritePool(object):
+    """CardImage sprites, handed out to views and taken back to be reused"""
+
+    def __init__(self,textures=None):
+        self.Textures = textures if textures is not None else CardTextures()
+        #Free sprites by full size card image
+        self.Free = {}
+        #Sprites made, for checking that views reuse them
+        self.Made = 0
+
+    def acquire(self,card_image_fp,scale=1,card=None):
+        """Return a CardImage for card_image_fp, reusing a free one if there is one"""
+        free = self.Free.get(card_image_fp)
+        if free:
+            return self.reuse(free.pop(),scale,card)
+        self.Made += 1
+        return CardImage(card_image_fp,scale=scale,card=card,textures=self.Textures)
+
+    def acquireAsync(self,card,scale=1,priority=0):
+        """Return a CardImage for card straight away. It shows a placeholder until its texture
+        has been loaded in the background (see CardTextures.poll)
+
+        priority -- lower numbers are loaded first, e.g. the order cards will be drawn in
+        """
+        #Any free sprite will do, since its texture is replaced anyway
+        free = self.Free.get(None) or next((sprites for sprites in self.Free.values() if sprites),None)
+        if free:
+            sprite = free.pop()
+            sprite.CardImage = None
+            self.reuse(sprite,scale,card)
+        else:
+            self.Made += 1
+            sprite = CardImage(None,scale=scale,card=card,textures=self.Textures)
+        self.Textures.requestCard(sprite,card,scale,priority)
+        return sprite
+
+    def reuse(self,sprite,scale,card):
+        """Reset a free sprite for a new card"""
+        sprite.Active = True
+        sprite.angle = 0
+        sprite.setCard(card)
+        sprite.setCardScale(scale)
+        return sprite
+
+    def release(self,sprite):
+        """Take back a sprite its view no longer shows. It is removed from every SpriteList"""
+        sprite.remove_from_sprite_lists()
+        #Drop any background load still on its way
+        sprite.LoadRequest = None
+        if sprite.Card is not None and getattr(sprite.Card,"CardImage",None) is sprite:
+            sprite.Card.CardImage = None
+        sprite.Card = None
+        self.Free.setdefault(sprite.CardImage,[]).append(sprite)
+
+    def releaseAll(self,sprites):
+        """Take back every sprite in sprites (e.g. everything a view acquired)"""
+        for sprite in list(sprites):
+            self.release(sprite)
+
+#One pool (and so one set of textures) for every view, made the first time it is needed
+_card_sprite_pool = None
+
+def get_card_sprite_pool():
+    """Return the shared CardSpritePool"""
+    global _card_sprite_pool
+    if _card_sprite_pool is None:
+        _card_sprite_pool = CardSpritePool()
+    return _card_sprite_pool
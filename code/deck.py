@@ -1,15 +1,13 @@
 from random import shuffle,choice
 from collections import deque,defaultdict
-import pandas as pd
 import  ast
-from rorschach.code.make_card_image import make_game_card
-from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name,\
-  get_location_dir
 import os
 from os import listdir
+from rorschach.code.tsv import read_tsv
 from rorschach.code.effect import EffectSet,Effect,DealDamage,Draw,GainManaCrystals,Heal,DiscardRandom
 from rorschach.code.player import Player
-from card import Card,Spell,Creature,CardSet
+from rorschach.code.card import Card,Spell,Creature,CardSet
+from rorschach.code.card_cache import load_card_set
 
 class Deck(object):
 
@@ -39,11 +37,18 @@ class Deck(object):
                 curr_card = self.Cards.popleft()
                 drawn_cards.append(curr_card)
              else:
-                print("Out of Cards!")
+                #Out of cards! Player.draw reports this
+                break
         return drawn_cards
 
-    def shuffle(self):
-        shuffle(self.Cards)
+    def shuffle(self,rng=None):
+        """Shuffle the deck
+        rng -- a random.Random (e.g. the Game's GameRNG). Defaults to the random module
+        """
+        if rng is None:
+            shuffle(self.Cards)
+        else:
+            rng.shuffle(self.Cards)
 
     def toDeckList(self):
         cards = defaultdict(int)
@@ -51,6 +56,24 @@ class Deck(object):
             cards[str(card)] +=1
         return "\n".join(["\t".join([str(k),str(cards[k])]) for k in cards.keys()])
 
+def load_decklist(deck_path):
+    """Load a decklist without building any cards
+    deck_path -- path to a .tsv file for the deck
+
+    Returns a list of (card_name,copies) tuples, in file order
+    """
+    return [(row["card_name"],int(row["copies"])) for row in read_tsv(deck_path)]
+
+def build_deck(decklist,card_library):
+    """Build fresh cards for a decklist
+    decklist -- a list of (card_name,copies) tuples (see load_decklist)
+    card_library -- the CardSet used to make the cards
+    """
+    deck = []
+    for card_name,copies in decklist:
+        deck.extend(card_library.makeCards([card_name],copies))
+    return deck
+
 def load_deck(deck_path,card_library):
     """Load a deck
     deck_path -- path to a .tsv file for the deck
@@ -59,21 +82,9 @@ def load_deck(deck_path,card_library):
     all card names *must* be in the card_data file
     """
     print(f"Loading deck from path {deck_path}")
-    decklist = pd.read_csv(deck_path,"\t")
-    card_names=list(decklist["card_name"])
-    decklist.set_index("card_name",inplace=True,drop=False)
-    decklist.dropna(axis=0,how="all", inplace=True)
-    decklist.dropna(axis=1,how="all", inplace=True)
-    print("About to build deck from decklist:",decklist)
-    deck = []
-    print("Unique cards in decklist:",card_names)
-    for card_name in card_names:
-        copies = decklist.loc[card_name,"copies"]
-        print(f"Making {card_name} x{copies}")
-        this_card = card_library.makeCards([card_name],copies)
-        print("Current card:",this_card)
-        deck.extend(this_card)
-        print("Deck:",deck)
+    decklist = load_decklist(deck_path)
+    print("Unique cards in decklist:",[card_name for card_name,copies in decklist])
+    deck = build_deck(decklist,card_library)
     print("Loaded a deck with these cards:",deck)
     return deck
 
@@ -83,8 +94,7 @@ if __name__ == "__main__":
     #Load set data
     card_data_filepath = "../data/card_data/basic_card_set.txt"
     effect_data_filepath = "../data/effect_data/effect_data.txt"
-    basic_effects = EffectSet(effect_data_filepath)
-    basic_cards = CardSet(card_data_filepath,effect_library=basic_effects)
+    basic_cards = load_card_set(card_data_filepath,effect_data_filepath)
 
     #Load decks
     player_1_name = "Player"
@@ -104,6 +114,7 @@ if __name__ == "__main__":
     player_2 = Player(name = player_2_name,deck=player_2_deck)
    
     print("ABOUT TO RUN GAME!!!!!") 
-    #Run game
-    game = Game(player_1,player_2)
+    #Run game (game.py imports this module, so Game is imported here)
+    from rorschach.code.game import Game,GameInterface
+    game = Game(player_1,player_2,game_interface=GameInterface())
     game.runGame() 
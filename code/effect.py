@@ -1,28 +1,29 @@
 from random import shuffle,choice
 from collections import deque,defaultdict
-import pandas as pd
 import  ast
-from rorschach.code.make_card_image import make_game_card
-from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name,\
-  get_location_dir
 import os
 from os import listdir
+from rorschach.code.tsv import read_tsv
+from rorschach.code.targets import compile_target_selectors
 
 class EffectSet(object):
     """Represents the set of effects in the game
     """
-    def __init__(self,set_data_fp):
+    def __init__(self,set_data_fp=None,records=None):
         """A CardSet represents the set of cards that can be in the game
 
         set_data_fp: the path to the .tsv text file holding effect data
+        records: already parsed effect data (see read_effect_records), used
+          instead of reading set_data_fp (e.g. when loaded from card_cache)
         """
-        
-        effect_data = pd.read_csv(set_data_fp,sep="\t")
-        effect_data.dropna(axis=0,how="all", inplace=True) 
-        effect_data.dropna(axis=1,how="all", inplace=True) 
-        effects_to_make = list(effect_data["effect_name"])
-        effect_data.set_index("effect_name",inplace=True,drop=False)
-        self.EffectData = effect_data
+        if records is None:
+            records = read_effect_records(set_data_fp)
+        self.EffectRecords = records
+        effects_to_make = [record["effect_name"] for record in records]
+
+        #Compile each effect's data once, so makeEffect doesn't
+        #need to touch the data file
+        self.EffectTemplates = {record["effect_name"]:record for record in records}
         
         #References to actual objects that handle each type of effect
         self.EffectMakers =\
@@ -52,12 +53,8 @@ class EffectSet(object):
         effect name - base name of the effect (may include {X} placeholders)
         magnitude - the size of the effect (replaces {X})
         """
-        effect_as_dict = self.EffectData.loc[effect_name,:].to_dict()
-
-        ##drop empty values:
-        effect_as_dict = {k:v for k,v in effect_as_dict.items() if (v and not pd.isna(v))}
+        effect_as_dict = dict(self.EffectTemplates[effect_name])
         effect_as_dict.update(kwargs)
-        print("Updated effect as dict:", effect_as_dict)
  
         effect_type = effect_as_dict["effect_type"]
         effect_maker = self.EffectMakers[effect_type]
@@ -65,6 +62,28 @@ class EffectSet(object):
         effect = effect_maker(**effect_as_dict)
         return effect           
 
+def read_effect_records(set_data_fp):
+    """Read an effect data .tsv into a list of dicts, one per effect
+
+    Empty values are dropped and required target types are parsed,
+    so the records are plain data that can be cached (see card_cache)
+    """
+    records = []
+    for effect_as_dict in read_tsv(set_data_fp):
+        ##drop empty values:
+        effect_as_dict = {k:v for k,v in effect_as_dict.items() if v}
+        if "required_target_types" in effect_as_dict:
+            effect_as_dict["required_target_types"] =\
+              parse_required_targets(effect_as_dict["required_target_types"])
+        records.append(effect_as_dict)
+    return records
+
+def parse_required_targets(required_target_types):
+    """Parse required target types (a dict or its string form) into a dict of str:int"""
+    if isinstance(required_target_types,str):
+        required_target_types = ast.literal_eval(required_target_types)
+    return {k:int(v) for k,v in required_target_types.items()}
+
 class Effect(object):
     def __init__(self,effect_name,conditions=None,targets=None,controller=None,magnitude=1,required_target_types=None,effect_type=None,damage_type="physical",narrative_description=""):
         """Represent a game effect
@@ -88,13 +107,23 @@ class Effect(object):
         self.Magnitude = int(magnitude)
         self.DamageType = damage_type
         
-        #Set RequiredTargets as string then 
-        #literal_eval it to get actual data
-        self.RequiredTargets = required_target_types or {}
-        self.RequiredTargets = ast.literal_eval(self.RequiredTargets)
-        self.RequiredTargets = {k:int(v) for k,v in self.RequiredTargets.items()} 
+        #RequiredTargets may arrive pre-parsed from EffectSet.EffectTemplates
+        #or as a string, which is literal_eval'd to get actual data
+        self.RequiredTargets = parse_required_targets(required_target_types or {})
+        #(target_type,n_targets,select,has_targets) for each required target type
+        self.TargetSelectors = compile_target_selectors(self.RequiredTargets)
         self.EffectType = effect_type
 
+    def clone(self,controller=None):
+        """Return a copy of this effect, with no targets, for a cloned card
+        controller -- the (cloned) Player controlling the copy
+        """
+        effect = self.__class__.__new__(self.__class__)
+        effect.__dict__.update(self.__dict__)
+        effect.Targets = []
+        effect.Controller = controller
+        return effect
+
     def getTargetDescriptions(self):
         """get string describing self.RequiredTargets in words"""
         target_descriptions = []
@@ -129,7 +158,6 @@ class Draw(Effect):
     """Targets draw cards"""    
     def activate(self):
         """targets Draw {self.Magnitude} cards"""
-        print("self.Targets:",self.Targets)
         for t in self.Targets:
             t.draw(n_cards=self.Magnitude)
     
@@ -153,7 +181,6 @@ class ResurrectRandomCreatures(Effect):
     def activate(self):
         """target players resurrect self.Magnitude creatures"""
         for player in self.Targets:
-            print(f"Player {player.Name} is about to resurrect {self.Magnitude} random creeatures!") 
             for i in range(self.Magnitude):
                 player.resurrectCreature()
 
@@ -167,7 +194,7 @@ class Heal(Effect):
     def activate(self):
         """Heal {self.Magnitude} damage to targets"""
         for t in self.Targets:
-            t.healDamage(amount=self.Magnitude,damage_type=self.DamageType)
+            t.healDamage(amount=self.Magnitude)
     
     def __repr__(self):
         target_text = self.getTargetDescriptions()
@@ -0,0 +1,111 @@
+"""
+A publish/subscribe bus for game events.
+
+Events are an event type (a short string such as "draw") plus a dict of
+properties. Subscribers opt in by event type. Code that publishes events
+checks EventBus.wants first, so when nobody is listening no event dict
+is built and no text is ever formatted.
+"""
+from collections import defaultdict
+
+class EventBus(object):
+    """Deliver game events to the subscribers that asked for them"""
+
+    def __init__(self):
+        self.Subscribers = defaultdict(list)
+        self.AllEventSubscribers = []
+        self.WantedEventTypes = set()
+
+    def subscribe(self,callback,event_types=None):
+        """Call callback(event_type,props) for each published event
+        event_types -- an iterable of event types to receive. None means every event
+        """
+        if event_types is None:
+            self.AllEventSubscribers.append(callback)
+        else:
+            for event_type in event_types:
+                self.Subscribers[event_type].append(callback)
+                self.WantedEventTypes.add(event_type)
+        return callback
+
+    def unsubscribe(self,callback):
+        """Stop sending events to callback"""
+        if callback in self.AllEventSubscribers:
+            self.AllEventSubscribers.remove(callback)
+        for event_type,callbacks in list(self.Subscribers.items()):
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                del self.Subscribers[event_type]
+                self.WantedEventTypes.discard(event_type)
+
+    def wants(self,event_type):
+        """Return True if any subscriber will receive events of this type"""
+        return bool(self.AllEventSubscribers) or event_type in self.WantedEventTypes
+
+    def publish(self,event_type,props):
+        """Send an event to its subscribers
+        event_type -- a string naming the event (see EVENT_DESCRIPTIONS)
+        props -- a dict of event properties
+        """
+        for callback in self.Subscribers.get(event_type,()):
+            callback(event_type,props)
+        for callback in self.AllEventSubscribers:
+            callback(event_type,props)
+
+def _names(cards):
+    return [c.Name for c in cards]
+
+#Human-readable text for each event type. Only called by
+#subscribers that want text, such as the console
+EVENT_DESCRIPTIONS = {
+  "start of turn":lambda p: f"--- Start of Turn {p['turn']} ---",
+  "player turn":lambda p: "="*20+f"\n-- {p['player'].Name}'s turn! {p['player'].Health} / {p['player'].MaxHealth} --\n"+"="*20,
+  "start of phase":lambda p: f"\n - Phase: {p['player'].Name} {p['new phase']} -",
+  "game over":lambda p: f"{p['winner'].Name} is victorious!" if p['winner'] else "Both players die. Tie game!",
+  "gain mana":lambda p: f"{p['player'].Name} goes up to {p['player'].TotalMana} mana",
+  "draw":lambda p: f"{p['player'].Name} drew {len(p['drawn cards'])}:"+",".join(map(str,p['drawn cards'])),
+  "out of cards":lambda p: f"{p['player'].Name} is out of cards!",
+  "hand":lambda p: f"{p['player'].Name} has the following {len(p['player'].Hand)} cards in hand:\n"+p['player'].handAsStr(delimiter="\n"),
+  "board":lambda p: f"{p['player'].Name}'s Board:\n{p['player'].Board}\n{p['player'].Opponent.Name}'s Board:\n{p['player'].Opponent.Board}",
+  "discard":lambda p: f"{p['player'].Name} discarded {len(p['discarded cards'])}:"+str(_names(p['discarded cards'])),
+  "choose card":lambda p: f"{p['player'].Name} decides to play card: {p['card']}",
+  "cant play card":lambda p: f"{p['player'].Name} can't play {p['card'].Name} - {p['reason']}",
+  "play creature":lambda p: f"{p['player'].Name} plays creature {p['creature'].Name}",
+  "play spell":lambda p: f"{p['player'].Name} plays spell {p['spell'].Name}",
+  "looking for targets":lambda p: f"Looking for target of type: {p['target type']} x{p['n targets']}",
+  "can attack":lambda p: f"{p['creature'].Name} can attack {p['target'].Name} --> {p['can attack']}",
+  "choose attack target":lambda p: f"{p['creature'].Name} chooses randomly from the following targets: {_names(p['targets'])}",
+  "creature attacks":lambda p: f"{p['creature'].Name} attacks {p['target'].Name} for {p['creature'].Power} damage",
+  "attack resolved":lambda p: f"After all abilities are resolved, {p['target'].Name} takes {p['damage']} damage",
+  "counterattack":lambda p: f"{p['creature'].Name} takes {p['damage']} damage during its attack",
+  "ranged attack":lambda p: f"{p['target'].Name} doesn't get a chance to attack back because {p['creature'].Name} is Ranged",
+  "parasitise":lambda p: f"{p['creature'].Name} parasitises {p['target'].Name} for {p['amount']} Health",
+  "creature activates ability":lambda p: f"{p['creature'].Name} is activating its ability: "+",".join([str(e) for e in p['creature'].Effects]),
+  "player damaged":lambda p: f"{p['player'].Name} falls to {p['player'].Health} health",
+  "creature dies":lambda p: f"{p['creature'].Name} dies",
+  "resurrect":lambda p: f"{p['player'].Name} resurrects {p['creature'].Name}",
+  "cant resurrect":lambda p: f"{p['player'].Name} can't resurrect - {p['reason']}",
+}
+
+def describe_event(event_type,props):
+    """Return a human-readable description of an event"""
+    describe = EVENT_DESCRIPTIONS.get(event_type)
+    if describe is None:
+        return f"{event_type}: {props}"
+    return describe(props)
+
+def subscribe_interface(event_bus,interface):
+    """Forward events to an interface's report(free_text,specific_event,specific_event_props) method
+
+    The interface may define EventTypes, the event types it wants (None means all).
+    Text descriptions are only formatted for events the interface receives.
+    Returns the subscribed callback, or None if the interface wants no events.
+    """
+    event_types = getattr(interface,"EventTypes",None)
+    if event_types is not None and not event_types:
+        return None
+
+    def report_event(event_type,props):
+        interface.report(describe_event(event_type,props),event_type,props)
+    return event_bus.subscribe(report_event,event_types)
@@ -1,22 +1,32 @@
 from random import shuffle,choice
-from collections import deque,defaultdict
-import pandas as pd
+from collections import deque,defaultdict,namedtuple
 import  ast
-from rorschach.code.make_card_image import make_game_card
-from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name,\
-  get_location_dir
 import os
 from os import listdir
 from rorschach.code.effect import EffectSet,Effect,DealDamage,Draw,GainManaCrystals,Heal,DiscardRandom
 from rorschach.code.player import Player
-from card import Card,Spell,Creature,CardSet
-from deck import Deck,load_deck
+from rorschach.code.card import Card,Spell,Creature,CardSet
+from rorschach.code.card_cache import load_card_set
+from rorschach.code.deck import Deck,load_deck
+from rorschach.code.events import EventBus,subscribe_interface
+from rorschach.code.traits import FLYING,RANGED
+from rorschach.code.rng import GameRNG
+from rorschach.code.profiling import PHASE
 
 
 
 
 
+#The mutable state of a Game at one moment (see Game.snapshot)
+GameSnapshot = namedtuple("GameSnapshot",["Turn","Winner","PlayerStates","CardStates"])
+
 class GameInterface(object):
+    """Print game events to the console
+
+    EventTypes lists the event types the interface receives (None means all events).
+    """
+    EventTypes = None
+
     def __init__(self):
         pass
 
@@ -27,50 +37,145 @@ class GameInterface(object):
 
 
 class Game(object):
-    def __init__(self,player_1,player_2,game_interface=None):
+    def __init__(self,player_1,player_2,game_interface=None,event_bus=None,rng=None,seed=None,\
+      profiler=None):
+        """Set up a game between two players
+        game_interface -- an object with a report(free_text,specific_event,specific_event_props)
+          method that is subscribed to game events, e.g. GameInterface() to print them.
+          None (the default) subscribes nothing, so no event text is ever formatted
+        event_bus -- the EventBus game events are published on (a new one by default)
+        rng -- the GameRNG every random choice in the game is drawn from
+        seed -- seed for a new GameRNG, if rng isn't given. The same decks and
+          seed replay the same game (see rng.py)
+        profiler -- a profiling.GameProfiler to time phases, effects and targeting with
+        """
+        self.RNG = rng if rng is not None else GameRNG(seed)
+        self.Profiler = profiler
         self.Player1 = player_1
         self.Player2 = player_2
         self.Player1.Game = self
         self.Player2.Game = self        
+        self.Events = event_bus
+        if self.Events is None:
+            self.Events = EventBus()
         self.Interface = game_interface
-        if self.Interface == None:
-            self.Interface = GameInterface()
+        if self.Interface is not None:
+            subscribe_interface(self.Events,self.Interface)
        
         self.Player1.Opponent = self.Player2
         self.Player2.Opponent = self.Player1
 
         #Shuffle cards
-        self.Player1.Deck.shuffle()
-        self.Player2.Deck.shuffle()
+        self.Player1.Deck.shuffle(self.RNG)
+        self.Player2.Deck.shuffle(self.RNG)
 
         self.PlayOrder = [self.Player1,self.Player2]
         self.Phases = ["Gain Mana","Refresh Mana","Draw","Start of Turn",\
           "Action","Play","End of Turn"]
         self.Winner = None
+        self.Turn = 0
+
+    def snapshot(self):
+        """Return a GameSnapshot of the game's mutable state, for restore()
+
+        Only health, mana, zone contents (including deck order) and per-card state
+        are saved. The RNG isn't, so a restored game doesn't repeat its random
+        choices. Card prototypes, effect libraries and images are shared, not copied.
+
+        restore() is the cheap way back to a position (tens of microseconds for
+        a mid-game position), so search takes one snapshot and restores it
+        before every rollout rather than cloning the game each time.
+        """
+        player_states = tuple(player.getState() for player in self.PlayOrder)
+        card_states = tuple((card,card.getState()) for player in self.PlayOrder\
+          for card in player.allCards())
+        return GameSnapshot(self.Turn,self.Winner,player_states,card_states)
+
+    def restore(self,snapshot):
+        """Return the game to the state saved by snapshot()"""
+        self.Turn = snapshot.Turn
+        self.Winner = snapshot.Winner
+        #Cards first, so each Board reindexes restored creatures
+        for card,card_state in snapshot.CardStates:
+            card.setState(card_state)
+        for player,player_state in zip(self.PlayOrder,snapshot.PlayerStates):
+            player.setState(player_state)
+
+    def clone(self):
+        """Return an independent copy of the game for search or simulation
+
+        The copy gets new Player and card objects holding only mutable state;
+        card prototypes (and everything they reference) are shared. The copy
+        publishes events to its own, empty EventBus and has no interface,
+        so it never reports anything. (copy.deepcopy would also copy the
+        EffectSet, card images and everything reachable from them.)
+
+        Every card is copied, so a clone costs several times a restore(). Search
+        (see policy.MCTSPolicy.search) clones once per search and then uses
+        snapshot/restore for each rollout, so clone isn't on its hot path.
+        """
+        game = self.__class__.__new__(self.__class__)
+        game.__dict__.update(self.__dict__)
+        game.Events = EventBus()
+        game.Interface = None
+        game.Profiler = None
+        #The copy draws from its own stream, so using it never changes this game's numbers
+        game.RNG = self.RNG.split()
+        players = {player:player.clone(game) for player in self.PlayOrder}
+        for original,player in players.items():
+            player.copyZones(original,players)
+        game.Player1 = players[self.Player1]
+        game.Player2 = players[self.Player2]
+        game.PlayOrder = [players[player] for player in self.PlayOrder]
+        game.Winner = players.get(self.Winner)
+        return game
 
     def takeTurn(self,player):
-        print("="*20)
-        print(f"-- {player.Name}'s turn! {player.Health} / {player.MaxHealth} --")
-        print("="*20)
-        for phase in self.Phases:
-            self.doPhase(player,phase)    
+        if self.Events.wants("player turn"):
+            self.Events.publish("player turn",{"player":player})
+        profiler = self.Profiler
+        if profiler is None:
+            for phase in self.Phases:
+                self.doPhase(player,phase)
+        else:
+            for phase in self.Phases:
+                profiler.call(PHASE,phase,self.doPhase,player,phase)
 
-    def runGame(self,wait_for_input=True):
+    def finishTurn(self,player,after_phase):
+        """Finish the current turn from partway through player's turn
+
+        Runs player's phases after after_phase, then the turns of any players
+        still to go this turn. runGame can then carry on with the next turn.
+        """
+        for phase in self.Phases[self.Phases.index(after_phase)+1:]:
+            self.doPhase(player,phase)
+        for next_player in self.PlayOrder[self.PlayOrder.index(player)+1:]:
+            self.takeTurn(next_player)
+
+    def runGame(self,wait_for_input=True,max_turns=None):
         """Run the game
 
         wait_for_input -- wait to show each turn until player
           responds to input prompt
+        max_turns -- stop after this many turns (a tie, with no Winner) 
+          if neither player has lost yet. None means play until a player loses
         """
         player1 = self.Player1
         player2 = self.Player2
-        turn = 0
         while player1.Health > 0 and player2.Health >0:
-            turn += 1
-            print(f"--- Start of Turn {turn} ---")
+            if max_turns is not None and self.Turn >= max_turns:
+                break
+            self.Turn += 1
+            #Each turn's random choices come from their own jump of the RNG, so a
+            #game can be restarted at any turn from its seed (see replay.py)
+            self.RNG.jumpTo(self.Turn)
+            if self.Events.wants("start of turn"):
+                self.Events.publish("start of turn",{"turn":self.Turn})
         
             for player in self.PlayOrder:
                 self.takeTurn(player)
-                input("Ready to move on?")
+                if wait_for_input:
+                    input("Ready to move on?")
        
         self.Winner = self.checkForLoss(player1,player2)        
         return self.Winner
@@ -79,17 +184,20 @@ class Game(object):
     def checkForLoss(self,player1,player2):
         """Check if a player lost, or return None if game is ongoing"""
         if player1.Health <= 0 and player2.Health <=0:
-            print("Both players die. Tie game!")
+            pass
         elif player1.Health <=0:
-            print(f"{player2.Name} is victorious!")
             self.Winner = player2
         elif player2.Health <=0:
-            print(f"{player1.Name} is victorious!")
             self.Winner = player1
+        else:
+            return self.Winner
+        if self.Events.wants("game over"):
+            self.Events.publish("game over",{"winner":self.Winner})
         return self.Winner
 
     def doPhase(self,player,phase):
-        self.Interface.report(f"\n - Phase: {player.Name} {phase} -","start of phase",{"new phase":phase}) 
+        if self.Events.wants("start of phase"):
+            self.Events.publish("start of phase",{"player":player,"new phase":phase}) 
         if phase == "Gain Mana":
             player.gainTotalMana(amount=1)
         
@@ -98,9 +206,8 @@ class Game(object):
         
         if phase == "Draw":
             player.draw()
-            hand = player.handAsStr(delimiter="\n")
-            hand_size = len(player.Hand)
-            print(f"{player.Name} has the following {hand_size} cards in hand:\n{hand}")
+            if self.Events.wants("hand"):
+                self.Events.publish("hand",{"player":player})
 
         if phase == "Play":
             self.playPhase(player)
@@ -110,66 +217,63 @@ class Game(object):
            
     def actionPhase(self,player):
         """Take actions"""
-        print(f"{player.Name}'s Board:\n{player.Board}")
-        print(f"{player.Opponent.Name}'s Board:\n{player.Opponent.Board}")
-        for creature in player.Board:
-            if creature is None:
+        events = self.Events
+        if events.wants("board"):
+            events.publish("board",{"player":player})
+        enemy_board = player.Opponent.Board
+        #Iterate over a copy: creatures can die (and leave the board) mid-phase
+        for creature in list(player.Board):
+            if creature is None or creature.Dead:
                 continue
             
             if creature.Behavior == "Attack Random Enemy":
-                attacker_ranged = False
-                attacker_flying = False
-
-                if "Flying" in creature.StaticAbilities:
-                    attacker_flying = True
-                if "Ranged" in creature.StaticAbilities:
-                    attacker_ranged = True
+                attacker_ranged = creature.AbilityMask & RANGED
+                #Flying targets can only be attacked by Flying or Ranged creatures
+                attacker_reaches_flying = creature.AbilityMask & (FLYING|RANGED)
 
                 #first check to see if any creatures have Defender
-                targets_with_defender =\
-                  player.Opponent.filter(player.Opponent.Board,positive_filter_method_name="hasAbility",\
-                  positive_filter_kwargs={"ability":"Defend"})
-                
                 targets = []
-                if targets_with_defender and not attacker_ranged:
-                    print("Some enemies have defender and attacker is not ranged ... it must target a creature with defender")
-                    targets = targets_with_defender
-                    targets = [t for t in targets if creature.canAttack(t)]
-                    if not targets:
-                        print("Couldn't attack any enemies with Defender")
+                if not attacker_ranged and enemy_board.hasAbility("Defend"):
+                    #Some enemies have defender and attacker is not ranged ... it must target a creature with defender
+                    if attacker_reaches_flying:
+                        targets = enemy_board.withAbility("Defend")
+                    else:
+                        targets = enemy_board.withAbility("Defend",excluding="Flying")
                 #If we didn't resolve Defend abilities
                 #or no Defenders can be attacked, pick a random target we can attack
                 if not targets:
-                      
-                     targets = [player.Opponent]
-                     for possible_target in player.Opponent.Board:
-                        can_attack = creature.canAttack(possible_target)
-                        print(f"{creature.Name} can attack {possible_target.Name} --> {can_attack}")
-                        if can_attack:
-                            targets.append(possible_target)
+                    targets = [player.Opponent]
+                    if attacker_reaches_flying:
+                        targets.extend(enemy_board)
+                    else:
+                        targets.extend(enemy_board.withoutAbility("Flying"))
+                    if events.wants("can attack"):
+                        for possible_target in enemy_board:
+                            events.publish("can attack",{"creature":creature,"target":possible_target,\
+                              "can attack":creature.canAttack(possible_target)})
                 
                 if targets:
-                    print(f"Choosing randomly from the following targets: {[t.Name for t in targets]}")
-                    target = choice(targets)
+                    if events.wants("choose attack target"):
+                        events.publish("choose attack target",{"creature":creature,"targets":targets})
+                    target = self.RNG.choice(targets)
                     creature.attack(target)
 
             elif creature.Behavior == "Attack Opponent":
-                #first check to see if any creatures have Defender
-                targets_with_defender =\
-                  player.Opponent.filter(player.Board,positive_filter_method_name="hasAbility",\
-                  positive_filter_kwargs={"ability":"Defend"})
+                #Enemy creatures with Defend must be attacked first. (This used to check the
+                #attacker's own board, so an Attack Opponent creature hit its own Defenders)
+                targets_with_defender = enemy_board.withAbility("Defend")
                 if targets_with_defender:
-                    target = choice(targets_with_defender)
+                    target = self.RNG.choice(targets_with_defender)
                 else:
                     target = player.Opponent
-                self.Interface.report(f"{creature.Name} attacks {target.Name} for {creature.Power} damage","creature attacks",\
-                  {"player":player,"creature":creature,"target":target})
+                if events.wants("creature attacks"):
+                    events.publish("creature attacks",{"player":player,"creature":creature,"target":target})
                 target.takeDamage(creature.Power) 
             elif creature.Behavior == "Defend":
                 pass
             elif creature.Behavior == "Activate":
-                self.Interface.Report(f"{creature.Name} is activating it's ability",\
-                  "creature activates ability:"+",".join([str(e) for e in creature.Effects]),{"player":player,"creature":creature})
+                if events.wants("creature activates ability"):
+                    events.publish("creature activates ability",{"player":player,"creature":creature})
                 for e in creature.Effects:
                     e.Controller = creature.Controller
                 
@@ -179,19 +283,32 @@ class Game(object):
 
     def playPhase(self,player):
         """Do a play phase
-        For now players will play the highest cost card possible
+        The player's Policy chooses cards to play until it returns None
         """
-        highest_cost_card = player.highestCostPlayableCard()
-        print("Highest cost card:",highest_cost_card)
-        while highest_cost_card:
-            print("Player decides to play card:",highest_cost_card)     
-            player.playCard(highest_cost_card)
-            highest_cost_card = player.highestCostPlayableCard()
-            if highest_cost_card is None:
-                break
-        
-        print(f"{player.Name}'s Board:\n{player.Board}")
-        print(f"{player.Opponent.Name}'s Board:\n{player.Opponent.Board}")
+        card = player.Policy.chooseCard(self,player)
+        while self.playChosenCard(player,card):
+            card = player.Policy.chooseCard(self,player)
+        self.endPlayPhase(player)
+
+    def playChosenCard(self,player,card):
+        """Play a card player's Policy chose during the Play phase
+
+        Returns True if the policy should be asked for another card, or False
+        if the phase is over (the policy chose None, or the card couldn't be
+        played). The game view uses this and endPlayPhase to ask the policy
+        off the main thread (see run_game.GameView)
+        """
+        if card is None:
+            return False
+        if self.Events.wants("choose card"):
+            self.Events.publish("choose card",{"player":player,"card":card})
+        player.playCard(card)
+        #If the card couldn't be played, stop rather than ask forever
+        return card not in player.Hand
+
+    def endPlayPhase(self,player):
+        if self.Events.wants("board"):
+            self.Events.publish("board",{"player":player})
 
 if __name__ == "__main__":
     #Demo how to set up a game
@@ -199,8 +316,7 @@ if __name__ == "__main__":
     #Load set data
     card_data_filepath = "../data/card_data/basic_card_set.txt"
     effect_data_filepath = "../data/effect_data/effect_data.txt"
-    basic_effects = EffectSet(effect_data_filepath)
-    basic_cards = CardSet(card_data_filepath,effect_library=basic_effects)
+    basic_cards = load_card_set(card_data_filepath,effect_data_filepath)
 
     #Load decks
     player_1_name = "Player"
@@ -221,5 +337,5 @@ if __name__ == "__main__":
    
     print("ABOUT TO RUN GAME!!!!!") 
     #Run game
-    game = Game(player_1,player_2)
+    game = Game(player_1,player_2,game_interface=GameInterface())
     game.runGame() 
@@ -1,8 +1,3 @@
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-import pandas as pd
 import time
 from random import randint
 import urllib
@@ -129,6 +124,12 @@ def get_card_portrait_image(card_name,location,artist="",epithet="Amazing",\
    card_type="Character",art_type= "Fantasy Card Art",card_portrait_dir = "../images/card_portraits/",max_images=3,\
    card_text = "",faction=""):
 
+    #selenium is only needed for scraping, so the filename helpers
+    #above can be imported without it
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.options import Options
+
     location_dir_fp = get_location_dir(location,card_portrait_dir)
   
     img_description = get_prompt(card_name,location=location,artist=artist,\
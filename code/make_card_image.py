@@ -13,9 +13,93 @@ from PIL import Image, ImageFont, ImageDraw, ImageOps,\
    ImageFilter,ImageEnhance
 
 from rorschach.code.get_card_portrait import filename_from_card_name,dir_from_location_name,get_location_dir,get_card_portrait_image
+from rorschach.code.card_art import list_card_backs,clear_card_back_lists
 import textwrap
+from collections import namedtuple
+
+#Decoded assets shared by every make_game_card call in this process, so a batch
+#render decodes, sizes and blurs each background and loads each font only once.
+#Keys include the file's mtime, so an edited file is loaded again
+BACKGROUND_CACHE_SIZE = 16
+_background_layers = {}
+_fonts = {}
+_default_font_fp = None
+
+#A card background ready to draw on. card is the framed, blurred card; the boxes
+#are brightened patches of its blurrier centre. Treat them as read only (copy card)
+BackgroundLayers = namedtuple("BackgroundLayers",["card","title_box","text_box","type_box"])
+
+def get_font(font_fp=None,fontsize=30):
+    """Return the (cached) FreeTypeFont for font_fp at fontsize. font_fp defaults to DejaVu Sans"""
+    global _default_font_fp
+    if not font_fp:
+        if _default_font_fp is None:
+            _default_font_fp = matplotlib.font_manager.fontManager.findfont('DejaVu Sans')
+        font_fp = _default_font_fp
+    key = (font_fp,fontsize)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = ImageFont.truetype(font_fp,fontsize)
+    return font
+
+def get_background_layers(card_back_fp,width,height,margin):
+    """Return the BackgroundLayers for a card back, making them if they aren't cached
+
+    The BACKGROUND_CACHE_SIZE most recently used backgrounds are kept
+    """
+    key = (card_back_fp,os.stat(card_back_fp).st_mtime_ns,width,height,margin)
+    layers = _background_layers.pop(key,None)
+    if layers is None:
+        layers = make_background_layers(card_back_fp,width,height,margin)
+        while len(_background_layers) >= BACKGROUND_CACHE_SIZE:
+            del _background_layers[next(iter(_background_layers))]
+    #Most recently used last
+    _background_layers[key] = layers
+    return layers
+
+def clear_asset_caches():
+    """Forget every cached background, font and card back listing"""
+    _background_layers.clear()
+    _fonts.clear()
+    clear_card_back_lists()
+
+def make_background_layers(card_back_fp,width,height,margin):
+    """Return the BackgroundLayers for a card back (see get_background_layers)"""
+    box_indent = int(margin*1/2)
+    portrait_width = int(width - margin * 2)
+
+    #Open the card back file
+    with Image.open(card_back_fp) as card_back:
+        #Avoid weird rotations after saving due to camera EXIF data
+        card_image = ImageOps.exif_transpose(card_back)
+
+        #Scale to card size
+        card_image = card_image.resize((width,height))
 
-def add_text_PIL(original_image,text,x,y,fontsize=30,font_fp=None,color=(0,0,0),outline=4,outline_points=50,    outline_color = (255,255,255),anchor = "la",wrap= True,max_chars_per_line:int=40):
+    #Add outer frame
+    artist = ImageDraw.Draw(card_image)
+    artist.rectangle([(0,0),(width,height)], fill=None,\
+      outline='black',width = int(margin/8))
+
+    #Blur the background
+    card_image = card_image.filter(ImageFilter.BoxBlur(5))
+
+    #Paste an even blurrier central image
+    card_image_center = card_image.resize((width-margin,height-margin))
+    card_image_center = card_image_center.filter(ImageFilter.BoxBlur(20))
+    card_image.paste(card_image_center,(int(margin/2),int(margin/2)))
+
+    #Brightened boxes for the title, game text and card type
+    title_box = adjust_image(card_image_center.resize((portrait_width+box_indent*2,margin*2)),\
+      contrast=0.3,color=0.8,brightness = 1.8)
+    text_box = adjust_image(card_image_center.resize((width - box_indent*2,margin*3+box_indent+\
+      int(box_indent*1/2)+int(box_indent*1/8))),contrast=0.3,color=0.8,brightness = 1.8)
+    type_box = adjust_image(card_image_center.resize((portrait_width-box_indent*2,margin)),\
+      contrast=0.3,color=0.8,brightness = 1.8)
+    return BackgroundLayers(card_image,title_box,text_box,type_box)
+
+def add_text_PIL(original_image,text,x,y,fontsize=30,font_fp=None,color=(0,0,0),outline=4,outline_points=50,    outline_color = (255,255,255),anchor = "la",wrap= True,max_chars_per_line:int=40,\
+  outline_method="stroke"):
     """
     Use the Python Image Library (PIL) to add text to an image
     original_image -- a PIL Image object
@@ -26,19 +110,19 @@ def add_text_PIL(original_image,text,x,y,fontsize=30,font_fp=None,color=(0,0,0),
     font_fp -- the path to the location of the font file to be used for the text (e.g. a .ttf file)
     color -- text color in RGB
     outline -- how large of an outline, if any, to draw around the text
-    outline_points -- outline is approximated by projecting text in various directions. 
-      This parameter controls how many projections are made (e.g. the quality of the outline)
+    outline_points -- for outline_method="projection", how many copies of the text are
+      drawn around it to approximate the outline (e.g. the quality of the outline)
     anchor -- where in the text the x and y coordinates will be anchored. 'la' = left ascender, 'ra' = right ascender
     wrap -- if True, wrap text into multiple lines 
     max_chars_per_line -- maximum number of characters on each line
+    outline_method -- "stroke" draws the text once with a stroke of width outline
+      (FreeType strokes the glyphs). "projection" is the old method: the text is drawn
+      outline*outline_points times in a circle around (x,y), which looks the same but
+      is far slower. Kept for comparison (see benchmark.py --render)
 
     """   
-    if not font_fp:
-        font_fp = matplotlib.font_manager.fontManager.findfont('DejaVu Sans')
-
-    font_format = ImageFont.truetype(font_fp,fontsize)
+    font_format = get_font(font_fp,fontsize)
     artist = ImageDraw.Draw(original_image)
-    print(type(artist))
     #Have to figure out wrapping before drawing outline (in any)
     if wrap:
         text = ",\n".join(text.split(", "))
@@ -49,6 +133,11 @@ def add_text_PIL(original_image,text,x,y,fontsize=30,font_fp=None,color=(0,0,0),
     #TODO: really neat trick for getting pixel size of text to incorporate
     #https://stackoverflow.com/questions/43730389/correctly-centring-text-pil-pillow
     
+    if outline and outline_method == "stroke":
+        #The stroke is drawn behind the text in the same call
+        return artist.text((x,y),text,color,font=font_format,anchor=anchor,\
+          stroke_width=outline,stroke_fill=outline_color)
+
     #Draw outline before actual text, so it's behind the text
     #This solution is from  Esca Latam on StackOverflow: https://stackoverflow.com/a/61853042/17566480
     if outline: 
@@ -80,11 +169,16 @@ def adjust_image(source_image,contrast = 1.0,brightness = 1.0, color=1.0):
 def make_game_card(title:str,location:str,attack:int=None,health:int=None,cost:int=1,\
   card_text:str = "",card_type:str="",card_portrait_filename:str="generate",card_back_filename:str="random",\
   base_card_portrait_dir:str="../data/images/card_portraits/",card_back_dir:str = "../data/images/card_backgrounds",
-  output_dir:str="../data/images/cards/",faction="") -> str:
+  output_dir:str="../data/images/cards/",faction="",rng=None,outline_method="stroke") -> str:
     """Make a game card image by superimposing a cardback image with a generated portrait and text
 
+    rng -- a random.Random (e.g. a GameRNG) for the random card back and portrait.
+      Defaults to the random module
+    outline_method -- how text outlines are drawn (see add_text_PIL)
+
     Returns: location of generated image file
     """
+    pick = rng.choice if rng is not None else choice
     #set up image parameters
     width = 825
     height = 1125
@@ -117,46 +211,22 @@ def make_game_card(title:str,location:str,attack:int=None,health:int=None,cost:i
 
     card_text_height = portrait_location[1]+portrait_height + int(margin*1/3)
 
-    card_backs = [f for f in listdir(card_back_dir) if f.endswith(".png") or f.endswith(".jpg")]
+    card_backs = list_card_backs(card_back_dir)
     
     if card_back_filename == "random":
         #Load a random card back from card_back_dir
-        card_back_filename= choice(card_backs)
+        card_back_filename= pick(card_backs)
         print("Picked card back:",card_back_filename)
     elif card_back_filename not in card_backs:
         raise ValueError(f"Couldn't find card back {card_back}. Valid option are: {card_backs}")
 
     card_back_fp = join(card_back_dir,card_back_filename)
 
-    #Open the card back file
-    card_back = Image.open(card_back_fp)
-        
-    card_image = card_back.copy()
-
-    #Avoid weird rotations after saving due to camera EXIF data
-    card_image = ImageOps.exif_transpose(card_image)
+    #The framed, blurred background (and its text boxes) are the same for every
+    #card drawn on this card back, so they are made once and cached
+    background = get_background_layers(card_back_fp,width,height,margin)
+    card_image = background.card.copy()
 
-    #Scale to card size
-    card_image = card_image.resize((width,height))
-
-    #Add outer frame
-    artist = ImageDraw.Draw(card_image)
-    artist.rectangle([(0,0),(width,height)], fill=None,\
-      outline='black',width = int(margin/8))
-
-    #Blur the background
-    bluriness = 5
-    card_image = card_image.filter(ImageFilter.BoxBlur(5))
-
-    #Paste an even blurrier central image
-    card_image_center = card_image.resize((width-margin,height-margin))
-    bluriness = 5
-    card_image_center = card_image_center.filter(ImageFilter.BoxBlur(20))
-    
-    #Paste the card portrait onto the card template
-    card_image.paste(card_image_center,(int(margin/2),int(margin/2)))
-
-    
     #If a location was passed, the code assumes portraits will be stored
     #in a subfolder for that location e.g. ../data/images/card_portraits/the_swamp_of_madness/    
     if location:
@@ -181,7 +251,7 @@ def make_game_card(title:str,location:str,attack:int=None,health:int=None,cost:i
               card_type=card_type,card_portrait_dir=base_card_portrait_dir,\
               card_text=card_text,faction=faction)
             
-            card_portrait_fp = choice(card_portrait_images)
+            card_portrait_fp = pick(card_portrait_images)
     
     elif card_portrait_filename:
         card_portrait_fp = join(card_portrait_dir,card_portrait_filename)
@@ -194,92 +264,52 @@ def make_game_card(title:str,location:str,attack:int=None,health:int=None,cost:i
     #Paste the card portrait onto the card template
     card_image.paste(card_portrait,portrait_location)
 
-    #Set up title box
-    card_title_box = card_image_center.copy()
-    card_title_box =\
-      card_title_box.resize((portrait_width+box_indent*2,margin*2))
-
-    #Brighten Title Box
-    card_title_box = adjust_image(card_title_box, contrast=0.3,\
-      color=0.8,brightness = 1.8) 
-    
-    #Paste the card type box onto the card template
-    card_image.paste(card_title_box,(left_text_edge - box_indent,\
+    #Paste the title box onto the card template
+    card_image.paste(background.title_box,(left_text_edge - box_indent,\
       top_text_edge - box_indent))
 
     #Add title text
     add_text_PIL(card_image,title,fontsize=title_font_size,x=left_text_edge,\
       y=top_text_edge,wrap=True,max_chars_per_line = max_title_chars,\
-      anchor="la")
+      anchor="la",outline_method=outline_method)
     
-    #Set up text box 
-    box_indent = int(margin*1/2)
-    text_box_image = card_image_center.copy()
-    text_box_image = \
-      text_box_image.resize((width - box_indent*2,margin*3+box_indent+\
-      int(box_indent*1/2)+int(box_indent*1/8)))
-
-    #Brighten Text Box
-    text_box_image = adjust_image(text_box_image, contrast=0.3,\
-      color=0.8,brightness = 1.8)
-   
-    #Actually draw the text box onto the card image
-    card_image.paste(text_box_image,text_box_location)
+    #Draw the text box onto the card image
+    card_image.paste(background.text_box,text_box_location)
     
     #Add game text
     add_text_PIL(card_image,card_text, x= left_text_edge,\
-      y= card_text_height,fontsize=28)
+      y= card_text_height,fontsize=28,outline_method=outline_method)
     
     if card_type:
         
-        #Add card type box
-        card_type_box = card_image_center.copy()    
-        
-        #Paste an even blurrier central image
-        card_type_box =\
-          card_type_box.resize((portrait_width-box_indent*2,margin))
-
-        #Brighten Type Box
-        card_type_box = adjust_image(card_type_box, contrast=0.3,\
-        color=0.8,brightness = 1.8)
-
-        #reduce contrast in type box
-        #contrast_enhancer = ImageEnhance.Contrast(card_type_box)
-        #card_type_box = contrast_enhancer.enhance(0.8)
-       
-        #reduce color in type box 
-        #color_enhancer = ImageEnhance.Color(card_type_box)
-        #card_type_box = color_enhancer.enhance(0.8)
- 
-        #brighten type box a lot so it's readable
-        #enhancer = ImageEnhance.Brightness(card_type_box)    
-        #card_type_box = enhancer.enhance(1.8)
-        
         #Paste the card type box onto the card template
-        card_image.paste(card_type_box,(margin+box_indent,\
+        card_image.paste(background.type_box,(margin+box_indent,\
           card_text_height - int(margin)-int(margin*1/8)))
         
         #Add card type text
         add_text_PIL(card_image,card_type, x=int(width/2),\
-          y= card_text_height - int(margin*1/3),fontsize=38,anchor='md')
+          y= card_text_height - int(margin*1/3),fontsize=38,anchor='md',\
+          outline_method=outline_method)
 
     if attack is not None:
         #Add power
         power_icon = u"\u2694"
         power_text = u'%i'%attack+power_icon
-        add_text_PIL(card_image,power_text,x=left_text_edge,y=bottom_text_edge,fontsize=90,anchor='ld')
+        add_text_PIL(card_image,power_text,x=left_text_edge,y=bottom_text_edge,fontsize=90,anchor='ld',\
+          outline_method=outline_method)
 
     #Add mana cost
     cost_icon = u"\u2748" #sparkle
     cost_text = u"%i"%cost + cost_icon
     cost_txt = add_text_PIL(card_image, cost_text, x=right_text_edge,\
-      y= top_text_edge,fontsize=90, anchor = 'ra')
+      y= top_text_edge,fontsize=90, anchor = 'ra',outline_method=outline_method)
 
     if health is not None:
         #Add health
         health_icon = u"\u2665" #black heart
         defense_text = u'%i'%health + health_icon
-        add_text_PIL(card_image,defense_text,x=right_text_edge,y=bottom_text_edge,fontsize=90,anchor='rd')
+        add_text_PIL(card_image,defense_text,x=right_text_edge,y=bottom_text_edge,fontsize=90,anchor='rd',\
+          outline_method=outline_method)
         #(rd = right-descender anchor)     
 
     #Add inner frame
@@ -298,7 +328,9 @@ def make_game_card(title:str,location:str,attack:int=None,health:int=None,cost:i
 
     #Show result
     #card_image.show()
-    card_image.save(output_filepath,quality = 50,optimize=True)
+    #PNG is lossless, so the compression level only trades file size for time.
+    #optimize=True was ~7x slower to save for a file ~4% smaller
+    card_image.save(output_filepath,compress_level=6)
     return output_filename
 
 if __name__ == "__main__":
@@ -1,16 +1,19 @@
 from random import shuffle,choice
 from collections import deque,defaultdict
-import pandas as pd
 import  ast
-from rorschach.code.make_card_image import make_game_card
-from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name,\
-  get_location_dir
 import os
+from copy import copy
 from os import listdir
 from rorschach.code.effect import EffectSet,Effect,DealDamage,Draw,GainManaCrystals,Heal,DiscardRandom
+from rorschach.code.policy import GreedyPolicy
+from rorschach.code.board import Board
+from rorschach.code.zone import Zone
 
 class Player(object):
-    def __init__(self,deck,health=20,name="Unknown Player",total_mana=0,game=None):
+    def __init__(self,deck,health=20,name="Unknown Player",total_mana=0,game=None,policy=None):
+        """
+        policy -- the PlayPolicy that picks cards to play (default: GreedyPolicy)
+        """
         self.Name = name
 
         self.Health = health
@@ -19,18 +22,69 @@ class Player(object):
         self.TotalMana = total_mana
         self.CurrentMana = self.TotalMana
         self.Opponent = None
+        #The Game shuffles the deck with its RNG when the game starts
         self.Deck = deck
-        self.Deck.shuffle()
-        self.Hand = []
+        self.Hand = Zone()
         self.CardType = "Player"
-        self.Board = []
+        self.Board = Board()
         self.MaxBoardSize = 7
-        self.Graveyard = []
+        self.Graveyard = Zone()
         self.Game = game
+        self.Policy = policy or GreedyPolicy()
  
     def __repr__(self):
         return f"{self.Name} ({self.Health} health)"
 
+    def allCards(self):
+        """Iterate over every card in the player's hand, board, graveyard and deck"""
+        for zone in (self.Hand,self.Board,self.Graveyard,self.Deck.Cards):
+            for card in zone:
+                yield card
+
+    def getState(self):
+        """Return this player's mutable state: health, mana and the contents of each zone
+
+        The cards themselves are not copied (see Card.getState)
+        """
+        return (self.Health,self.MaxHealth,self.TotalMana,self.CurrentMana,\
+          tuple(self.Hand),tuple(self.Board),tuple(self.Graveyard),tuple(self.Deck.Cards))
+
+    def setState(self,state):
+        """Restore state returned by getState"""
+        self.Health,self.MaxHealth,self.TotalMana,self.CurrentMana,\
+          hand,board,graveyard,deck_cards = state
+        #Refill zones in place, in case anything holds a reference to them
+        self.Hand[:] = hand
+        self.Board[:] = board
+        self.Graveyard[:] = graveyard
+        self.Deck.Cards.clear()
+        self.Deck.Cards.extend(deck_cards)
+
+    def clone(self,game):
+        """Return a copy of this player with empty zones, belonging to game
+
+        Use copyZones once every player has been cloned to fill in the cards
+        """
+        player = self.__class__.__new__(self.__class__)
+        player.__dict__.update(self.__dict__)
+        player.Game = game
+        player.Hand = Zone()
+        player.Board = Board()
+        player.Graveyard = Zone()
+        player.Deck = copy(self.Deck)
+        player.Deck.Cards = deque()
+        return player
+
+    def copyZones(self,original,players):
+        """Fill this (cloned) player's zones with clones of original's cards
+        players -- a dict mapping each original Player to its clone
+        """
+        self.Opponent = players.get(original.Opponent,original.Opponent)
+        self.Hand.extend([card.clone(players) for card in original.Hand])
+        self.Board.extend([card.clone(players) for card in original.Board])
+        self.Graveyard.extend([card.clone(players) for card in original.Graveyard])
+        self.Deck.Cards.extend([card.clone(players) for card in original.Deck.Cards])
+
     def handAsStr(self,delimiter=","):
         """Return cards in hand as string""" 
         return delimiter.join(map(str,self.Hand))
@@ -43,7 +97,8 @@ class Player(object):
         """Deal damage to the player"""
         self.Health -= amount
         self.Health = max(0,self.Health)
-        print(f"{self.Name} falls to {self.Health} health")
+        if self.Game.Events.wants("player damaged"):
+            self.Game.Events.publish("player damaged",{"player":self,"amount":amount})
         return amount
 
     def healDamage(self,amount=1):
@@ -60,7 +115,7 @@ class Player(object):
          
         enemy_board = self.Opponent.Board
         for i in range(n):
-            random_enemy_minion = choice(enemy_board)
+            random_enemy_minion = self.Game.RNG.choice(enemy_board)
             targets.append(random_enemy_minion)
         return targets       
     
@@ -78,7 +133,8 @@ class Player(object):
         if not self.Opponent or not self.Opponent.Board:
             return targets  
          
-        targets = self.Opponent.Board
+        #A copy, so effects can kill creatures while iterating over their targets
+        targets = list(self.Opponent.Board)
         return targets       
 
     def getAllFriendlyMinions(self):
@@ -88,7 +144,7 @@ class Player(object):
         if not self.Board:
             return targets
 
-        targets = self.Board
+        targets = list(self.Board)
         return targets
 
     def getRandomFriendlyMinions(self,n=1,positive_filter_method_name=None):
@@ -104,7 +160,7 @@ class Player(object):
         
          
         for i in range(n):
-            random_friendly_minion = choice(board)
+            random_friendly_minion = self.Game.RNG.choice(board)
             targets.append(random_friendly_minion)
 
         return targets       
@@ -116,12 +172,13 @@ class Player(object):
         if not board:
             return targets
         
-        damaged_creatures = self.filterBoard(positive_filter_method_name="isDamaged")
+        damaged_creatures = self.Board.damaged()
         if not damaged_creatures:
             return targets
         
         for i in range(n):
-            targets.append(choice(damaged_creatures))
+            targets.append(self.Game.RNG.choice(damaged_creatures))
+        return targets
    
      
     def filter(self,iterable,positive_filter_method_name=None,positive_filter_kwargs = {},\
@@ -153,7 +210,8 @@ class Player(object):
     def gainTotalMana(self,amount):
         """Gain total mana"""
         self.TotalMana += amount
-        self.Game.Interface.report(f"{self.Name} goes up to {self.TotalMana} mana","gain mana",{"player":self,"amount":amount})    
+        if self.Game.Events.wants("gain mana"):
+            self.Game.Events.publish("gain mana",{"player":self,"amount":amount})
     
     def gainCurrentMana(self,amount):
         """Gain current mana"""
@@ -163,60 +221,63 @@ class Player(object):
         """Draw n cards"""
 
         drawn_cards = self.Deck.draw(n_cards)
-        self.Game.Interface.report(f"{self.Name} drew {n_cards}:"+",".join(map(str,drawn_cards)),"draw",{"player":self,"drawn cards":drawn_cards})
+        events = self.Game.Events
+        if len(drawn_cards) < n_cards and events.wants("out of cards"):
+            events.publish("out of cards",{"player":self})
+        if events.wants("draw"):
+            events.publish("draw",{"player":self,"drawn cards":drawn_cards})
         self.Hand.extend(drawn_cards)        
 
     def removeCardFromHand(self,card):
-        """Discard a specific card"""
-        for i,hand_card in enumerate(self.Hand):
-                if hand_card == card:
-                    removed_card = self.Hand.pop(i)
-                    return removed_card 
+        """Remove a specific card from hand and return it (None if it isn't in hand)"""
+        return self.Hand.discard(card)
 
     def discardRandom(self,n_cards):
         """Discard n_cards Cards from Hand at random"""
         discarded_cards = []
         for i in range(n_cards):
             if not self.Hand:
-                print("Hand is empty, can't discard more cards")
-                return discarded_cards
+                #Hand is empty, can't discard more cards
+                break
 
-            random_card_in_hand = choice(self.Hand)
+            random_card_in_hand = self.Game.RNG.choice(self.Hand)
             current_discard = self.removeCardFromHand(random_card_in_hand)
             discarded_cards.append(current_discard)
-        self.Game.Interface.report(f"{self.Name} discarded {n_cards}:"+str([c.Name for c in discarded_cards]),\
-          "discard",{"player":self,"discarded cards":discarded_cards})
+        if self.Game.Events.wants("discard"):
+            self.Game.Events.publish("discard",{"player":self,"discarded cards":discarded_cards})
+        return discarded_cards
     
     def playCard(self,card,verbose=True):
         """Play a card from hand"""
 
+        events = self.Game.Events
         if card not in self.Hand:
-            print("Can't play card - not in hand")
+            if events.wants("cant play card"):
+                events.publish("cant play card",{"player":self,"card":card,"reason":"not in hand"})
             return None
         
         if card.Cost > self.CurrentMana:
-            print("Can't play card - not enough mana")
+            if events.wants("cant play card"):
+                events.publish("cant play card",{"player":self,"card":card,"reason":"not enough mana"})
             return None
         else:
             
             if card.CardType == "Creature":
                 #print("Playing card as creature")
                 if len(self.Board) < self.MaxBoardSize: 
-                    self.Game.Interface.report(f"{self.Name} plays creature {card.Name}",\
-                      "play creature",{"player":self,"creature":card,"position":len(self.Board)+1})
+                    if events.wants("play creature"):
+                        events.publish("play creature",{"player":self,"creature":card,"position":len(self.Board)+1})
                     card = self.removeCardFromHand(card)
                     self.Board.append(card)
-                    print(f"{self.Name} plays {card.Name}")
                     self.CurrentMana -= card.Cost
                     card.Controller = self
             
             elif card.CardType == "Spell":
-                self.Game.Interface.report(f"{self.Name} plays spell {card.Name}",\
-                  "play spell",{"player":self,"spell":card,"position":len(self.Board)+1})
+                if events.wants("play spell"):
+                    events.publish("play spell",{"player":self,"spell":card,"position":len(self.Board)+1})
                 card = self.removeCardFromHand(card)
                 self.CurrentMana -= card.Cost
                 card.setController(self)
-                print(f"{self.Name} plays {card.Name}")
                 card.getTargets()
                 card.activate()
                 self.Graveyard.append(card)  
@@ -241,30 +302,50 @@ class Player(object):
             return False
 
         if required_type:
-            possible_targets = [t for t in possible_targets if required_type in t.Types]
+            possible_targets = [t for t in possible_targets if t.hasType(required_type)]
 
         if not possible_targets:
             return False
         
-        target = choice(possible_targets)
+        target = self.Game.RNG.choice(possible_targets)
         self.returnCreatureToPlay(target) 
         
         return 
 
     def returnCreatureToPlay(self,creature):
         """Return a creature to play"""
-        if len(self.Board) > self.MaxBoardSize:
-            print(f"Can't resurrect {creature.Name}, board is full ({len(self.Board)/self.MaxBoardSize})")
+        if len(self.Board) >= self.MaxBoardSize:
+            if self.Game.Events.wants("cant resurrect"):
+                self.Game.Events.publish("cant resurrect",{"player":self,"creature":creature,"reason":"board is full"})
             return False
         if not self.Graveyard:
-            print("Can't resurrect anything - nothing in Graveyard")
+            if self.Game.Events.wants("cant resurrect"):
+                self.Game.Events.publish("cant resurrect",{"player":self,"creature":creature,"reason":"nothing in Graveyard"})
             return False
-        for i,c in enumerate(self.Graveyard):
-            if c is creature:
-                c.Alive = True   
-                creature = self.Graveyard.pop(i)
-                self.Board.append(creature)
-                break
+        if creature in self.Graveyard:
+            self.Graveyard.remove(creature)
+            #Revived before it joins the Board, so the Board indexes it at full health
+            creature.revive()
+            self.Board.append(creature)
+            if self.Game.Events.wants("resurrect"):
+                self.Game.Events.publish("resurrect",{"player":self,"creature":creature})
+            return True
+        return False
+
+    def canPlayCard(self,card):
+        """Return True if card (in hand) can be played now"""
+        if card.Cost > self.CurrentMana:
+            return False
+        if card.CardType == "Creature" and len(self.Board) >= self.MaxBoardSize:
+            #playCard would refuse it, so it isn't playable
+            return False
+        if card.CardType == "Spell" and not card.hasLegalTargets(self):
+            return False
+        return True
+
+    def playableCards(self):
+        """Return a list of the cards in hand that can be played now"""
+        return [card for card in self.Hand if self.canPlayCard(card)]
 
     def highestCostPlayableCard(self):
         """Return the highest cost playable card in hand"""
@@ -272,14 +353,7 @@ class Player(object):
         max_cost = None
         for card in self.Hand:
             if not max_cost or card.Cost > max_cost:
-                if card.Cost <= self.CurrentMana:
-                    if card.CardType == "Spell":
-                        card.setController(self)
-                        if not card.getTargets():
-                            continue
-                        else:
-                            #Need to reset targets
-                            card.Targets = []
+                if self.canPlayCard(card):
                     highest_cost_card = card
                     max_cost = card.Cost
 
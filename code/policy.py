@@ -0,0 +1,294 @@
+"""
+Player policies: how a player chooses which cards to play during the Play phase.
+
+Game.playPhase asks player.Policy.chooseCard(game,player) for a card, plays it,
+and repeats until the policy returns None.
+"""
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from rorschach.code.rng import GameRNG
+
+class PlayPolicy(object):
+    """Base class for play policies"""
+
+    def chooseCard(self,game,player):
+        """Return a card in player.Hand to play next, or None to end the Play phase"""
+        raise NotImplementedError
+
+class GreedyPolicy(PlayPolicy):
+    """Always play the highest cost playable card (the original AI)"""
+
+    def chooseCard(self,game,player):
+        return player.highestCostPlayableCard()
+
+class RandomPolicy(PlayPolicy):
+    """Play a random playable card, or stop playing cards, uniformly at random"""
+
+    def __init__(self,seed=None):
+        """seed -- seed for the policy's own GameRNG, kept apart from the game's"""
+        self.RNG = GameRNG(seed)
+
+    def chooseCard(self,game,player):
+        options = player.playableCards()
+        options.append(None)
+        return self.RNG.choice(options)
+
+def _legal_actions(player):
+    """Return the distinct names of player's playable cards, plus None (end the Play phase)
+
+    Copies of a card are interchangeable in hand, so actions are card names
+    """
+    names = []
+    for card in player.playableCards():
+        if card.Name not in names:
+            names.append(card.Name)
+    names.append(None)
+    return names
+
+def _card_named(player,name):
+    """Return the first playable card in player's hand called name"""
+    for card in player.playableCards():
+        if card.Name == name:
+            return card
+    return None
+
+class _Node(object):
+    """A node in the MCTS tree: the sequence of plays leading to it, from the root"""
+
+    def __init__(self,action=None,parent=None):
+        self.Action = action
+        self.Parent = parent
+        self.Children = []
+        #Actions not yet expanded. Filled in the first time the node is reached
+        self.Untried = None
+        self.Visits = 0
+        self.TotalReward = 0.0
+
+    def isTerminal(self):
+        """Ending the Play phase leaves nothing more to decide"""
+        return self.Parent is not None and self.Action is None
+
+    def selectChild(self,exploration):
+        """Return the child with the highest UCB1 score"""
+        log_visits = math.log(self.Visits)
+        best_score = None
+        best_child = None
+        for child in self.Children:
+            score = child.TotalReward/child.Visits +\
+              exploration*math.sqrt(log_visits/child.Visits)
+            if best_score is None or score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+class MCTSPolicy(PlayPolicy):
+    """Choose cards with Monte Carlo Tree Search over the current Play phase
+
+    Each iteration restores a cloned copy of the game, reshuffles both decks
+    (so the search can't see the order of unknown cards), walks the tree of
+    plays with UCB1, and finishes the game with rollout_policy. A rollout
+    is worth 1 for a win, 0 for a loss and, for ties or games cut short at
+    max_rollout_turns, the player's share of the two players' total health.
+
+    The first decision of a Play phase runs the search; the rest of the
+    phase reuses the tree (see chooseCard).
+    """
+
+    def __init__(self,iterations=200,time_limit=None,exploration=1.4,max_rollout_turns=20,\
+      rollout_policy=None,workers=1,seed=None):
+        """
+        iterations -- maximum number of rollouts per search (None for no limit)
+        time_limit -- maximum seconds per search (None for no limit)
+        exploration -- the UCB1 exploration constant
+        max_rollout_turns -- rollouts stop after this many further turns
+        rollout_policy -- the PlayPolicy used by both players in rollouts.
+          Defaults to GreedyPolicy
+        workers -- with more than one worker, each of that many processes
+          searches its own tree and the root statistics are summed
+          (root parallelism). The game must be picklable: no card sprites
+        seed -- seed for the search's GameRNG (deck reshuffles, expansion order and
+          worker seeds). Rollouts draw from the searched game's cloned RNG
+        """
+        if iterations is None and time_limit is None:
+            raise ValueError("MCTSPolicy needs an iteration limit or a time limit")
+        self.Iterations = iterations
+        self.TimeLimit = time_limit
+        self.Exploration = exploration
+        self.MaxRolloutTurns = max_rollout_turns
+        self.RolloutPolicy = rollout_policy or GreedyPolicy()
+        self.Workers = workers
+        self.RNG = GameRNG(seed)
+        self._Executor = None
+        self._Plan = []
+        self._PlanKey = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_Executor"] = None
+        return state
+
+    def chooseCard(self,game,player):
+        """Return the next card to play, or None to end the Play phase
+
+        The search returns the most visited line of play for the whole
+        phase. Later calls in the same phase follow it while its cards are
+        still playable, rather than searching again
+        """
+        plan_key = (id(game),game.Turn,id(player))
+        if self._PlanKey == plan_key and self._Plan:
+            name = self._Plan.pop(0)
+            if name is None:
+                return None
+            card = _card_named(player,name)
+            if card is not None:
+                return card
+        self._PlanKey = plan_key
+        actions = _legal_actions(player)
+        if len(actions) == 1:
+            self._Plan = []
+            return None
+
+        if self.Workers > 1:
+            root_stats = self.parallelSearch(game,player)
+        else:
+            root_stats = self.search(game,game.PlayOrder.index(player))
+        self._Plan = principal_variation(root_stats)
+        name = self._Plan.pop(0) if self._Plan else None
+        if name is None:
+            return None
+        return _card_named(player,name)
+
+    def searchGame(self,game):
+        """Return a clone of game that uses the rollout policy for both players"""
+        search_game = game.clone()
+        for search_player in search_game.PlayOrder:
+            search_player.Policy = self.RolloutPolicy
+        return search_game
+
+    def search(self,game,player_index,seed=None):
+        """Run MCTS from game and return the root node
+
+        player_index -- the index in game.PlayOrder of the player in their Play phase
+        seed -- seed for this search's own GameRNG (used by root-parallel workers).
+          Defaults to drawing from self.RNG
+        """
+        rng = self.RNG if seed is None else GameRNG(seed)
+        search_game = self.searchGame(game)
+        player = search_game.PlayOrder[player_index]
+        snapshot = search_game.snapshot()
+        root = _Node()
+        root.Untried = _legal_actions(player)
+
+        deadline = time.perf_counter() + self.TimeLimit if self.TimeLimit is not None else None
+        iteration = 0
+        while self.Iterations is None or iteration < self.Iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            search_game.restore(snapshot)
+            #The game's RNG restarts each turn from the turn number (see Game.runGame),
+            #so give every rollout its own stream
+            search_game.RNG = rng.split()
+            for search_player in search_game.PlayOrder:
+                search_player.Deck.shuffle(rng)
+            self.iterate(root,search_game,player,rng)
+            iteration += 1
+        return root
+
+    def iterate(self,root,game,player,rng):
+        """Do one selection, expansion, rollout and backpropagation"""
+        node = root
+        #Selection: follow UCB1 through fully expanded nodes
+        while not node.isTerminal() and not node.Untried and node.Children:
+            node = node.selectChild(self.Exploration)
+            self.apply(game,player,node.Action)
+
+        #Expansion
+        if not node.isTerminal():
+            if node.Untried is None:
+                node.Untried = _legal_actions(player)
+            if node.Untried:
+                action = node.Untried.pop(rng.randrange(len(node.Untried)))
+                child = _Node(action,node)
+                node.Children.append(child)
+                node = child
+                self.apply(game,player,action)
+
+        #Rollout
+        reward = self.rollout(game,player,play_phase_over=node.isTerminal())
+
+        #Backpropagation
+        while node is not None:
+            node.Visits += 1
+            node.TotalReward += reward
+            node = node.Parent
+
+    def apply(self,game,player,action):
+        """Play the card named action (None plays nothing)"""
+        if action is None:
+            return
+        card = _card_named(player,action)
+        if card is not None:
+            player.playCard(card)
+
+    def rollout(self,game,player,play_phase_over=False):
+        """Finish the game with the rollout policy and return player's reward"""
+        if not play_phase_over:
+            game.playPhase(player)
+        game.finishTurn(player,after_phase="Play")
+        winner = game.runGame(wait_for_input=False,max_turns=game.Turn + self.MaxRolloutTurns)
+        if winner is player:
+            return 1.0
+        if winner is not None:
+            return 0.0
+        total_health = player.Health + player.Opponent.Health
+        if total_health <= 0:
+            return 0.5
+        return player.Health/total_health
+
+    def parallelSearch(self,game,player):
+        """Search in self.Workers processes and return the summed root statistics"""
+        if self._Executor is None:
+            self._Executor = ProcessPoolExecutor(max_workers=self.Workers)
+        search_game = self.searchGame(game)
+        player_index = game.PlayOrder.index(player)
+        futures = [self._Executor.submit(_search_worker,self,search_game,player_index,\
+          self.RNG.getrandbits(64)) for i in range(self.Workers)]
+        root = _Node()
+        for future in futures:
+            merge_tree(root,future.result())
+        return root
+
+    def close(self):
+        """Shut down the worker processes, if any"""
+        if self._Executor is not None:
+            self._Executor.shutdown()
+            self._Executor = None
+
+def _search_worker(policy,game,player_index,seed):
+    """Run one root-parallel search in a worker process"""
+    return policy.search(game,player_index,seed=seed)
+
+def merge_tree(total,node):
+    """Add the visit counts and rewards of node's tree into total's tree"""
+    total.Visits += node.Visits
+    total.TotalReward += node.TotalReward
+    for child in node.Children:
+        for total_child in total.Children:
+            if total_child.Action == child.Action:
+                break
+        else:
+            total_child = _Node(child.Action,total)
+            total.Children.append(total_child)
+        merge_tree(total_child,child)
+
+def principal_variation(root):
+    """Return the list of actions along the most visited path from root"""
+    actions = []
+    node = root
+    while node.Children:
+        node = max(node.Children,key=lambda child: child.Visits)
+        actions.append(node.Action)
+        if node.Action is None:
+            break
+    return actions
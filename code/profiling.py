@@ -0,0 +1,60 @@
+"""
+Wall time and call counts for the parts of a game: phases, effects and target selectors.
+
+Give a Game a GameProfiler (Game(...,profiler=profiler), or set
+game.Profiler) and the engine times each phase in Game.Phases, each
+effect activation (by effect type, the keys of EffectSet.EffectMakers)
+and each target selection (by target type, see targets.py). With no
+profiler the engine only checks game.Profiler is None.
+
+One profiler can be shared by many games to total their times. Games
+made by Game.clone (e.g. MCTS searches) are not profiled.
+"""
+from time import perf_counter
+
+PHASE = "phase"
+EFFECT = "effect"
+TARGET = "target"
+
+class GameProfiler(object):
+    """Totals of wall time and calls, keyed by (category,name)"""
+
+    def __init__(self):
+        #(category,name) -> total seconds, and number of calls
+        self.Times = {}
+        self.Calls = {}
+
+    def add(self,category,name,seconds):
+        """Record one call of name (e.g. "Draw") in category (e.g. PHASE) that took seconds"""
+        key = (category,name)
+        self.Times[key] = self.Times.get(key,0.0) + seconds
+        self.Calls[key] = self.Calls.get(key,0) + 1
+
+    def call(self,category,name,function,*args):
+        """Call function(*args), record how long it took and return its result"""
+        start = perf_counter()
+        result = function(*args)
+        self.add(category,name,perf_counter() - start)
+        return result
+
+    def merge(self,other):
+        """Add another profiler's totals to this one's"""
+        for key,seconds in other.Times.items():
+            self.Times[key] = self.Times.get(key,0.0) + seconds
+            self.Calls[key] = self.Calls.get(key,0) + other.Calls[key]
+
+    def rows(self,category=None):
+        """Return (category,name,calls,total seconds,microseconds per call) tuples, slowest first
+
+        category -- only return rows for this category (default: all)
+        """
+        rows = [(c,name,self.Calls[(c,name)],seconds,1e6*seconds/self.Calls[(c,name)])\
+          for (c,name),seconds in self.Times.items() if category is None or c == category]
+        return sorted(rows,key=lambda row:-row[3])
+
+    def report(self,delimiter="\t"):
+        """Return the totals as a text table"""
+        lines = [delimiter.join(["category","name","calls","total_s","us_per_call"])]
+        for category,name,calls,seconds,per_call in self.rows():
+            lines.append(delimiter.join([category,name,str(calls),f"{seconds:.4f}",f"{per_call:.2f}"]))
+        return "\n".join(lines)
@@ -0,0 +1,356 @@
+"""
+A content-addressed cache of rendered card images.
+
+make_game_card names its output after the card (filename_from_card_name),
+so an image on disk says nothing about the stats or text it was drawn
+with. The cache keys each rendered image on a hash of every render input
+(render_key): title, stats, text, type, faction, the background and
+portrait file contents, and TEMPLATE_VERSION. cached_game_card renders a
+card only when no image with the same key is cached. Changing a card's
+cost in the card data therefore renders it again, and changing it back
+reuses the old image.
+
+Images are stored as <cache_dir>/<key[:2]>/<key>.png, with their
+pre-scaled variants (see card_art.CARD_IMAGE_VARIANTS) in variant
+subdirectories beside them, and are linked into the output directory
+together. An index
+(index.json) records each entry's size and when it was last used. It
+also records which key each output file currently shows and cumulative
+hit and miss counts. An entry is orphaned when no output file shows it
+any more. Once the cache is bigger than max_bytes, orphaned entries are
+evicted, least recently used first. Entries still in use are never
+evicted.
+
+An output image the cache has never seen (e.g. one checked in to
+data/images/cards, or made before the cache) is adopted: it is cached as
+it is, under the key of the inputs it is first looked up with. It is
+only rendered again once those inputs change, so the checked-in images
+keep their art. render_cards.py --force renders every image regardless.
+
+Rendering (matplotlib and PIL) is only imported on a miss.
+"""
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+import threading
+from rorschach.code.get_card_portrait import dir_from_location_name,filename_from_card_name
+from rorschach.code.card_art import CARD_IMAGE_VARIANTS,variant_filepath,make_card_image_variants,\
+  get_card_image_index,list_card_backs
+
+#Bump this when make_game_card's output changes, so every card is rendered again
+TEMPLATE_VERSION = 2
+INDEX_VERSION = 1
+INDEX_FILENAME = "index.json"
+DEFAULT_CACHE_DIR = "../data/images/render_cache/"
+DEFAULT_MAX_BYTES = 512*1024*1024
+DEFAULT_OUTPUT_DIR = "../data/images/cards/"
+DEFAULT_PORTRAIT_DIR = "../data/images/card_portraits/"
+DEFAULT_BACKGROUND_DIR = "../data/images/card_backgrounds/"
+
+#File digests by (path,size,mtime), so unchanged files aren't read again
+_file_hashes = {}
+
+def file_hash(filepath):
+    """Return the sha256 hex digest of a file's contents (cached by path, size and mtime)"""
+    stat = os.stat(filepath)
+    key = (filepath,stat.st_size,stat.st_mtime_ns)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        with open(filepath,"rb") as f:
+            digest = _file_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return digest
+
+def list_backgrounds(background_dir=DEFAULT_BACKGROUND_DIR):
+    """Return the sorted card background filenames in background_dir (see card_art.list_card_backs)"""
+    return list_card_backs(background_dir)
+
+def pick_background(card_name,backgrounds,card_back_filename="random"):
+    """Return the card's background: card_back_filename, or a fixed pick for the card if "random"
+
+    Seeding the pick with the card's name keeps a card's background (and so
+    its render key) the same from run to run
+    """
+    if card_back_filename != "random":
+        return card_back_filename
+    return random.Random(card_name).choice(backgrounds)
+
+def portrait_filepath(title,location,portrait_dir=DEFAULT_PORTRAIT_DIR):
+    """Return where make_game_card looks for a card's generated portrait"""
+    location_dir = dir_from_location_name(location) if location else ""
+    return os.path.join(portrait_dir,location_dir,filename_from_card_name(title,location,number=1,extension=".png"))
+
+def output_filepath(title,location):
+    """Return the card image's path relative to the output directory"""
+    location_dir = dir_from_location_name(location) if location else ""
+    return os.path.join(location_dir,filename_from_card_name(title,location,number=1,extension=".png"))
+
+def render_key(title,location,attack,health,cost,card_text,card_type,faction,background_fp,portrait_fp):
+    """Return the cache key for a card: a hash of every input to make_game_card"""
+    inputs = (TEMPLATE_VERSION,title,location,attack,health,cost,card_text,card_type,faction,\
+      os.path.basename(background_fp),file_hash(background_fp),file_hash(portrait_fp))
+    return hashlib.sha256(repr(inputs).encode()).hexdigest()
+
+def link_or_copy(source_fp,destination_fp):
+    """Make destination_fp a hard link to source_fp, or a copy where links aren't possible"""
+    if os.path.exists(destination_fp):
+        os.remove(destination_fp)
+    try:
+        os.link(source_fp,destination_fp)
+    except OSError:
+        shutil.copyfile(source_fp,destination_fp)
+
+class RenderCache(object):
+    """Rendered card images on disk, keyed by render_key"""
+
+    def __init__(self,cache_dir=DEFAULT_CACHE_DIR,max_bytes=DEFAULT_MAX_BYTES):
+        self.Directory = cache_dir
+        self.MaxBytes = max_bytes
+        #Hits and misses since this object was made. The index keeps running totals
+        self.Hits = 0
+        self.Misses = 0
+        self.Index = self.loadIndex()
+        #Whether entries or current images changed since the index was loaded or saved.
+        #Hit counts and last use times alone don't count
+        self.Changed = False
+
+    def indexFilepath(self):
+        return os.path.join(self.Directory,INDEX_FILENAME)
+
+    def loadIndex(self):
+        """Read the index, or start a new one if it is missing or from another version"""
+        try:
+            with open(self.indexFilepath()) as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                return index
+        except (OSError,ValueError):
+            pass
+        return {"version":INDEX_VERSION,"entries":{},"current":{},"hits":0,"misses":0}
+
+    def save(self,force=False):
+        """Write the index if it changed (or force), under a temporary name and renamed,
+        so it is never left half written. Returns True if it was written
+        """
+        if not (self.Changed or force):
+            return False
+        os.makedirs(self.Directory,exist_ok=True)
+        temp_fp = f"{self.indexFilepath()}.{os.getpid()}.tmp"
+        with open(temp_fp,"w") as f:
+            json.dump(self.Index,f,indent=1,sort_keys=True)
+        os.replace(temp_fp,self.indexFilepath())
+        self.Changed = False
+        return True
+
+    def entryFilepath(self,key):
+        return os.path.join(self.Directory,key[:2],f"{key}.png")
+
+    def __contains__(self,key):
+        return key in self.Index["entries"]
+
+    def __len__(self):
+        return len(self.Index["entries"])
+
+    def get(self,key):
+        """Return the cached image for key, or None. Counts a hit or a miss"""
+        entry = self.Index["entries"].get(key)
+        if entry is not None and not os.path.exists(self.entryFilepath(key)):
+            #Deleted from outside the cache
+            del self.Index["entries"][key]
+            self.Changed = True
+            entry = None
+        if entry is None:
+            self.Misses += 1
+            self.Index["misses"] += 1
+            return None
+        self.Hits += 1
+        self.Index["hits"] += 1
+        entry["last_used"] = time.time()
+        return self.entryFilepath(key)
+
+    def entryFilepaths(self,key):
+        """Return the filepaths of an entry's image and its variants"""
+        cached_fp = self.entryFilepath(key)
+        return [cached_fp] + [variant_filepath(cached_fp,variant_name) for variant_name,scale in CARD_IMAGE_VARIANTS]
+
+    def put(self,key,image_fp):
+        """Add a rendered image (and its variants, made from it) to the cache and return the cached copy's path"""
+        cached_fp = self.entryFilepath(key)
+        os.makedirs(os.path.dirname(cached_fp),exist_ok=True)
+        link_or_copy(image_fp,cached_fp)
+        make_card_image_variants(cached_fp)
+        self.Index["entries"][key] = {"size":sum(os.path.getsize(fp) for fp in self.entryFilepaths(key)),\
+          "last_used":time.time()}
+        self.Changed = True
+        return cached_fp
+
+    def linkVariants(self,key,image_fp,missing_only=False):
+        """Link (or copy) an entry's variants next to output image image_fp
+
+        missing_only -- only link variants image_fp doesn't have yet
+        """
+        entry_fps = self.entryFilepaths(key)
+        if not all(os.path.exists(fp) for fp in entry_fps[1:]):
+            #Cached before variants were made
+            make_card_image_variants(entry_fps[0])
+            self.Index["entries"][key]["size"] = sum(os.path.getsize(fp) for fp in entry_fps)
+            self.Changed = True
+        for (variant_name,scale),entry_fp in zip(CARD_IMAGE_VARIANTS,entry_fps[1:]):
+            variant_fp = variant_filepath(image_fp,variant_name)
+            if missing_only and os.path.exists(variant_fp):
+                continue
+            os.makedirs(os.path.dirname(variant_fp),exist_ok=True)
+            link_or_copy(entry_fp,variant_fp)
+
+    def isCurrent(self,name,key):
+        """Return True if output file name (its absolute path) shows key"""
+        return self.Index["current"].get(name) == key
+
+    def knows(self,name):
+        """Return True if the cache has recorded which key output file name shows"""
+        return name in self.Index["current"]
+
+    def setCurrent(self,name,key):
+        """Record that output file name now shows key (so its entry isn't orphaned)"""
+        if self.Index["current"].get(name) != key:
+            self.Index["current"][name] = key
+            self.Changed = True
+
+    def totalBytes(self):
+        return sum(entry["size"] for entry in self.Index["entries"].values())
+
+    def orphans(self):
+        """Return the keys no output file shows, least recently used first"""
+        current = set(self.Index["current"].values())
+        entries = self.Index["entries"]
+        return sorted((key for key in entries if key not in current),key=lambda key:entries[key]["last_used"])
+
+    def evict(self):
+        """Delete orphaned entries, least recently used first, until the cache fits in MaxBytes
+
+        Returns the evicted keys
+        """
+        total = self.totalBytes()
+        evicted = []
+        for key in self.orphans():
+            if total <= self.MaxBytes:
+                break
+            total -= self.Index["entries"].pop(key)["size"]
+            for fp in self.entryFilepaths(key):
+                try:
+                    os.remove(fp)
+                except FileNotFoundError:
+                    pass
+            evicted.append(key)
+            self.Changed = True
+        return evicted
+
+    def hitRate(self):
+        """Return the fraction of lookups (over the index's lifetime) that were hits, or None"""
+        lookups = self.Index["hits"] + self.Index["misses"]
+        return self.Index["hits"]/lookups if lookups else None
+
+def restore_from_cache(cache,key,image_fp,exists=None):
+    """Make image_fp (and its variants) show the render for key without rendering, if possible
+
+    Returns "current" if it already did, "adopted" if image_fp exists but the cache
+    had never seen it (it is cached as it is, for key), or "reused" if the render
+    was cached and has been linked into place. Returns None if the card has to be
+    rendered; any old image_fp has been removed, as it may be a hard link to
+    another cache entry
+    exists -- whether image_fp exists, if the caller already knows (e.g. from a
+      card_art.CardImageIndex)
+    """
+    name = os.path.abspath(image_fp)
+    if exists is None:
+        exists = os.path.exists(image_fp)
+    if exists and cache.isCurrent(name,key) and key in cache:
+        cache.get(key)
+        cache.linkVariants(key,image_fp,missing_only=True)
+        return "current"
+    if exists and not cache.knows(name):
+        cache.put(key,image_fp)
+        cache.linkVariants(key,image_fp,missing_only=True)
+        cache.setCurrent(name,key)
+        return "adopted"
+    cached_fp = cache.get(key)
+    if cached_fp is None:
+        if exists:
+            os.remove(image_fp)
+        return None
+    os.makedirs(os.path.dirname(image_fp),exist_ok=True)
+    link_or_copy(cached_fp,image_fp)
+    cache.linkVariants(key,image_fp)
+    cache.setCurrent(name,key)
+    return "reused"
+
+#One cache per directory, made the first time it is needed
+_render_caches = {}
+
+#Held while cached_game_card runs. RenderCache isn't thread safe, and card images
+#are resolved from texture loading threads as well as the main thread (see card_sprites.py)
+_render_lock = threading.RLock()
+
+def get_render_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """Return the (shared) RenderCache for cache_dir"""
+    cache = _render_caches.get(cache_dir)
+    if cache is None:
+        cache = _render_caches[cache_dir] = RenderCache(cache_dir)
+    return cache
+
+def cached_game_card(title,location,attack=None,health=None,cost=1,card_text="",card_type="",\
+  card_back_filename="random",base_card_portrait_dir=DEFAULT_PORTRAIT_DIR,\
+  card_back_dir=DEFAULT_BACKGROUND_DIR,output_dir=DEFAULT_OUTPUT_DIR,faction="",cache=None):
+    """Make a card image like make_game_card, but only render it if its inputs aren't cached
+
+    The card's image in output_dir is linked (or copied) from the cache (see
+    restore_from_cache). Cards whose portrait hasn't been generated yet are
+    passed straight to make_game_card, which fetches a portrait, and aren't cached.
+    Whether the portrait and image exist is answered from card_art's in-memory
+    directory indexes, and the cache's index is only written if it changed.
+    cache -- a RenderCache (default: get_render_cache())
+
+    Returns the image's filename, as make_game_card does
+    """
+    with _render_lock:
+        return _cached_game_card(title,location,attack,health,cost,card_text,card_type,\
+          card_back_filename,base_card_portrait_dir,card_back_dir,output_dir,faction,cache)
+
+def _cached_game_card(title,location,attack,health,cost,card_text,card_type,card_back_filename,\
+  base_card_portrait_dir,card_back_dir,output_dir,faction,cache):
+    portrait_fp = portrait_filepath(title,location,base_card_portrait_dir)
+    render_args = dict(location=location,attack=attack,health=health,cost=cost,card_text=card_text,\
+      card_type=card_type,base_card_portrait_dir=base_card_portrait_dir,card_back_dir=card_back_dir,\
+      output_dir=output_dir,faction=faction)
+    portrait_index = get_card_image_index(os.path.dirname(portrait_fp))
+    image_fp = os.path.join(output_dir,output_filepath(title,location))
+    image_index = get_card_image_index(os.path.dirname(image_fp))
+    if os.path.basename(portrait_fp) not in portrait_index:
+        from rorschach.code.make_card_image import make_game_card
+        filename = make_game_card(title,card_portrait_filename="generate",\
+          card_back_filename=card_back_filename,**render_args)
+        make_card_image_variants(image_fp)
+        image_index.add(filename)
+        if os.path.isfile(portrait_fp):
+            portrait_index.add(os.path.basename(portrait_fp))
+        return filename
+
+    if cache is None:
+        cache = get_render_cache()
+    background = pick_background(title,list_backgrounds(card_back_dir),card_back_filename)
+    key = render_key(title,location,attack,health,cost,card_text,card_type,faction,\
+      os.path.join(card_back_dir,background),portrait_fp)
+    if restore_from_cache(cache,key,image_fp,exists=os.path.basename(image_fp) in image_index) is None:
+        from rorschach.code.make_card_image import make_game_card
+        os.makedirs(os.path.dirname(image_fp),exist_ok=True)
+        make_game_card(title,card_portrait_filename=os.path.basename(portrait_fp),\
+          card_back_filename=background,**render_args)
+        cache.put(key,image_fp)
+        cache.linkVariants(key,image_fp)
+        cache.setCurrent(os.path.abspath(image_fp),key)
+        cache.evict()
+        image_index.add(os.path.basename(image_fp))
+    cache.save()
+    return os.path.basename(image_fp)
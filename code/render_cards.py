@@ -0,0 +1,179 @@
+"""
+Render every card image in a card set across a pool of worker processes.
+
+Card images are normally rendered one at a time, the first time a
+card's CardImageFilepath is used. This module renders a whole card set
+ahead of time:
+
+python render_cards.py ../data/card_data/basic_card_set.txt
+
+Each card is looked up in the render cache (see render_cache.py) by a
+hash of its render inputs. A card is rendered only when no image with
+the same inputs is cached, e.g. after a balance patch changes its stats
+or text. An image cached by an earlier build is linked into place
+instead of being rendered again. An image the cache has never seen (e.g.
+a checked-in one) is taken into the cache as it is (see
+render_cache.restore_from_cache). Cards with no portrait on disk are
+skipped rather than fetched (see get_card_portrait).
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor,as_completed
+from rorschach.code.card_cache import load_card_set,DEFAULT_EFFECT_DATA_FP
+from rorschach.code.render_cache import RenderCache,render_key,list_backgrounds,pick_background,\
+  portrait_filepath,output_filepath,restore_from_cache,DEFAULT_CACHE_DIR,DEFAULT_OUTPUT_DIR,\
+  DEFAULT_PORTRAIT_DIR,DEFAULT_BACKGROUND_DIR
+
+#Everything make_game_card needs to draw one card. output_filepath is relative
+#to the output directory, e.g. kingdom_of_kyberia/kingdom_of_kyberia__ogre__1.png
+RenderJob = namedtuple("RenderJob",["name","location","cost","power","toughness","card_text",\
+  "card_type","faction","background_filename","portrait_filename","output_filepath","key"])
+
+#Counts from one render_card_set run. reused cards were linked from the render cache
+RenderReport = namedtuple("RenderReport",["rendered","reused","up_to_date","missing_portraits",\
+  "failed","seconds"])
+
+def make_render_job(prototype,backgrounds,portrait_dir=DEFAULT_PORTRAIT_DIR,\
+  background_dir=DEFAULT_BACKGROUND_DIR):
+    """Return the RenderJob for a CardPrototype, or None if it has no portrait on disk
+
+    The job's key (see render_key) covers everything that changes the rendered image
+    """
+    if prototype.Types:
+        card_type = " and ".join(prototype.Types)
+    else:
+        card_type = prototype.CardType
+    if prototype.CardType == "Creature":
+        power,toughness = prototype.Power,prototype.Toughness
+    else:
+        power,toughness = None,None
+    portrait_fp = portrait_filepath(prototype.Name,prototype.Location,portrait_dir)
+    if not os.path.isfile(portrait_fp):
+        return None
+    background_filename = pick_background(prototype.Name,backgrounds,prototype.CardBackFilename)
+    key = render_key(prototype.Name,prototype.Location,power,toughness,prototype.Cost,\
+      prototype.CardText,card_type,prototype.Faction,os.path.join(background_dir,background_filename),\
+      portrait_fp)
+    return RenderJob(prototype.Name,prototype.Location,prototype.Cost,power,toughness,\
+      prototype.CardText,card_type,prototype.Faction,background_filename,os.path.basename(portrait_fp),\
+      output_filepath(prototype.Name,prototype.Location),key)
+
+def render_job(job,output_dir=DEFAULT_OUTPUT_DIR,portrait_dir=DEFAULT_PORTRAIT_DIR,\
+  background_dir=DEFAULT_BACKGROUND_DIR):
+    """Render one RenderJob. Returns the job (so pool results can be matched up)"""
+    #Rendering pulls in matplotlib and PIL, so only import it in the processes that draw
+    from rorschach.code.make_card_image import make_game_card
+    make_game_card(job.name,location=job.location,attack=job.power,health=job.toughness,\
+      cost=job.cost,card_text=job.card_text,card_type=job.card_type,\
+      card_portrait_filename=job.portrait_filename,card_back_filename=job.background_filename,\
+      base_card_portrait_dir=portrait_dir,card_back_dir=background_dir,output_dir=output_dir,\
+      faction=job.faction)
+    return job
+
+def render_card_set(card_data_fp,effect_data_fp=DEFAULT_EFFECT_DATA_FP,output_dir=DEFAULT_OUTPUT_DIR,\
+  portrait_dir=DEFAULT_PORTRAIT_DIR,background_dir=DEFAULT_BACKGROUND_DIR,cache_dir=DEFAULT_CACHE_DIR,\
+  max_workers=None,force=False,verbose=False):
+    """Render every missing or stale card image in a card set and return a RenderReport
+
+    cache_dir -- the RenderCache directory
+    max_workers -- worker processes (defaults to the number of CPUs). With
+      max_workers=1 cards are rendered in this process
+    force -- render every card, even if its image is up to date or cached
+    """
+    start_time = time.perf_counter()
+    card_set = load_card_set(card_data_fp,effect_data_fp)
+    backgrounds = list_backgrounds(background_dir)
+    cache = RenderCache(cache_dir)
+
+    jobs = []
+    missing_portraits = []
+    up_to_date = 0
+    reused = 0
+    for prototype in card_set.Prototypes.values():
+        job = make_render_job(prototype,backgrounds,portrait_dir,background_dir)
+        if job is None:
+            missing_portraits.append(prototype.Name)
+            continue
+        image_fp = os.path.join(output_dir,job.output_filepath)
+        os.makedirs(os.path.dirname(image_fp),exist_ok=True)
+        if force:
+            if os.path.exists(image_fp):
+                #It may be a hard link to a cache entry, so never draw over it
+                os.remove(image_fp)
+            jobs.append(job)
+            continue
+        status = restore_from_cache(cache,job.key,image_fp)
+        if status is None:
+            jobs.append(job)
+        elif status == "reused":
+            reused += 1
+        else:
+            up_to_date += 1
+
+    #Each process caches the backgrounds it has drawn on (see make_card_image.get_background_layers),
+    #so hand out cards that share a background together
+    jobs.sort(key=lambda job:job.background_filename)
+
+    rendered = 0
+    failed = []
+    def finished(job):
+        nonlocal rendered
+        image_fp = os.path.join(output_dir,job.output_filepath)
+        cache.put(job.key,image_fp)
+        cache.linkVariants(job.key,image_fp)
+        cache.setCurrent(os.path.abspath(image_fp),job.key)
+        rendered += 1
+        if verbose:
+            print(f"Rendered {job.name} ({rendered}/{len(jobs)})")
+
+    render_args = (output_dir,portrait_dir,background_dir)
+    try:
+        if max_workers == 1:
+            for job in jobs:
+                try:
+                    finished(render_job(job,*render_args))
+                except Exception as e:
+                    failed.append((job.name,repr(e)))
+        elif jobs:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(render_job,job,*render_args):job for job in jobs}
+                for future in as_completed(futures):
+                    try:
+                        finished(future.result())
+                    except Exception as e:
+                        failed.append((futures[future].name,repr(e)))
+    finally:
+        #Keep what was rendered even if the run is interrupted
+        cache.evict()
+        #Also keeps this run's hit counts
+        cache.save(force=True)
+    return RenderReport(rendered,reused,up_to_date,missing_portraits,failed,time.perf_counter() - start_time)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Render every missing or stale card image in a card set")
+    parser.add_argument("card_data_fp")
+    parser.add_argument("--effect_data_fp",default=DEFAULT_EFFECT_DATA_FP)
+    parser.add_argument("--output_dir",default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--portrait_dir",default=DEFAULT_PORTRAIT_DIR)
+    parser.add_argument("--background_dir",default=DEFAULT_BACKGROUND_DIR)
+    parser.add_argument("--cache_dir",default=DEFAULT_CACHE_DIR)
+    parser.add_argument("-w","--max_workers",type=int,default=None)
+    parser.add_argument("--force",action="store_true",help="Render every card, even if up to date or cached")
+    parser.add_argument("-v","--verbose",action="store_true")
+    args = parser.parse_args()
+
+    report = render_card_set(args.card_data_fp,args.effect_data_fp,output_dir=args.output_dir,\
+      portrait_dir=args.portrait_dir,background_dir=args.background_dir,cache_dir=args.cache_dir,\
+      max_workers=args.max_workers,force=args.force,verbose=args.verbose)
+    for card_name,error in report.failed:
+        print(f"Failed to render {card_name}: {error}")
+    if report.missing_portraits:
+        print(f"No portrait for {len(report.missing_portraits)} cards:",", ".join(report.missing_portraits))
+    rate = report.rendered/report.seconds if report.seconds else 0.0
+    print(f"Rendered {report.rendered} cards in {report.seconds:.2f}s ({rate:.2f} cards/s), "\
+      f"{report.reused} reused from the render cache, {report.up_to_date} already up to date")
+    hit_rate = RenderCache(args.cache_dir).hitRate()
+    if hit_rate is not None:
+        print(f"Render cache hit rate: {hit_rate:.1%}")
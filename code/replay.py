@@ -0,0 +1,500 @@
+"""
+Compact binary replays of games, with keyframes for seeking.
+
+A ReplayWriter subscribes to a game's EventBus and appends a few bytes
+per event to a binary file: turns, phases, cards played and attacks.
+Every few turns it also writes a keyframe, the full state of the game
+(health, mana and which card is in which zone) at the start of a turn.
+A typical game is a few hundred bytes.
+
+A replay stores the game's RNG seed, and each turn's random choices
+come from that turn's jump of the RNG (see Game.runGame). Replay.restoreGame
+therefore rebuilds a game at any turn from the nearest keyframe at or
+before it. It plays at most keyframe_interval - 1 turns forward, with
+each player making the plays recorded in the replay, rather than
+replaying the game from the start.
+
+File format: the magic bytes, a version byte, then a header and a
+stream of records. Integers are unsigned LEB128 varints (signed values
+are zigzag encoded) and strings are a length and UTF-8 bytes. Card ids
+0 and 1 are the players, and cards are numbered from 2 in header order.
+
+header: seed and RNG stream path (zigzag encoded, as seeds may be negative), player names, phase names, card names,
+  then for each card its owner and name index
+records (first byte):
+  0x00-0x0F  phase: player*8 + phase index (see Game.Phases)
+  0x10       turn: turn number
+  0x11       play: card id
+  0x12       attack: attacker id, target id
+  0x13       keyframe: payload length, payload (see ReplayWriter.keyframe)
+  0x14       new card: owner, name (for cards made during the game)
+  0x15       end: winner (0 for none, otherwise player index + 1)
+"""
+from collections import namedtuple,deque
+from rorschach.code.rng import GameRNG
+from rorschach.code.deck import Deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+from rorschach.code.policy import PlayPolicy
+
+MAGIC = b"RRPL"
+#2: the seed and RNG stream path are zigzag encoded
+VERSION = 2
+
+PHASE_RECORD = 0x00
+TURN_RECORD = 0x10
+PLAY_RECORD = 0x11
+ATTACK_RECORD = 0x12
+KEYFRAME_RECORD = 0x13
+CARD_RECORD = 0x14
+END_RECORD = 0x15
+
+#Players are card ids 0 and 1; cards start at FIRST_CARD_ID
+FIRST_CARD_ID = 2
+
+#One decoded replay record. player is a player index, card and target are card ids
+ReplayEvent = namedtuple("ReplayEvent",["turn","kind","player","card","target"])
+
+#The state of one player at the start of a turn. board is a tuple of (card id,current health)
+PlayerKeyframe = namedtuple("PlayerKeyframe",["health","max_health","total_mana","current_mana",\
+  "hand","board","graveyard","deck"])
+Keyframe = namedtuple("Keyframe",["turn","players"])
+
+def write_varint(buffer,value):
+    """Append a non-negative int to buffer (a bytearray) as a LEB128 varint"""
+    if value < 0:
+        raise ValueError(f"Varints can't be negative ({value}); zigzag encode signed values")
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def read_varint(data,offset):
+    """Return (value,offset after it) for the varint at data[offset]"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value,offset
+        shift += 7
+
+def zigzag(value):
+    """Map a signed int to a non-negative one (0,-1,1,-2... -> 0,1,2,3...)"""
+    return value*2 if value >= 0 else -value*2 - 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+def write_string(buffer,text):
+    encoded = text.encode("utf-8")
+    write_varint(buffer,len(encoded))
+    buffer.extend(encoded)
+
+def read_string(data,offset):
+    length,offset = read_varint(data,offset)
+    return bytes(data[offset:offset+length]).decode("utf-8"),offset + length
+
+class ReplayWriter(object):
+    """Record a game to a binary replay file as it is played
+
+    The header is written when the writer is made, so make it right after
+    the Game (before runGame). Records are buffered and written at each
+    keyframe and when the writer is closed.
+    """
+
+    EventTypes = ("start of turn","start of phase","play creature","play spell",\
+      "creature attacks","game over")
+
+    def __init__(self,game,f,keyframe_interval=10):
+        """
+        game -- the Game to record
+        f -- a binary file object to append the replay to
+        keyframe_interval -- write a keyframe every this many turns (starting with turn 1)
+        """
+        if len(game.Phases) > 8:
+            raise ValueError("Replays support at most 8 phases per turn")
+        self.Game = game
+        self.File = f
+        self.KeyframeInterval = keyframe_interval
+        self.Buffer = bytearray()
+        self.Closed = False
+        self.Ended = False
+        self.PlayerIndexes = {player:i for i,player in enumerate(game.PlayOrder)}
+        self.PhaseIndexes = {phase:i for i,phase in enumerate(game.Phases)}
+        self.CardIds = {player:i for player,i in self.PlayerIndexes.items()}
+        self.NameIndexes = {}
+        self.writeHeader()
+        game.Events.subscribe(self.record,self.EventTypes)
+
+    def writeHeader(self):
+        buffer = self.Buffer
+        buffer.extend(MAGIC)
+        buffer.append(VERSION)
+        rng = self.Game.RNG
+        write_varint(buffer,zigzag(rng.Seed))
+        write_varint(buffer,len(rng.Path))
+        for index in rng.Path:
+            write_varint(buffer,zigzag(index))
+        for player in self.Game.PlayOrder:
+            write_string(buffer,player.Name)
+        write_varint(buffer,len(self.Game.Phases))
+        for phase in self.Game.Phases:
+            write_string(buffer,phase)
+        cards = [(self.PlayerIndexes[player],card) for player in self.Game.PlayOrder\
+          for card in player.allCards()]
+        for owner,card in cards:
+            if card.Name not in self.NameIndexes:
+                self.NameIndexes[card.Name] = len(self.NameIndexes)
+        write_varint(buffer,len(self.NameIndexes))
+        for name in self.NameIndexes:
+            write_string(buffer,name)
+        write_varint(buffer,len(cards))
+        for owner,card in cards:
+            self.CardIds[card] = len(self.CardIds)
+            write_varint(buffer,self.NameIndexes[card.Name]*2 + owner)
+
+    def cardId(self,card):
+        """Return card's id, recording it as a new card if it wasn't in the header"""
+        card_id = self.CardIds.get(card)
+        if card_id is None:
+            card_id = self.CardIds[card] = len(self.CardIds)
+            self.Buffer.append(CARD_RECORD)
+            write_varint(self.Buffer,self.PlayerIndexes.get(card.Controller,0))
+            write_string(self.Buffer,card.Name)
+        return card_id
+
+    def record(self,event_type,props):
+        """EventBus callback: append the record for one event"""
+        buffer = self.Buffer
+        if event_type == "start of phase":
+            buffer.append(PHASE_RECORD | self.PlayerIndexes[props["player"]]*8 |\
+              self.PhaseIndexes[props["new phase"]])
+        elif event_type == "creature attacks":
+            attacker_id = self.cardId(props["creature"])
+            target_id = self.cardId(props["target"])
+            buffer.append(ATTACK_RECORD)
+            write_varint(buffer,attacker_id)
+            write_varint(buffer,target_id)
+        elif event_type == "play creature" or event_type == "play spell":
+            card_id = self.cardId(props["creature" if event_type == "play creature" else "spell"])
+            buffer.append(PLAY_RECORD)
+            write_varint(buffer,card_id)
+        elif event_type == "start of turn":
+            buffer.append(TURN_RECORD)
+            write_varint(buffer,props["turn"])
+            if (props["turn"] - 1) % self.KeyframeInterval == 0:
+                self.writeKeyframe(props["turn"])
+                self.flush()
+        elif event_type == "game over":
+            self.end(props["winner"])
+
+    def keyframe(self,turn):
+        """Return the keyframe payload for the game's current state
+
+        turn, then for each player: zigzag health, max health, total mana,
+        current mana, and the hand, board (id and zigzag health for each
+        creature), graveyard and deck, each as a count followed by card ids
+        """
+        payload = bytearray()
+        write_varint(payload,turn)
+        for player in self.Game.PlayOrder:
+            write_varint(payload,zigzag(player.Health))
+            write_varint(payload,zigzag(player.MaxHealth))
+            write_varint(payload,zigzag(player.TotalMana))
+            write_varint(payload,zigzag(player.CurrentMana))
+            for zone in (player.Hand,player.Board,player.Graveyard,player.Deck.Cards):
+                card_ids = [self.cardId(card) for card in zone]
+                write_varint(payload,len(card_ids))
+                for card,card_id in zip(zone,card_ids):
+                    write_varint(payload,card_id)
+                    if zone is player.Board:
+                        write_varint(payload,zigzag(card.CurrentHealth))
+        return payload
+
+    def writeKeyframe(self,turn):
+        payload = self.keyframe(turn)
+        self.Buffer.append(KEYFRAME_RECORD)
+        write_varint(self.Buffer,len(payload))
+        self.Buffer.extend(payload)
+
+    def end(self,winner):
+        """Append the end record (once)"""
+        if self.Ended:
+            return
+        self.Ended = True
+        self.Buffer.append(END_RECORD)
+        write_varint(self.Buffer,0 if winner is None else self.PlayerIndexes[winner] + 1)
+
+    def flush(self):
+        if self.Buffer:
+            self.File.write(self.Buffer)
+            self.Buffer = bytearray()
+
+    def close(self):
+        """Write the end record (for games stopped at a turn limit) and flush. Returns the writer"""
+        if self.Closed:
+            return self
+        self.Closed = True
+        self.end(self.Game.Winner)
+        self.flush()
+        self.Game.Events.unsubscribe(self.record)
+        return self
+
+def record_replay(game,filepath,keyframe_interval=10):
+    """Record game to a new replay file at filepath. Call close() on the result when the game is over"""
+    writer = ReplayWriter(game,open(filepath,"wb"),keyframe_interval=keyframe_interval)
+    close = writer.close
+    def close_file():
+        close()
+        writer.File.close()
+        return writer
+    writer.close = close_file
+    return writer
+
+class ReplayPolicy(PlayPolicy):
+    """Play the cards a replay says a player played, in order"""
+
+    def __init__(self,plays,cards,player_index):
+        """
+        plays -- dict of (turn,player index) to a list of card ids played that turn
+        cards -- dict of card id to the restored card object
+        """
+        self.Plays = plays
+        self.Cards = cards
+        self.PlayerIndex = player_index
+        self.Queue = deque()
+        self.QueueTurn = None
+
+    def chooseCard(self,game,player):
+        if self.QueueTurn != game.Turn:
+            self.QueueTurn = game.Turn
+            self.Queue = deque(self.Plays.get((game.Turn,self.PlayerIndex),()))
+        if not self.Queue:
+            return None
+        return self.Cards[self.Queue.popleft()]
+
+class Replay(object):
+    """A parsed replay file
+
+    Records are decoded on demand: events(from_turn) starts at the turn's
+    record, and keyframe(turn) decodes just the keyframe it needs
+    """
+
+    def __init__(self,data):
+        """data -- the bytes of a replay file"""
+        data = memoryview(bytes(data))
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a replay file")
+        if data[len(MAGIC)] != VERSION:
+            raise ValueError(f"Unsupported replay version {data[len(MAGIC)]}")
+        self.Data = data
+        offset = len(MAGIC) + 1
+        seed,offset = read_varint(data,offset)
+        self.Seed = unzigzag(seed)
+        n_path,offset = read_varint(data,offset)
+        path = []
+        for i in range(n_path):
+            index,offset = read_varint(data,offset)
+            path.append(unzigzag(index))
+        self.Path = tuple(path)
+        self.PlayerNames = []
+        for i in range(2):
+            name,offset = read_string(data,offset)
+            self.PlayerNames.append(name)
+        n_phases,offset = read_varint(data,offset)
+        self.PhaseNames = []
+        for i in range(n_phases):
+            name,offset = read_string(data,offset)
+            self.PhaseNames.append(name)
+        n_names,offset = read_varint(data,offset)
+        names = []
+        for i in range(n_names):
+            name,offset = read_string(data,offset)
+            names.append(name)
+        n_cards,offset = read_varint(data,offset)
+        #CardNames and CardOwners are indexed by card id
+        self.CardNames = list(self.PlayerNames)
+        self.CardOwners = [0,1]
+        for i in range(n_cards):
+            value,offset = read_varint(data,offset)
+            self.CardNames.append(names[value >> 1])
+            self.CardOwners.append(value & 1)
+        self.index(offset)
+
+    @classmethod
+    def load(cls,filepath):
+        with open(filepath,"rb") as f:
+            return cls(f.read())
+
+    def index(self,offset):
+        """Find each turn's first record, each keyframe and the winner"""
+        data = self.Data
+        self.TurnOffsets = {}
+        self.KeyframeOffsets = {}
+        self.Winner = None
+        self.Finished = False
+        turn = 0
+        while offset < len(data):
+            record = data[offset]
+            if record == TURN_RECORD:
+                self.TurnOffsets[turn + 1] = offset
+            offset,event = self.decode(offset,turn)
+            if record == TURN_RECORD:
+                turn = event.turn
+            elif record == KEYFRAME_RECORD:
+                self.KeyframeOffsets[turn] = event.card
+            elif record == END_RECORD:
+                self.Finished = True
+                self.Winner = event.player
+        self.Turns = turn
+
+    def decode(self,offset,turn):
+        """Return (offset of the next record,ReplayEvent) for the record at offset
+
+        Keyframes decode to an event whose card is the payload's offset
+        """
+        data = self.Data
+        record = data[offset]
+        offset += 1
+        if record < TURN_RECORD:
+            return offset,ReplayEvent(turn,"phase",record >> 3,None,record & 7)
+        if record == TURN_RECORD:
+            turn,offset = read_varint(data,offset)
+            return offset,ReplayEvent(turn,"turn",None,None,None)
+        if record == PLAY_RECORD:
+            card_id,offset = read_varint(data,offset)
+            return offset,ReplayEvent(turn,"play",self.CardOwners[card_id],card_id,None)
+        if record == ATTACK_RECORD:
+            attacker_id,offset = read_varint(data,offset)
+            target_id,offset = read_varint(data,offset)
+            return offset,ReplayEvent(turn,"attack",self.CardOwners[attacker_id],attacker_id,target_id)
+        if record == KEYFRAME_RECORD:
+            length,offset = read_varint(data,offset)
+            return offset + length,ReplayEvent(turn,"keyframe",None,offset,None)
+        if record == CARD_RECORD:
+            owner,offset = read_varint(data,offset)
+            name,offset = read_string(data,offset)
+            if len(self.CardNames) == len(self.CardOwners):
+                self.CardNames.append(name)
+                self.CardOwners.append(owner)
+            return offset,ReplayEvent(turn,"new card",owner,None,None)
+        if record == END_RECORD:
+            winner,offset = read_varint(data,offset)
+            return offset,ReplayEvent(turn,"end",winner - 1 if winner else None,None,None)
+        raise ValueError(f"Unknown replay record {record:#x} at offset {offset-1}")
+
+    def events(self,from_turn=1):
+        """Yield the ReplayEvents from the start of from_turn on (keyframes are skipped)
+
+        Phase events have the phase's index in PhaseNames as their target
+        """
+        offset = self.TurnOffsets.get(from_turn)
+        if offset is None:
+            return
+        turn = from_turn - 1
+        while offset < len(self.Data):
+            offset,event = self.decode(offset,turn)
+            turn = event.turn
+            if event.kind != "keyframe":
+                yield event
+
+    def keyframe(self,turn):
+        """Return the Keyframe at or before the start of turn"""
+        keyframe_turns = [t for t in self.KeyframeOffsets if t <= turn]
+        if not keyframe_turns:
+            raise ValueError(f"No keyframe at or before turn {turn}")
+        keyframe_turn = max(keyframe_turns)
+        data = self.Data
+        offset = self.KeyframeOffsets[keyframe_turn]
+        keyframe_turn,offset = read_varint(data,offset)
+        players = []
+        for i in range(2):
+            values = []
+            for j in range(4):
+                value,offset = read_varint(data,offset)
+                values.append(unzigzag(value))
+            zones = []
+            for zone in ("hand","board","graveyard","deck"):
+                n,offset = read_varint(data,offset)
+                card_ids = []
+                for k in range(n):
+                    card_id,offset = read_varint(data,offset)
+                    if zone == "board":
+                        health,offset = read_varint(data,offset)
+                        card_id = (card_id,unzigzag(health))
+                    card_ids.append(card_id)
+                zones.append(tuple(card_ids))
+            players.append(PlayerKeyframe(*values,*zones))
+        return Keyframe(keyframe_turn,tuple(players))
+
+    def plays(self):
+        """Return a dict of (turn,player index) to the card ids that player played that turn"""
+        plays = {}
+        for event in self.events():
+            if event.kind == "play":
+                plays.setdefault((event.turn,event.player),[]).append(event.card)
+        return plays
+
+    def restoreGame(self,card_library,turn=1,game_interface=None):
+        """Return a Game at the start of turn, rebuilt from the nearest keyframe
+
+        Players make the plays recorded in the replay (see ReplayPolicy), so
+        running the returned game carries on exactly as the recorded game did.
+        card_library -- the CardSet the recorded game's cards came from
+        game_interface -- passed on to Game (default: no interface, so nothing is printed)
+        """
+        keyframe = self.keyframe(turn)
+        players = [Player(name=name,deck=Deck([])) for name in self.PlayerNames]
+        game = Game(players[0],players[1],game_interface=game_interface,\
+          rng=GameRNG(self.Seed,self.Path))
+        cards = {}
+        for card_id in range(FIRST_CARD_ID,len(self.CardNames)):
+            owner = players[self.CardOwners[card_id]]
+            cards[card_id] = card_library.getPrototype(self.CardNames[card_id]).makeCard(controller=owner)
+        plays = self.plays()
+        for player_index,(player,state) in enumerate(zip(players,keyframe.players)):
+            player.Health = state.health
+            player.MaxHealth = state.max_health
+            player.TotalMana = state.total_mana
+            player.CurrentMana = state.current_mana
+            for card_id in state.hand + state.graveyard + state.deck + tuple(i for i,h in state.board):
+                cards[card_id].setController(player)
+            player.Hand.extend(cards[card_id] for card_id in state.hand)
+            for card_id,health in state.board:
+                cards[card_id].CurrentHealth = health
+                player.Board.append(cards[card_id])
+            player.Graveyard.extend(cards[card_id] for card_id in state.graveyard)
+            player.Deck.Cards = deque(cards[card_id] for card_id in state.deck)
+            player.Policy = ReplayPolicy(plays,cards,player_index)
+        game.Turn = keyframe.turn - 1
+        if turn > keyframe.turn:
+            game.runGame(wait_for_input=False,max_turns=turn - 1)
+        return game
+
+    def describe(self,from_turn=1):
+        """Return the replay's events as text, one per line"""
+        lines = []
+        for event in self.events(from_turn):
+            if event.kind == "turn":
+                lines.append(f"--- Turn {event.turn} ---")
+            elif event.kind == "phase":
+                lines.append(f"{self.PlayerNames[event.player]}: {self.PhaseNames[event.target]}")
+            elif event.kind == "play":
+                lines.append(f"{self.PlayerNames[event.player]} plays {self.CardNames[event.card]}")
+            elif event.kind == "attack":
+                lines.append(f"{self.CardNames[event.card]} attacks {self.CardNames[event.target]}")
+            elif event.kind == "end":
+                winner = self.PlayerNames[event.player] if event.player is not None else "Nobody"
+                lines.append(f"{winner} wins")
+        return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the events in a replay file")
+    parser.add_argument("replay_path")
+    parser.add_argument("--turn",type=int,default=1,help="Start from this turn")
+    args = parser.parse_args()
+    print(Replay.load(args.replay_path).describe(from_turn=args.turn))
@@ -0,0 +1,256 @@
+"""
+Stream simulation results to columnar files, and analyse them in bounded memory.
+
+A ResultsSink records a row per game and a row per player turn to two
+tables in a results directory. Rows are buffered only until a row group
+(row_group_size rows) is full. Each row group is then written as its own
+.npz file with one array per column, e.g. games.<shard>.000003.npz. Each
+process writes its own shard, so tournament workers flush their results
+straight to disk and the parent never sees individual games.
+
+Readers open one row group at a time and load only the columns they ask
+for (see read_row_groups), so analyses such as card_win_rates run over
+any number of games in constant memory.
+
+games table: one row per game
+  game_id -- the game's stream seed (GameRNG.StreamSeed), also the turns table key
+  seed,stream -- the root seed and stream path of the game's GameRNG, so the
+    game can be replayed (stream is "." joined, e.g. "3.7"). The seed is a
+    signed 64-bit column, so watch() refuses games seeded outside that range
+  deck_1,deck_2 -- the decks of player 1 (who goes first) and player 2
+  winner -- 1 or 2, or 0 for a tie
+  turns -- turns played
+  health_1,health_2 -- each player's health at the end
+  damage_1,damage_2 -- health each player's opponent lost during that player's turns
+  cards_1,cards_2 -- the distinct cards each player played, "|" joined
+turns table: one row per player turn
+  game_id,turn
+  player -- 1 or 2
+  damage -- health the opponent lost during the turn (net of healing)
+  cards -- the cards played during the turn, in order, "|" joined
+"""
+import os
+from collections import namedtuple
+import numpy as np
+
+GAME_COLUMNS = (("game_id","u8"),("seed","i8"),("stream","U"),("deck_1","U"),("deck_2","U"),\
+  ("winner","i1"),("turns","i4"),("health_1","i4"),("health_2","i4"),\
+  ("damage_1","i4"),("damage_2","i4"),("cards_1","U"),("cards_2","U"))
+TURN_COLUMNS = (("game_id","u8"),("turn","i4"),("player","i1"),("damage","i4"),("cards","U"))
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+#The seeds the games table's seed column can hold
+MIN_SEED = -2**63
+MAX_SEED = 2**63 - 1
+
+#A card's results over every game a player played it in. Ties count as half a win in win_rate
+CardStats = namedtuple("CardStats",["games","wins","ties","win_rate"])
+
+def new_shard_name():
+    """Return a shard name unique to this process and call"""
+    return f"{os.getpid()}-{os.urandom(4).hex()}"
+
+class ColumnarWriter(object):
+    """Append rows to a table stored as a directory of row-group files"""
+
+    def __init__(self,directory,table,columns,row_group_size=DEFAULT_ROW_GROUP_SIZE,shard=None):
+        """
+        directory -- the results directory (made if missing)
+        table -- the table name, the first part of each row group's file name
+        columns -- a sequence of (name,numpy dtype) pairs. "U" columns hold strings
+        row_group_size -- rows buffered before a row group is written
+        shard -- this writer's part of the file names (default: new_shard_name())
+        """
+        os.makedirs(directory,exist_ok=True)
+        self.Directory = directory
+        self.Table = table
+        self.Columns = tuple(columns)
+        self.RowGroupSize = row_group_size
+        self.Shard = shard if shard is not None else new_shard_name()
+        self.RowGroups = 0
+        self.Rows = 0
+        self.Buffers = [[] for column in self.Columns]
+
+    def append(self,row):
+        """Add a row (a tuple of values in column order)"""
+        for buffer,value in zip(self.Buffers,row):
+            buffer.append(value)
+        self.Rows += 1
+        if len(self.Buffers[0]) >= self.RowGroupSize:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as a row group, if there are any
+
+        The file is written under a temporary name and then renamed, so
+        readers never see a partly written row group
+        """
+        if not self.Buffers[0]:
+            return
+        arrays = {name:np.array(buffer,dtype=dtype) for (name,dtype),buffer\
+          in zip(self.Columns,self.Buffers)}
+        filepath = os.path.join(self.Directory,f"{self.Table}.{self.Shard}.{self.RowGroups:06d}.npz")
+        temp_filepath = f"{filepath}.tmp"
+        with open(temp_filepath,"wb") as f:
+            np.savez_compressed(f,**arrays)
+        os.replace(temp_filepath,filepath)
+        self.RowGroups += 1
+        self.Buffers = [[] for column in self.Columns]
+
+    def close(self):
+        self.flush()
+
+def row_group_filepaths(directory,table):
+    """Return the sorted paths of table's row-group files in directory"""
+    prefix = f"{table}."
+    return [os.path.join(directory,f) for f in sorted(os.listdir(directory))\
+      if f.startswith(prefix) and f.endswith(".npz")]
+
+def read_row_groups(directory,table,columns=None):
+    """Yield each of table's row groups as a dict of column name to numpy array
+
+    columns -- the names of the columns to load (default: all of them).
+      Other columns are never read from disk
+    """
+    for filepath in row_group_filepaths(directory,table):
+        with np.load(filepath) as row_group:
+            names = columns if columns is not None else row_group.files
+            yield {name:row_group[name] for name in names}
+
+def split_cards(cards):
+    """Return the card names in a "|" joined cards value"""
+    return cards.split("|") if cards else []
+
+class GameRecorder(object):
+    """Collect one game's rows from its events. Made by ResultsSink.watch"""
+
+    EventTypes = ("player turn","play creature","play spell")
+
+    def __init__(self,sink,game,deck_names):
+        self.Sink = sink
+        self.Game = game
+        self.DeckNames = deck_names
+        self.PlayerNumbers = {player:i+1 for i,player in enumerate(game.PlayOrder)}
+        self.Damage = {player:0 for player in game.PlayOrder}
+        self.CardsPlayed = {player:{} for player in game.PlayOrder}
+        #The player whose turn it is, the turn number, their opponent's health at the start of it,
+        #and the cards played so far this turn
+        self.TurnPlayer = None
+        self.TurnNumber = 0
+        self.TurnStartHealth = 0
+        self.TurnCards = []
+        game.Events.subscribe(self.record,self.EventTypes)
+
+    def record(self,event_type,props):
+        if event_type == "player turn":
+            self.endPlayerTurn()
+            self.TurnPlayer = props["player"]
+            self.TurnNumber = self.Game.Turn
+            self.TurnStartHealth = props["player"].Opponent.Health
+        else:
+            card = props["creature" if event_type == "play creature" else "spell"]
+            self.TurnCards.append(card.Name)
+            self.CardsPlayed[props["player"]][card.Name] = None
+
+    def endPlayerTurn(self):
+        """Write the row for the turn that just ended"""
+        player = self.TurnPlayer
+        if player is None:
+            return
+        damage = self.TurnStartHealth - player.Opponent.Health
+        self.Damage[player] += damage
+        if self.Sink.Turns is not None:
+            self.Sink.Turns.append((self.Game.RNG.StreamSeed,self.TurnNumber,\
+              self.PlayerNumbers[player],damage,"|".join(self.TurnCards)))
+        self.TurnPlayer = None
+        self.TurnCards = []
+
+    def close(self):
+        """Write the game's row (and its last turn's row). Call once the game is over"""
+        self.endPlayerTurn()
+        self.Game.Events.unsubscribe(self.record)
+        game = self.Game
+        player_1,player_2 = game.PlayOrder
+        rng = game.RNG
+        self.Sink.Games.append((rng.StreamSeed,rng.Seed,".".join(str(i) for i in rng.Path),\
+          self.DeckNames[0],self.DeckNames[1],self.PlayerNumbers.get(game.Winner,0),game.Turn,\
+          player_1.Health,player_2.Health,self.Damage[player_1],self.Damage[player_2],\
+          "|".join(self.CardsPlayed[player_1]),"|".join(self.CardsPlayed[player_2])))
+
+class ResultsSink(object):
+    """Write per-game and per-turn results to a results directory
+
+    Use watch() on each game before it runs and close() the recorder it
+    returns when the game is over. Close the sink when done to write the
+    last, partial row groups
+    """
+
+    def __init__(self,directory,row_group_size=DEFAULT_ROW_GROUP_SIZE,shard=None,record_turns=True):
+        """
+        directory -- the results directory. Several sinks (e.g. one per worker
+          process) can write to the same directory
+        row_group_size -- rows per row group file
+        shard -- the name of this sink's files (default: new_shard_name())
+        record_turns -- also write the turns table
+        """
+        self.Directory = directory
+        shard = shard if shard is not None else new_shard_name()
+        self.Games = ColumnarWriter(directory,"games",GAME_COLUMNS,row_group_size,shard)
+        self.Turns = None
+        if record_turns:
+            self.Turns = ColumnarWriter(directory,"turns",TURN_COLUMNS,row_group_size,shard)
+
+    def watch(self,game,deck_names):
+        """Start recording game. Returns a GameRecorder to close() once the game is over
+
+        deck_names -- the names of player 1's and player 2's decks
+        """
+        seed = game.RNG.Seed
+        if not MIN_SEED <= seed <= MAX_SEED:
+            raise ValueError(f"Can't record a game seeded with {seed}: results seeds must fit in 64 signed bits")
+        return GameRecorder(self,game,deck_names)
+
+    def flush(self):
+        self.Games.flush()
+        if self.Turns is not None:
+            self.Turns.flush()
+
+    def close(self):
+        self.flush()
+
+def card_win_rates(directory):
+    """Return a dict of card name to CardStats, for the players who played each card
+
+    Streams over the games table one row group at a time, reading only
+    the winner and cards played columns
+    """
+    games = {}
+    wins = {}
+    ties = {}
+    for row_group in read_row_groups(directory,"games",columns=("winner","cards_1","cards_2")):
+        for winner,cards_1,cards_2 in zip(row_group["winner"].tolist(),\
+          row_group["cards_1"].tolist(),row_group["cards_2"].tolist()):
+            for player_number,cards in ((1,cards_1),(2,cards_2)):
+                for card_name in split_cards(cards):
+                    games[card_name] = games.get(card_name,0) + 1
+                    if winner == player_number:
+                        wins[card_name] = wins.get(card_name,0) + 1
+                    elif winner == 0:
+                        ties[card_name] = ties.get(card_name,0) + 1
+    stats = {}
+    for card_name,n_games in games.items():
+        n_wins = wins.get(card_name,0)
+        n_ties = ties.get(card_name,0)
+        stats[card_name] = CardStats(n_games,n_wins,n_ties,(n_wins + 0.5*n_ties)/n_games)
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Print each card's win rate from a results directory")
+    parser.add_argument("results_dir")
+    args = parser.parse_args()
+    stats = card_win_rates(args.results_dir)
+    print("card\tgames\twins\tties\twin_rate")
+    for card_name,card_stats in sorted(stats.items(),key=lambda item:-item[1].win_rate):
+        print(f"{card_name}\t{card_stats.games}\t{card_stats.wins}\t{card_stats.ties}\t{card_stats.win_rate:.3f}")
@@ -0,0 +1,108 @@
+"""
+Seedable random number generators, so games can be reproduced.
+
+A Game owns a GameRNG (Game.RNG) and every random choice in the rules
+(deck shuffles, random targets, discards, resurrections, attack
+targets) is drawn from it. Playing the same decks with the same seed
+replays the same game.
+
+Generators can be split into independent streams. Each stream is
+identified by the root seed and a path of stream numbers, and its own
+seed is a hash of the two. A stream's numbers don't depend on how many
+numbers were drawn from its parent. That makes paired comparisons
+simple: play game i of two experiments with GameRNG(seed).stream(i) and
+both policies see the same shuffles. Pool workers can take one stream
+each.
+"""
+import os
+import random
+import hashlib
+
+MASK_64 = (1 << 64) - 1
+
+def derive_seed(seed,path):
+    """Return a 64-bit seed for the stream at path (a tuple of ints) under seed"""
+    digest = hashlib.sha256(repr((seed,tuple(path))).encode()).digest()
+    return int.from_bytes(digest[:8],"little")
+
+def mix_seed(seed,n):
+    """Return a 64-bit seed for jump n of a stream seeded with seed (one splitmix64 step)
+
+    Cheaper than derive_seed, as the engine jumps once per turn (see Game.runGame)
+    """
+    z = (seed + (n+1)*0x9E3779B97F4A7C15) & MASK_64
+    z = ((z ^ (z >> 30))*0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27))*0x94D049BB133111EB) & MASK_64
+    return z ^ (z >> 31)
+
+class GameRNG(random.Random):
+    """A random.Random that can be split into independent streams and jumped
+
+    Seed -- the root seed (an int). Drawn from os.urandom if not given, so a
+      game played without a seed can still be replayed from its Seed
+    Path -- the stream numbers leading from the root generator to this one
+    """
+
+    def __init__(self,seed=None,path=()):
+        if seed is None:
+            #63 bits, so the seed fits results.py's signed 64-bit seed column
+            seed = int.from_bytes(os.urandom(8),"little") >> 1
+        self.Seed = seed
+        self.Path = tuple(path)
+        self.Jumps = 0
+        self.Splits = 0
+        self.StreamSeed = derive_seed(self.Seed,self.Path)
+        random.Random.__init__(self,self.StreamSeed)
+
+    def __repr__(self):
+        return f"GameRNG(seed={self.Seed},path={self.Path},jumps={self.Jumps})"
+
+    def __reduce__(self):
+        #random.Random pickles only its internal state; keep the stream identity too
+        return (self.__class__,(self.Seed,self.Path),(self.getstate(),self.Jumps,self.Splits))
+
+    def __setstate__(self,state):
+        internal_state,self.Jumps,self.Splits = state
+        self.setstate(internal_state)
+
+    def reseed(self,seed):
+        """Start again from a new root seed, as GameRNG(seed) would"""
+        self.__init__(seed)
+
+    def stream(self,index):
+        """Return the generator for this generator's stream number index
+
+        The result depends only on Seed, Path and index, never on how many
+        numbers have been drawn
+        """
+        return self.__class__(self.Seed,self.Path + (index,))
+
+    def split(self):
+        """Return a new, independent generator: the next of this generator's streams
+
+        The first call returns stream(0), the next stream(1), and so on
+        """
+        child = self.stream(self.Splits)
+        self.Splits += 1
+        return child
+
+    def jump(self,n=1):
+        """Move this generator n jumps ahead, to a fresh sequence of numbers
+
+        Like a jump-ahead in other generators: the numbers after a jump don't
+        overlap the numbers before it, and jump(2) lands where jump() twice
+        does. Returns self
+        """
+        return self.jumpTo(self.Jumps + n)
+
+    def jumpTo(self,jumps):
+        """Go to the start of the sequence jump(jumps) would reach from a new generator
+
+        Returns self
+        """
+        self.Jumps = jumps
+        if jumps:
+            random.Random.seed(self,mix_seed(self.StreamSeed,jumps))
+        else:
+            random.Random.seed(self,self.StreamSeed)
+        return self
@@ -3,12 +3,16 @@ Run the Game.
 """
 import arcade
 import os
-import pandas as pd
 from random import randint,choice,shuffle
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from rorschach.code.deck import CardSet,EffectSet,load_deck,Deck
+from rorschach.code.card_cache import load_card_set
+from rorschach.code.tsv import write_tsv
 from rorschach.code.player import Player
 from rorschach.code.game import Game
+from rorschach.code.policy import MCTSPolicy
+from rorschach.code.card_sprites import get_card_sprite_pool
 
 # Screen title and size
 SCREEN_WIDTH = 1024
@@ -165,6 +169,11 @@ class TextReport(object):
 
 class GameView(arcade.View):
     """Show the consequences of game actions"""
+
+    #Game events this view subscribes to (see Game.Events)
+    EventTypes = ("start of phase","gain mana","draw","discard","play creature","play spell",\
+      "creature attacks","player damaged","creature dies","game over")
+
     def init(self):
         super().__init__()
 
@@ -172,7 +181,11 @@ class GameView(arcade.View):
         """Set up the Game screen"""
         self.Spacing = SpaceManager(n_columns = 15, n_rows = 6)
 
-        self.PlayerHand = arcade.SpriteList()
+        #Card sprites come from (and go back to) the pool shared by every view
+        self.Pool = get_card_sprite_pool()
+        self.CardSprites = []
+
+        self.PlayerHand = self.Pool.Textures.spriteList()
 
         self.PlayerHandMat = arcade.SpriteList()
         self.draw_mat_row(self.Spacing.Row[0],n_columns = 10,sprite_list=self.PlayerHandMat)
@@ -180,28 +193,27 @@ class GameView(arcade.View):
         self.PlayerBoardMat = arcade.SpriteList()
         self.draw_mat_row(self.Spacing.Row[1],n_columns = 10, sprite_list=self.PlayerBoardMat)
         
-        self.PlayerBoard = arcade.SpriteList()
+        self.PlayerBoard = self.Pool.Textures.spriteList()
 
         self.LocationBoardMat = arcade.SpriteList()
         self.draw_mat_row(self.Spacing.Row[2],n_columns = 10, sprite_list=self.LocationBoardMat)
 
-        self.LocationBoard = arcade.SpriteList()
+        self.LocationBoard = self.Pool.Textures.spriteList()
              
         self.OpponentBoardMat = arcade.SpriteList()
         self.draw_mat_row(self.Spacing.Row[3],n_columns = 10,sprite_list = self.OpponentBoardMat)
 
-        self.OpponentBoard = arcade.SpriteList()
+        self.OpponentBoard = self.Pool.Textures.spriteList()
 
         self.OpponentHandMat = arcade.SpriteList()
         self.draw_mat_row(self.Spacing.Row[4],n_columns = 10,sprite_list = self.OpponentHandMat)
 
-        self.OpponentHand = arcade.SpriteList()
+        self.OpponentHand = self.Pool.Textures.spriteList()
 
         #Load set data
         card_data_filepath = "../data/card_data/basic_card_set.txt"
         effect_data_filepath = "../data/effect_data/effect_data.txt"
-        basic_effects = EffectSet(effect_data_filepath)
-        basic_cards = CardSet(card_data_filepath,effect_library=basic_effects)
+        basic_cards = load_card_set(card_data_filepath,effect_data_filepath)
 
         #Load decks
         player_1_name = "Player"
@@ -218,26 +230,33 @@ class GameView(arcade.View):
         player_2_deck_cards = load_deck(player_2_deck_path,card_library=basic_cards)
         player_2_deck = Deck(player_2_deck_cards)
         print(f"{player_2_name} decklist:", player_2_deck.toDeckList())
-        player_2 = Player(name = player_2_name,deck=player_2_deck)
-        
-       
-        for c in player_1.Deck:
-                card_sprite = CardImage(c.CardImageFilepath,scale=self.Spacing.CardScale,card=c)
-                c.CardImage = card_sprite
-
-        for c in player_2.Deck:
-                card_sprite = CardImage(c.CardImageFilepath,scale=self.Spacing.CardScale,card=c)
-                c.CardImage = card_sprite
+        #The AI searches for at most half a second per card, on the policy thread
+        #(see chooseNextCard), so the window keeps drawing while it thinks
+        player_2 = Player(name = player_2_name,deck=player_2_deck,\
+          policy=MCTSPolicy(iterations=None,time_limit=0.5))
 
         print("ABOUT TO RUN GAME!!!!!")
 
         #Set some properties for the game
         self.Game = Game(player_1,player_2,game_interface=self)
+
+        #Card textures load in the background, so the screen is up straight away.
+        #Cards show a placeholder until then; the opening hands and first draws
+        #(the top of each deck, now the Game has shuffled it) load first
+        for player in (player_1,player_2):
+            for i,c in enumerate(player.Deck):
+                card_sprite = self.Pool.acquireAsync(c,scale=self.Spacing.CardScale,priority=i)
+                self.CardSprites.append(card_sprite)
+
         self.Turn = 0 
         self.GameOrder = [player_1,player_2]
         self.ActivePlayer = self.GameOrder[0]
         self.CurrentTurnOver = True
         self.CurrentPhaseOver = True
+        #Policies choose cards on their own thread, as a search can take a while
+        self.PolicyThread = ThreadPoolExecutor(max_workers=1)
+        self.CardChoice = None
+        self.ChoosingPlayer = None
         self.Winner = None
         self.CurrentPhaseIndex = 0
         self.CurrentPhase = None
@@ -333,19 +352,24 @@ class GameView(arcade.View):
                 #        card_to_play = self.OpponentHand.pop(i)
                 #        break
                  
-        if specific_event == "creature_dies":
+        if specific_event == "creature dies":
             player = event_properties['player']
             card = event_properties['creature']
             if player is self.Game.Player1:
-                self.remove(card,self.PlayerBoard)
+                self.remove(card.CardImage,self.PlayerBoard)
             elif player is self.Game.Player2:
-                self.remove(card,self.OpponentBoard)
+                self.remove(card.CardImage,self.OpponentBoard)
  
     def remove(self,card,spritelist):
-        """Remove card from spritelist and return it"""
-        for i,card_image in enumerate(spritelist):
-            if card_image is card:
-                return spritelist.pop(i)
+        """Remove card from spritelist and return it (None if it isn't there)
+
+        SpriteList.remove looks sprites up by slot rather than scanning the list
+        """
+        try:
+            spritelist.remove(card)
+        except ValueError:
+            return None
+        return card
  
     def updateScreen(self):
         self.TurnReport.text = f"Turn:{self.Turn}"
@@ -390,13 +414,49 @@ class GameView(arcade.View):
         print(self.CurrentPhaseIndex)
         print(self.Game.Phases)
         self.CurrentPhase = self.Game.Phases[self.CurrentPhaseIndex]
+        if self.CurrentPhase == "Play":
+            self.startPlayPhase(player)
+            return
         self.Game.doPhase(player,self.CurrentPhase)
+        self.finishPhase()
+
+    def finishPhase(self):
         self.PhaseOver = True
         self.CurrentPhaseIndex += 1
         if not self.CurrentPhaseIndex < len(self.Game.Phases):
             self.CurrentPhaseIndex = 0
             self.nextTurn()
         
+    def startPlayPhase(self,player):
+        """Start the Play phase like Game.doPhase, but choose cards off the main thread"""
+        events = self.Game.Events
+        if events.wants("start of phase"):
+            events.publish("start of phase",{"player":player,"new phase":"Play"})
+        self.CurrentPhaseOver = False
+        self.chooseNextCard(player)
+
+    def chooseNextCard(self,player):
+        """Ask player's Policy for its next card on the policy thread (see finishChoosingCard)
+
+        Only the main thread changes the game, and not while a choice is pending
+        """
+        self.ChoosingPlayer = player
+        self.CardChoice = self.PolicyThread.submit(player.Policy.chooseCard,self.Game,player)
+
+    def finishChoosingCard(self):
+        """Once the policy has chosen, play its card and ask for the next, or end the Play phase"""
+        if self.CardChoice is None or not self.CardChoice.done():
+            return
+        player = self.ChoosingPlayer
+        card = self.CardChoice.result()
+        self.CardChoice = None
+        if self.Game.playChosenCard(player,card):
+            self.chooseNextCard(player)
+            return
+        self.Game.endPlayPhase(player)
+        self.CurrentPhaseOver = True
+        self.finishPhase()
+
     def checkForWinner(self,player1,player2):
         winner = None
         if player1.Health <= 0 and player2.Health <=0:
@@ -430,8 +490,16 @@ class GameView(arcade.View):
         """ This is run once when we switch to this view """
         arcade.set_background_color(arcade.color.AMAZON)
 
+    def on_hide_view(self):
+        """Give the card sprites back to the pool for the next view"""
+        self.Pool.releaseAll(self.CardSprites)
+        self.CardSprites = []
+
     def on_update(self,delta_time):
         """Update things"""
+        #Swap in any card textures that finished loading
+        self.Pool.Textures.poll()
+
         for i,c in enumerate(self.Game.Player1.Hand):
             c.CardImage.position = self.PlayerHandMat[i].position
         
@@ -448,6 +516,7 @@ class GameView(arcade.View):
         for r in self.Reports:
             r.update()
 
+        self.finishChoosingCard()
         if self.Timer > 0:
             self.Timer -= delta_time
         elif self.Timer <= 0 and self.CurrentPhaseOver:
@@ -534,8 +603,7 @@ class DraftView(arcade.View):
         #Load set data
         card_data_filepath = "../data/card_data/basic_card_set.txt"
         effect_data_filepath = "../data/effect_data/effect_data.txt"
-        basic_effects = EffectSet(effect_data_filepath)
-        basic_cards = CardSet(card_data_filepath,effect_library=basic_effects)
+        basic_cards = load_card_set(card_data_filepath,effect_data_filepath)
         possible_cards = basic_cards.Cards
         for c in possible_cards:
             print(c.Name,c.CardImageFilepath)
@@ -618,7 +686,9 @@ class DraftView(arcade.View):
         """ Set up the game here. Call this function to restart the game. """
         
         # Sprite list with all the cards, no matter what pile they are in.
-        self.CardList = arcade.SpriteList()
+        # The sprites come from (and go back to) the pool shared by every view
+        self.Pool = get_card_sprite_pool()
+        self.CardList = self.Pool.Textures.spriteList()
         
         self.DeckFile = self.getDeckFilepath()
 
@@ -643,7 +713,7 @@ class DraftView(arcade.View):
         
         
         for i,card in enumerate(deck):
-            card_sprite = CardImage(card,scale=self.CardScale)
+            card_sprite = self.Pool.acquire(card,scale=self.CardScale)
             card_sprite.position = (self.CardStartX,self.CardStartY)
             card_sprite.name = card_name_list[i]
             self.CardList.append(card_sprite)
@@ -766,7 +836,7 @@ class DraftView(arcade.View):
              
             # Might be a stack of cards, get the top one
             primary_card = cards[-1]
-            primary_card.scale = self.EnlargedCardScale
+            primary_card.setCardScale(self.EnlargedCardScale)
             
             # All other cases, grab the face-up card we are clicking on
             self.HeldCards = [primary_card]
@@ -778,6 +848,10 @@ class DraftView(arcade.View):
             self.pull_to_top(primary_card)
 
 
+    def on_hide_view(self):
+        """Give the card sprites back to the pool for the next view"""
+        self.Pool.releaseAll(self.CardList)
+
     def on_draw(self):
         """ Render the screen. """
         # Clear the screen
@@ -865,7 +939,7 @@ class DraftView(arcade.View):
                 returned_card.position = self.HeldCardsOriginalPosition[i]
                 
         for c in self.HeldCards:
-            c.scale = self.CardScale
+            c.setCardScale(self.CardScale)
 
         self.HeldCards = []
         self.HeldCardsOriginalPosition = []
@@ -893,31 +967,7 @@ class DraftView(arcade.View):
         for card,copies in deck_as_dict.items():
             row_list.append([card,copies])
 
-        deck_df = pd.DataFrame(row_list,\
-          columns=['card_name', 'copies'])
-
-        deck_df = deck_df.set_index('card_name')
-        
-        deck_df.to_csv(filepath,sep="\t")
-
-class CardImage(arcade.Sprite):
-    """ Card sprite """
-
-    def __init__(self, card_image_fp, scale=1,card=None):
-        """ Card constructor """
-
-        self.CardImage = card_image_fp
-        self.Active = True
-        self.Card = card
-        if self.Card:
-            self.Card.CardImage = self
-        # Call the parent
-        super().__init__(self.CardImage, scale, hit_box_algorithm="None")
-
-
-
-
-
+        write_tsv(filepath,['card_name', 'copies'],row_list)
 
 def main():
     """ Main function """
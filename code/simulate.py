@@ -0,0 +1,125 @@
+"""
+Play complete games headlessly: no input prompts and no console output.
+"""
+import os
+from collections import namedtuple
+from rorschach.code.card_cache import load_card_set,DEFAULT_CARD_DATA_FP,DEFAULT_EFFECT_DATA_FP
+from rorschach.code.deck import Deck,load_decklist,build_deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+from rorschach.code.policy import MCTSPolicy
+from rorschach.code.rng import GameRNG
+from rorschach.code.replay import record_replay
+
+#The outcome of a single simulated game. winner is the name of the winning
+#player, or None for a tie (including games stopped at max_turns)
+GameResult = namedtuple("GameResult",["winner","turns","player_1_name","player_1_health",\
+  "player_2_name","player_2_health"])
+
+def load_card_library(card_data_fp=DEFAULT_CARD_DATA_FP,effect_data_fp=DEFAULT_EFFECT_DATA_FP,\
+  use_cache=True):
+    """Load an EffectSet and the CardSet that uses it (through card_cache)"""
+    return load_card_set(card_data_fp,effect_data_fp,use_cache=use_cache)
+
+def simulate_game(decklist_1,decklist_2,card_library,player_1_name="Player 1",\
+  player_2_name="Player 2",max_turns=100,player_1_policy=None,player_2_policy=None,rng=None,\
+  replay_filepath=None,results_sink=None,deck_names=None,profiler=None):
+    """Play one game between two decklists and return a GameResult
+
+    decklist_1,decklist_2 -- lists of (card_name,copies) tuples (see deck.load_decklist)
+    card_library -- the CardSet used to build fresh cards for each deck
+    max_turns -- games still running after this many turns are ties
+    player_1_policy,player_2_policy -- PlayPolicy objects (default: GreedyPolicy)
+    rng -- the GameRNG for the game (a new, randomly seeded one by default)
+    replay_filepath -- if given, record the game to a replay file here (see replay.py)
+    results_sink -- if given, a results.ResultsSink to record the game's results to
+    deck_names -- the decks' names for results_sink (default: the player names)
+    profiler -- a profiling.GameProfiler to add the game's phase, effect and target times to
+    """
+    player_1 = Player(name=player_1_name,deck=Deck(build_deck(decklist_1,card_library)),\
+      policy=player_1_policy)
+    player_2 = Player(name=player_2_name,deck=Deck(build_deck(decklist_2,card_library)),\
+      policy=player_2_policy)
+    game = Game(player_1,player_2,rng=rng,profiler=profiler)
+    replay = record_replay(game,replay_filepath) if replay_filepath else None
+    recorder = None
+    if results_sink is not None:
+        recorder = results_sink.watch(game,deck_names or (player_1_name,player_2_name))
+    winner = game.runGame(wait_for_input=False,max_turns=max_turns)
+    if replay is not None:
+        replay.close()
+    if recorder is not None:
+        recorder.close()
+    winner_name = winner.Name if winner is not None else None
+    return GameResult(winner_name,game.Turn,player_1.Name,player_1.Health,\
+      player_2.Name,player_2.Health)
+
+def simulate_games(deck_1_path,deck_2_path,n_games,card_library=None,\
+  player_1_name="Player 1",player_2_name="Player 2",max_turns=100,\
+  player_1_policy=None,player_2_policy=None,seed=None,replay_dir=None,\
+  results_dir=None):
+    """Play n_games complete games between two decklists with no prompts or console output
+
+    deck_1_path,deck_2_path -- paths to .tsv decklists (card_name\\tcopies)
+    n_games -- the number of games to play
+    card_library -- a CardSet. Loaded from the default card data if not provided
+    max_turns -- games still running after this many turns are ties
+    player_1_policy,player_2_policy -- PlayPolicy objects (default: GreedyPolicy)
+    seed -- game i draws from stream i of GameRNG(seed), so two runs with the same
+      seed (e.g. with different policies) play paired games with the same shuffles
+    replay_dir -- if given, record game i to game_<i>.replay in this directory
+    results_dir -- if given, stream each game's results to this directory (see results.py)
+
+    Returns a list of GameResult tuples, one per game
+    """
+    if card_library is None:
+        card_library = load_card_library()
+    decklist_1 = load_decklist(deck_1_path)
+    decklist_2 = load_decklist(deck_2_path)
+    rng = GameRNG(seed)
+    if replay_dir is not None:
+        os.makedirs(replay_dir,exist_ok=True)
+    results_sink = None
+    deck_names = [os.path.splitext(os.path.basename(p))[0] for p in (deck_1_path,deck_2_path)]
+    if results_dir is not None:
+        from rorschach.code.results import ResultsSink
+        results_sink = ResultsSink(results_dir)
+    results = []
+    for i in range(n_games):
+        replay_filepath = None
+        if replay_dir is not None:
+            replay_filepath = os.path.join(replay_dir,f"game_{i}.replay")
+        result = simulate_game(decklist_1,decklist_2,card_library,\
+          player_1_name=player_1_name,player_2_name=player_2_name,max_turns=max_turns,\
+          player_1_policy=player_1_policy,player_2_policy=player_2_policy,rng=rng.stream(i),\
+          replay_filepath=replay_filepath,results_sink=results_sink,deck_names=deck_names)
+        results.append(result)
+    if results_sink is not None:
+        results_sink.close()
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    from collections import Counter
+    parser = argparse.ArgumentParser(description="Play headless games between two decklists")
+    parser.add_argument("deck_1_path")
+    parser.add_argument("deck_2_path")
+    parser.add_argument("-n","--n_games",type=int,default=100)
+    parser.add_argument("--max_turns",type=int,default=100)
+    parser.add_argument("--seed",type=int,default=None)
+    parser.add_argument("--replay_dir",default=None,help="Record a replay of each game here")
+    parser.add_argument("--results_dir",default=None,help="Stream per-game and per-turn results here")
+    parser.add_argument("--mcts_iterations",type=int,default=None,\
+      help="Player 1 uses MCTS with this many iterations per decision (default: greedy)")
+    args = parser.parse_args()
+
+    player_1_policy = None
+    if args.mcts_iterations:
+        player_1_policy = MCTSPolicy(iterations=args.mcts_iterations)
+    results = simulate_games(args.deck_1_path,args.deck_2_path,args.n_games,max_turns=args.max_turns,\
+      player_1_policy=player_1_policy,seed=args.seed,replay_dir=args.replay_dir,\
+      results_dir=args.results_dir)
+    wins = Counter(r.winner for r in results)
+    for winner,n_wins in wins.most_common():
+        print(f"{winner or 'Tie'}: {n_wins}/{len(results)}")
+    print("Mean turns:",sum(r.turns for r in results)/len(results))
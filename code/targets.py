@@ -0,0 +1,90 @@
+"""
+Target types for effects, such as "random enemy minion" or "opponent".
+
+Each target type has a selector, which picks the targets, and a check,
+which says whether the selector would find any targets without building
+a list or touching random state. Effects look up their target types once,
+when they are made (see compile_target_selectors), and Card.getTargets
+and Card.hasLegalTargets call the compiled functions directly.
+
+New target types are added with register_target_type.
+"""
+
+#target type -> (select,has_targets)
+#  select(controller,n_targets) returns a list of targets
+#  has_targets(controller,n_targets) returns True if select would return any
+TARGET_TYPES = {}
+
+def register_target_type(target_type,select,has_targets):
+    """Add (or replace) a target type
+    target_type -- the name used in effect data, e.g. "random enemy minion"
+    select -- a function (controller,n_targets) returning a list of targets
+    has_targets -- a function (controller,n_targets) returning True if select
+      would find any targets. It must not change anything
+    """
+    TARGET_TYPES[target_type] = (select,has_targets)
+
+def compile_target_selectors(required_targets):
+    """Return a tuple of (target_type,n_targets,select,has_targets) for an effect
+
+    required_targets -- a dict of target type:number of targets
+    """
+    compiled = []
+    for target_type,n_targets in required_targets.items():
+        if target_type not in TARGET_TYPES:
+            raise NotImplementedError(f"Target type {target_type} is not recognized")
+        select,has_targets = TARGET_TYPES[target_type]
+        compiled.append((target_type,n_targets,select,has_targets))
+    return tuple(compiled)
+
+def _always(controller,n_targets):
+    return True
+
+def _has_enemy_minions(controller,n_targets):
+    return controller.Opponent is not None and bool(controller.Opponent.Board)
+
+def _has_friendly_minions(controller,n_targets):
+    return bool(controller.Board)
+
+def _has_any_minions(controller,n_targets):
+    return bool(controller.Board) or _has_enemy_minions(controller,n_targets)
+
+def _has_friendly_damaged_minions(controller,n_targets):
+    return bool(controller.Board.Damaged)
+
+#Selectors are named functions rather than lambdas so compiled effects can be pickled
+def _random_enemy_minions(controller,n_targets):
+    return controller.getRandomEnemyMinions(n=n_targets)
+
+def _all_minions(controller,n_targets):
+    return controller.getAllMinions()
+
+def _all_enemy_minions(controller,n_targets):
+    return controller.getAllEnemyMinions()
+
+def _random_friendly_minions(controller,n_targets):
+    return controller.getRandomFriendlyMinions(n=n_targets)
+
+def _random_friendly_damaged_minions(controller,n_targets):
+    return controller.getRandomFriendlyDamagedMinions(n=n_targets)
+
+def _controller(controller,n_targets):
+    return [controller]
+
+def _opponent(controller,n_targets):
+    return [controller.Opponent]
+
+def _all_players(controller,n_targets):
+    return [controller,controller.Opponent]
+
+register_target_type("random enemy minion",_random_enemy_minions,_has_enemy_minions)
+register_target_type("all minions",_all_minions,_has_any_minions)
+register_target_type("all enemy minions",_all_enemy_minions,_has_enemy_minions)
+register_target_type("random friendly minion",_random_friendly_minions,_has_friendly_minions)
+#The plural used by "Damage a random friendly creature {X}"
+register_target_type("random friendly minions",_random_friendly_minions,_has_friendly_minions)
+register_target_type("random friendly damaged minions",_random_friendly_damaged_minions,\
+  _has_friendly_damaged_minions)
+register_target_type("controller",_controller,_always)
+register_target_type("opponent",_opponent,_always)
+register_target_type("all players",_all_players,_always)
@@ -0,0 +1,197 @@
+"""
+Play every pair of decklists against each other across a pool of worker processes.
+"""
+import os
+import math
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor,as_completed
+from rorschach.code.deck import load_decklist
+from rorschach.code.simulate import simulate_game,load_card_library
+from rorschach.code.rng import GameRNG
+
+#Each worker process loads the card library once, in _init_worker,
+#and reuses it for every game it plays
+_worker_card_library = None
+#...and streams game results to its own shard of the results directory, if any
+_worker_results_sink = None
+
+def _init_worker(card_data_fp,effect_data_fp,results_dir=None):
+    """Load the EffectSet/CardSet once for this process, and open its ResultsSink"""
+    global _worker_card_library,_worker_results_sink
+    _worker_card_library = load_card_library(card_data_fp,effect_data_fp)
+    _worker_results_sink = None
+    if results_dir is not None:
+        from rorschach.code.results import ResultsSink
+        _worker_results_sink = ResultsSink(results_dir)
+        #Write the last partial row groups when the worker process exits
+        Finalize(_worker_results_sink,_worker_results_sink.close,exitpriority=10)
+
+def _play_matchup_chunk(i,j,decklist_i,decklist_j,n_games,max_turns,rng,deck_names=None):
+    """Play n_games of deck i against deck j, alternating who goes first
+
+    rng -- a GameRNG for this chunk. Game g draws from its stream g
+    deck_names -- the names of decks i and j, for the worker's ResultsSink
+
+    Returns (i,j,wins for i,wins for j,ties)
+    """
+    name_i,name_j = deck_names or ("i","j")
+    wins_i = wins_j = ties = 0
+    for game_number in range(n_games):
+        #Swap seats every other game so going first isn't counted as deck strength
+        if game_number % 2 == 0:
+            result = simulate_game(decklist_i,decklist_j,_worker_card_library,\
+              player_1_name="i",player_2_name="j",max_turns=max_turns,rng=rng.stream(game_number),\
+              results_sink=_worker_results_sink,deck_names=(name_i,name_j))
+        else:
+            result = simulate_game(decklist_j,decklist_i,_worker_card_library,\
+              player_1_name="j",player_2_name="i",max_turns=max_turns,rng=rng.stream(game_number),\
+              results_sink=_worker_results_sink,deck_names=(name_j,name_i))
+        if result.winner == "i":
+            wins_i += 1
+        elif result.winner == "j":
+            wins_j += 1
+        else:
+            ties += 1
+    return i,j,wins_i,wins_j,ties
+
+def wilson_interval(successes,n,z=1.96):
+    """Return the (low,high) Wilson score interval for a binomial proportion
+
+    successes -- number of successes (may be fractional, e.g. ties counted as half wins)
+    n -- number of trials
+    z -- the normal quantile for the desired confidence (1.96 ~ 95%)
+    """
+    if n == 0:
+        return (0.0,1.0)
+    p = successes/n
+    denominator = 1 + z**2/n
+    center = (p + z**2/(2*n))/denominator
+    half_width = z*math.sqrt(p*(1-p)/n + z**2/(4*n**2))/denominator
+    return (max(0.0,center - half_width),min(1.0,center + half_width))
+
+def find_decks(deck_dir="../data/decks/"):
+    """Return sorted paths to every decklist (.tsv or .txt) in deck_dir"""
+    deck_files = [f for f in os.listdir(deck_dir) if f.endswith(".tsv") or f.endswith(".txt")]
+    return [os.path.join(deck_dir,f) for f in sorted(deck_files)]
+
+class TournamentResult(object):
+    """Pairwise results of a round-robin tournament"""
+
+    def __init__(self,deck_names):
+        """deck_names -- a list of names, one per deck, in matrix order"""
+        self.DeckNames = deck_names
+        n_decks = len(deck_names)
+        #Wins[i][j] is the number of games deck i won against deck j
+        self.Wins = [[0]*n_decks for i in range(n_decks)]
+        self.Ties = [[0]*n_decks for i in range(n_decks)]
+
+    def addResults(self,i,j,wins_i,wins_j,ties):
+        """Record results from a batch of games between deck i and deck j"""
+        self.Wins[i][j] += wins_i
+        self.Wins[j][i] += wins_j
+        self.Ties[i][j] += ties
+        self.Ties[j][i] += ties
+
+    def games(self,i,j):
+        """Return the number of games played between deck i and deck j"""
+        return self.Wins[i][j] + self.Wins[j][i] + self.Ties[i][j]
+
+    def winRate(self,i,j):
+        """Return deck i's win rate against deck j (ties count as half a win), or None"""
+        n = self.games(i,j)
+        if not n:
+            return None
+        return (self.Wins[i][j] + 0.5*self.Ties[i][j])/n
+
+    def confidenceInterval(self,i,j,z=1.96):
+        """Return the Wilson interval around deck i's win rate against deck j"""
+        return wilson_interval(self.Wins[i][j] + 0.5*self.Ties[i][j],self.games(i,j),z=z)
+
+    def winRateMatrix(self):
+        """Return a list of lists of win rates (None on the diagonal)"""
+        n_decks = len(self.DeckNames)
+        return [[self.winRate(i,j) if i != j else None for j in range(n_decks)]\
+          for i in range(n_decks)]
+
+    def toTable(self,delimiter="\t"):
+        """Return the win-rate matrix, with 95% confidence intervals, as text"""
+        rows = [delimiter.join(["deck"]+self.DeckNames)]
+        for i,deck_name in enumerate(self.DeckNames):
+            row = [deck_name]
+            for j in range(len(self.DeckNames)):
+                win_rate = self.winRate(i,j)
+                if i == j or win_rate is None:
+                    row.append("-")
+                    continue
+                low,high = self.confidenceInterval(i,j)
+                row.append(f"{win_rate:.3f} [{low:.3f}-{high:.3f}]")
+            rows.append(delimiter.join(row))
+        return "\n".join(rows)
+
+def run_tournament(deck_paths,games_per_matchup=100,max_workers=None,chunk_size=20,\
+  max_turns=100,card_data_fp="../data/card_data/basic_card_set.txt",\
+  effect_data_fp="../data/effect_data/effect_data.txt",seed=None,results_dir=None):
+    """Play every pair of decks against each other and return a TournamentResult
+
+    deck_paths -- paths to .tsv decklists
+    games_per_matchup -- games played for each pair of decks (half with each deck going first)
+    max_workers -- number of worker processes (defaults to the number of CPUs).
+      With max_workers=1 games are played in this process
+    chunk_size -- games per task sent to a worker. Smaller chunks balance load
+      better, larger chunks have less overhead
+    max_turns -- games still running after this many turns are ties
+    seed -- seed for the tournament's GameRNG. Each chunk of games gets its own
+      stream, so results don't depend on which worker plays which chunk
+    results_dir -- if given, every game's results are streamed to this directory
+      (see results.py). Each worker writes its own files
+    """
+    rng = GameRNG(seed)
+    deck_names = [os.path.splitext(os.path.basename(p))[0] for p in deck_paths]
+    decklists = [load_decklist(p) for p in deck_paths]
+    result = TournamentResult(deck_names)
+
+    tasks = []
+    for i in range(len(decklists)):
+        for j in range(i+1,len(decklists)):
+            for start in range(0,games_per_matchup,chunk_size):
+                n_games = min(chunk_size,games_per_matchup - start)
+                tasks.append((i,j,decklists[i],decklists[j],n_games,max_turns,rng.split(),\
+                  (deck_names[i],deck_names[j])))
+
+    if max_workers == 1:
+        _init_worker(card_data_fp,effect_data_fp,results_dir)
+        for task in tasks:
+            result.addResults(*_play_matchup_chunk(*task))
+        if _worker_results_sink is not None:
+            _worker_results_sink.close()
+        return result
+
+    with ProcessPoolExecutor(max_workers=max_workers,initializer=_init_worker,\
+      initargs=(card_data_fp,effect_data_fp,results_dir)) as executor:
+        futures = [executor.submit(_play_matchup_chunk,*task) for task in tasks]
+        for future in as_completed(futures):
+            result.addResults(*future.result())
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Round-robin tournament between decklists")
+    parser.add_argument("--deck_dir",default="../data/decks/")
+    parser.add_argument("-n","--games_per_matchup",type=int,default=100)
+    parser.add_argument("-w","--max_workers",type=int,default=None)
+    parser.add_argument("--chunk_size",type=int,default=20)
+    parser.add_argument("--max_turns",type=int,default=100)
+    parser.add_argument("--seed",type=int,default=None)
+    parser.add_argument("--results_dir",default=None,help="Stream per-game and per-turn results here")
+    args = parser.parse_args()
+
+    deck_paths = find_decks(args.deck_dir)
+    start_time = time.perf_counter()
+    result = run_tournament(deck_paths,games_per_matchup=args.games_per_matchup,\
+      max_workers=args.max_workers,chunk_size=args.chunk_size,max_turns=args.max_turns,seed=args.seed,\
+      results_dir=args.results_dir)
+    elapsed = time.perf_counter() - start_time
+    n_games = args.games_per_matchup*len(deck_paths)*(len(deck_paths)-1)//2
+    print(result.toTable())
+    print(f"{n_games} games in {elapsed:.2f}s ({n_games/elapsed:.1f} games/s)")
@@ -0,0 +1,72 @@
+"""
+Static abilities and creature types interned as bits of an integer mask.
+
+CardPrototype parses the comma-separated ability and type text from the
+card data once, at CardSet load time, into a tuple of clean names and a
+mask. Combat rules then test abilities with a bitwise AND, e.g.
+creature.AbilityMask & FLYING.
+"""
+
+class FlagRegistry(object):
+    """Assign each name (an ability or a type) its own bit"""
+
+    def __init__(self,kind,names=(),allow_new=True):
+        """
+        kind -- what the names are, for error messages (e.g. "static ability")
+        names -- names to register up front
+        allow_new -- if False, parse raises ValueError for names not registered
+          up front, so typos in the card data are caught when it is loaded
+        """
+        self.Kind = kind
+        self.Bits = {}
+        self.AllowNew = True
+        for name in names:
+            self.register(name)
+        self.AllowNew = allow_new
+
+    def register(self,name):
+        """Return the bit for name, giving it a new bit if it is new"""
+        name = name.strip()
+        if not name:
+            raise ValueError(f"Empty {self.Kind} name")
+        if name not in self.Bits:
+            if not self.AllowNew:
+                known = ", ".join(self.Bits)
+                raise ValueError(f"Unknown {self.Kind} {name!r} (known: {known})")
+            self.Bits[name] = 1 << len(self.Bits)
+        return self.Bits[name]
+
+    def bit(self,name):
+        """Return the bit for a registered name, or 0 if it isn't registered"""
+        return self.Bits.get(name.strip(),0)
+
+    def parse(self,text):
+        """Parse comma-separated text into (tuple of names,mask)
+
+        Whitespace around names is ignored, so "Human, Warrior" and
+        "Human,Warrior" give the same result
+        """
+        names = []
+        mask = 0
+        for name in text.split(","):
+            name = name.strip()
+            if not name or name in names:
+                continue
+            mask |= self.register(name)
+            names.append(name)
+        return tuple(names),mask
+
+    def names(self,mask):
+        """Return the tuple of names whose bits are set in mask"""
+        return tuple(name for name,bit in self.Bits.items() if mask & bit)
+
+#The static abilities the rules engine knows how to resolve
+STATIC_ABILITIES = FlagRegistry("static ability",("Defend","Flying","Ranged","Parasitic"),\
+  allow_new=False)
+DEFEND = STATIC_ABILITIES.bit("Defend")
+FLYING = STATIC_ABILITIES.bit("Flying")
+RANGED = STATIC_ABILITIES.bit("Ranged")
+PARASITIC = STATIC_ABILITIES.bit("Parasitic")
+
+#Creature types have no rules of their own, so any type in the card data is registered
+CREATURE_TYPES = FlagRegistry("creature type")
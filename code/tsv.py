@@ -0,0 +1,41 @@
+"""
+Read and write the tab-separated data files (card data, effect data, decks).
+
+A lightweight stand-in for the pandas.read_csv/to_csv calls the engine
+used to make, so importing the engine doesn't import pandas. Values are
+parsed the way pandas would for these files: quoted fields are
+unquoted, numbers become ints or floats and empty fields are missing.
+"""
+import csv
+
+def parse_value(text):
+    """Return text as an int or float if it is a number, otherwise unchanged"""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def read_tsv(filepath):
+    """Read a .tsv file with a header row into a list of dicts, one per row
+
+    Empty fields are left out of each dict, and rows with no values at all
+    are skipped (like dropna(how="all") followed by dropping missing values)
+    """
+    rows = []
+    with open(filepath,newline="",encoding="utf-8") as f:
+        for row in csv.DictReader(f,delimiter="\t"):
+            row = {k:parse_value(v) for k,v in row.items() if k and v}
+            if row:
+                rows.append(row)
+    return rows
+
+def write_tsv(filepath,columns,rows):
+    """Write rows (lists of values, in column order) to a .tsv file with a header row"""
+    with open(filepath,"w",newline="",encoding="utf-8") as f:
+        writer = csv.writer(f,delimiter="\t",lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
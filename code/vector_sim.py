@@ -0,0 +1,404 @@
+"""
+Play thousands of creature-only games at once as NumPy array operations.
+
+This is a second engine for balance sweeps. It follows the rules of
+Game.runGame for decks made only of creatures with no effects, where
+each creature's behavior is "Attack Random Enemy", "Attack Opponent" or
+"Defend" and its static abilities are Flying, Ranged, Defend or
+Parasitic. Both players use the greedy play policy
+(Player.highestCostPlayableCard). cross_check compares its outcome
+distribution with the object engine (simulate.simulate_game).
+
+Each game is a column. Each player's deck order, hand, board (card ids
+and current health) and health are arrays with one column per game. A
+phase runs for every game at once. Combat is resolved one board slot at
+a time, in board order, as actionPhase does.
+"""
+from collections import namedtuple
+import numpy as np
+from rorschach.code.deck import load_decklist
+from rorschach.code.simulate import simulate_game,load_card_library
+from rorschach.code.tournament import wilson_interval
+from rorschach.code.traits import DEFEND,FLYING,RANGED,PARASITIC
+
+STARTING_HEALTH = 20
+MAX_BOARD_SIZE = 7
+
+ATTACK_RANDOM_ENEMY = 0
+ATTACK_OPPONENT = 1
+DEFEND_BEHAVIOR = 2
+BEHAVIORS = {"Attack Random Enemy":ATTACK_RANDOM_ENEMY,"Attack Opponent":ATTACK_OPPONENT,\
+  "Defend":DEFEND_BEHAVIOR}
+
+#Outcomes of a batch. winner is 0 (player 1), 1 (player 2) or -1 (a tie)
+BatchResult = namedtuple("BatchResult",["winner","turns","player_1_health","player_2_health"])
+
+class CardTable(object):
+    """Per-card stats as arrays, indexed by card id
+
+    Every array has one extra entry at the end, so looking up a card id
+    of -1 (an empty slot) with take(ids,mode="wrap") finds a harmless blank card
+    """
+
+    def __init__(self,prototypes):
+        """prototypes -- a list of creature CardPrototypes; card ids are list positions"""
+        for prototype in prototypes:
+            if prototype.CardType != "Creature":
+                raise ValueError(f"{prototype.Name} is a {prototype.CardType}; "\
+                  "only creatures are supported")
+            if prototype.EffectTemplates:
+                raise ValueError(f"{prototype.Name} has effects; only vanilla creatures are supported")
+            if prototype.Behavior not in BEHAVIORS:
+                raise ValueError(f"{prototype.Name} has unsupported behavior {prototype.Behavior!r}")
+        self.Names = [p.Name for p in prototypes]
+        self.Ids = {name:i for i,name in enumerate(self.Names)}
+        blank = [0]
+        self.Cost = np.array([p.Cost for p in prototypes]+blank,dtype=np.int16)
+        self.Power = np.array([p.Power for p in prototypes]+blank,dtype=np.int16)
+        self.Toughness = np.array([p.Toughness for p in prototypes]+blank,dtype=np.int16)
+        self.Abilities = np.array([p.AbilityMask for p in prototypes]+blank,dtype=np.int16)
+        self.Behavior = np.array([BEHAVIORS[p.Behavior] for p in prototypes]+[DEFEND_BEHAVIOR],\
+          dtype=np.int8)
+
+def make_card_table(decklists,card_library):
+    """Return a CardTable covering every card in decklists"""
+    names = []
+    for decklist in decklists:
+        for card_name,copies in decklist:
+            name = card_library.getPrototype(card_name).Name
+            if name not in names:
+                names.append(name)
+    return CardTable([card_library.getPrototype(name) for name in names])
+
+def deck_card_ids(decklist,card_table):
+    """Return an array of card ids, one per copy of each card in decklist"""
+    ids = []
+    for card_name,copies in decklist:
+        ids.extend([card_table.Ids[card_name.strip()]]*copies)
+    return np.array(ids,dtype=np.int8)
+
+#Boards have at most 7 slots, so a set of slots fits in one byte (bit k is slot k).
+#POPCOUNT[bits] counts the slots in a set and NTH_SLOT[bits*8 + n] is its n-th slot
+POPCOUNT = np.array([bin(bits).count("1") for bits in range(256)],dtype=np.int16)
+NTH_SLOT = np.zeros(256*8,dtype=np.intp)
+for bits in range(256):
+    for n,slot in enumerate([k for k in range(8) if bits >> k & 1]):
+        NTH_SLOT[bits*8 + n] = slot
+
+class BatchState(object):
+    """The state of a batch of games, one column per game
+
+    Per-player arrays come in pairs (one per player). Decks, hands and
+    boards are stored position-major, e.g. BoardIds[p][k] is a contiguous
+    array of the card in board slot k of every game, so each step works
+    on whole rows of memory. Small integer types keep memory traffic down.
+    """
+
+    def __init__(self,deck_ids_1,deck_ids_2,n_games,rng):
+        deck_size = max(len(deck_ids_1),len(deck_ids_2))
+        self.DeckSizes = (len(deck_ids_1),len(deck_ids_2))
+        #Shuffle each deck (argsort of random keys)
+        self.Decks = []
+        for deck_ids in (deck_ids_1,deck_ids_2):
+            order = np.argsort(rng.random((n_games,len(deck_ids))),axis=1)
+            self.Decks.append(np.ascontiguousarray(deck_ids[order].T))
+        #Every game draws one card per turn until its deck runs out,
+        #so the next card to draw is the same in every game
+        self.NextCard = [0,0]
+        #Hands keep draw order. The extra position is always -1 so cards can shift left
+        self.Hands = [np.full((deck_size+1,n_games),-1,dtype=np.int8) for p in (0,1)]
+        self.HandSizes = [np.zeros(n_games,dtype=np.int8) for p in (0,1)]
+        self.BoardIds = [np.full((MAX_BOARD_SIZE,n_games),-1,dtype=np.int8) for p in (0,1)]
+        self.BoardHealth = [np.zeros((MAX_BOARD_SIZE,n_games),dtype=np.int16) for p in (0,1)]
+        self.BoardSizes = [np.zeros(n_games,dtype=np.int8) for p in (0,1)]
+        self.Health = [np.full(n_games,STARTING_HEALTH,dtype=np.int16) for p in (0,1)]
+        #Which game (in the caller's numbering) each column is
+        self.GameIds = np.arange(n_games)
+
+    def __len__(self):
+        return len(self.GameIds)
+
+    def keep(self,games):
+        """Drop every game not in games (a boolean mask)"""
+        for name in ("Decks","Hands","BoardIds","BoardHealth"):
+            setattr(self,name,[a[:,games] for a in getattr(self,name)])
+        for name in ("HandSizes","BoardSizes","Health"):
+            setattr(self,name,[a[games] for a in getattr(self,name)])
+        self.GameIds = self.GameIds[games]
+
+def draw_phase(state,p):
+    """Player p draws a card, if they have any left"""
+    next_card = state.NextCard[p]
+    if next_card >= state.DeckSizes[p]:
+        return
+    hand_sizes = state.HandSizes[p]
+    state.Hands[p][hand_sizes,np.arange(len(state))] = state.Decks[p][next_card]
+    hand_sizes += 1
+    state.NextCard[p] += 1
+
+def slot_bits(condition,k):
+    """Return condition (a boolean array) as a byte with bit k set where it is True"""
+    return condition.astype(np.uint8) << np.uint8(k)
+
+def action_phase(state,p,cards,rng):
+    """Every creature on player p's board acts, in board order (see Game.actionPhase)
+
+    Dead creatures keep their slot (with 0 health) until remove_dead
+    runs at the end of the phase, so slot k is the k-th creature on the
+    board when the phase started. Sets of enemy slots (alive, Defend,
+    Flying) are bytes, so choosing a target is a few table lookups
+    """
+    q = 1 - p
+    n_games = len(state)
+    board_ids = state.BoardIds[p]
+    board_health = state.BoardHealth[p]
+    enemy_board_ids = state.BoardIds[q]
+    enemy_board_health = state.BoardHealth[q]
+    enemy_health = state.Health[q]
+
+    enemy_alive = np.zeros(n_games,dtype=np.uint8)
+    enemy_defend = np.zeros(n_games,dtype=np.uint8)
+    enemy_flying = np.zeros(n_games,dtype=np.uint8)
+    for j in range(int(state.BoardSizes[q].max(initial=0))):
+        abilities = cards.Abilities.take(enemy_board_ids[j],mode="wrap")
+        enemy_alive |= slot_bits(enemy_board_health[j] > 0,j)
+        enemy_defend |= slot_bits(abilities & DEFEND != 0,j)
+        enemy_flying |= slot_bits(abilities & FLYING != 0,j)
+
+    for k in range(int(state.BoardSizes[p].max(initial=0))):
+        attacker_ids = board_ids[k]
+        behavior = cards.Behavior.take(attacker_ids,mode="wrap")
+        acting = (board_health[k] > 0) & (behavior != DEFEND_BEHAVIOR)
+        if not acting.any():
+            continue
+        power = cards.Power.take(attacker_ids,mode="wrap")
+        abilities = cards.Abilities.take(attacker_ids,mode="wrap")
+        attack_random = behavior == ATTACK_RANDOM_ENEMY
+
+        #Flying targets can only be attacked by Flying or Ranged creatures
+        reachable = np.where(abilities & (FLYING|RANGED) != 0,enemy_alive,enemy_alive & ~enemy_flying)
+        defenders = enemy_alive & enemy_defend
+        #Attack Random Enemy: non-Ranged attackers must hit a Defender they can reach, if any.
+        #Attack Opponent: must hit any Defender, if any
+        defender_targets = np.where(attack_random,defenders & reachable,defenders)
+        must_attack_defender = (defender_targets != 0) & ~(attack_random & (abilities & RANGED != 0))
+        #Otherwise Attack Random Enemy picks among the opponent and every reachable
+        #creature, and Attack Opponent always hits the opponent
+        candidates = np.where(must_attack_defender,defender_targets,\
+          np.where(attack_random,reachable,np.uint8(0)))
+        extra = (~must_attack_defender).astype(np.int16)
+        n_options = POPCOUNT.take(candidates) + extra
+        choice = (rng.random(n_games)*n_options).astype(np.int16)
+        hits_player = acting & (choice < extra)
+
+        enemy_health -= np.where(hits_player,power,0).astype(np.int16)
+        np.maximum(enemy_health,0,out=enemy_health)
+
+        rows = np.nonzero(acting & ~hits_player)[0]
+        rank = (choice - extra)[rows]
+        target_slots = NTH_SLOT.take(candidates[rows].astype(np.intp)*8 + rank)
+        target_health = np.maximum(enemy_board_health[target_slots,rows] - power[rows],0)
+        enemy_board_health[target_slots,rows] = target_health
+        died = target_health == 0
+        enemy_alive[rows[died]] &= ~(np.uint8(1) << target_slots[died].astype(np.uint8))
+
+        #Counterattacks: attack() only, and only if neither creature is Ranged
+        target_ids = enemy_board_ids[target_slots,rows]
+        counter = attack_random[rows] &\
+          ((cards.Abilities.take(target_ids) | abilities[rows]) & RANGED == 0)
+        counter_rows = rows[counter]
+        attacker_health = board_health[k]
+        attacker_health[counter_rows] =\
+          np.maximum(attacker_health[counter_rows] - cards.Power.take(target_ids[counter]),0)
+
+        #Parasitic attackers heal the damage they dealt, if they survived
+        parasitic = acting & attack_random & (abilities & PARASITIC != 0)
+        if parasitic.any():
+            parasitic_rows = np.nonzero(parasitic)[0]
+            health = attacker_health[parasitic_rows]
+            healed = np.minimum(health + power[parasitic_rows],\
+              cards.Toughness.take(attacker_ids[parasitic_rows]))
+            attacker_health[parasitic_rows] = np.where(health > 0,healed,0)
+
+    remove_dead(state,p)
+    remove_dead(state,q)
+
+def remove_dead(state,p):
+    """Close up gaps left by dead creatures on player p's board, keeping board order"""
+    board_ids = state.BoardIds[p]
+    board_health = state.BoardHealth[p]
+    board_sizes = state.BoardSizes[p]
+    width = int(board_sizes.max(initial=0))
+    alive = np.zeros(len(state),dtype=np.uint8)
+    for j in range(width):
+        alive |= slot_bits(board_health[j] > 0,j)
+    sizes = POPCOUNT.take(alive)
+    rows = np.nonzero(sizes != board_sizes)[0]
+    if not len(rows):
+        return
+    alive = alive[rows].astype(np.intp)*8
+    sizes = sizes[rows]
+    #Survivor n moves to slot n
+    new_ids = np.full((width,len(rows)),-1,dtype=np.int8)
+    new_health = np.zeros((width,len(rows)),dtype=np.int16)
+    for n in range(width):
+        source = NTH_SLOT.take(alive + n)
+        survivor = n < sizes
+        new_ids[n] = np.where(survivor,board_ids[source,rows],-1)
+        new_health[n] = np.where(survivor,board_health[source,rows],0)
+    board_ids[:width,rows] = new_ids
+    board_health[:width,rows] = new_health
+    board_sizes[rows] = sizes
+
+def play_phase(state,p,mana,cards):
+    """Play cards with the greedy policy until none are playable (see Player.highestCostPlayableCard)"""
+    hands = state.Hands[p]
+    hand_sizes = state.HandSizes[p]
+    board_ids = state.BoardIds[p]
+    board_health = state.BoardHealth[p]
+    board_sizes = state.BoardSizes[p]
+    n_games = len(state)
+    mana = np.full(n_games,mana,dtype=np.int16)
+    #Only look at hand positions that some game is using
+    hand_width = int(hand_sizes.max(initial=0))
+    costs = [cards.Cost.take(hands[h],mode="wrap") for h in range(hand_width)]
+    active = (hand_sizes > 0) & (board_sizes < MAX_BOARD_SIZE)
+    while active.any():
+        #Scan the hand in order, as highestCostPlayableCard does. A card replaces the
+        #current choice if it costs more, or if the current choice costs 0 (or there is none)
+        chosen = np.full(n_games,-1,dtype=np.int8)
+        max_cost = np.zeros(n_games,dtype=np.int16)
+        for h in range(hand_width):
+            take = active & (hands[h] >= 0) & (costs[h] <= mana) &\
+              ((max_cost == 0) | (costs[h] > max_cost))
+            chosen[take] = h
+            max_cost = np.where(take,costs[h],max_cost)
+        plays = chosen >= 0
+        if not plays.any():
+            break
+        rows = np.nonzero(plays)[0]
+        card_ids = hands[chosen[rows],rows]
+        slots = board_sizes[rows]
+        board_ids[slots,rows] = card_ids
+        board_health[slots,rows] = cards.Toughness.take(card_ids)
+        board_sizes[rows] += 1
+        mana -= np.where(plays,max_cost,0).astype(np.int16)
+        #Remove the card from hand, shifting later cards left
+        for h in range(hand_width):
+            shift = plays & (h >= chosen)
+            hands[h] = np.where(shift,hands[h+1],hands[h])
+            costs[h] = np.where(shift,costs[h+1] if h+1 < hand_width else 0,costs[h])
+        hand_sizes[rows] -= 1
+        active = plays & (hand_sizes > 0) & (board_sizes < MAX_BOARD_SIZE)
+
+def simulate_batch(decklist_1,decklist_2,card_library,n_games,max_turns=100,seed=None):
+    """Play n_games creature-only games at once and return a BatchResult of arrays
+
+    decklist_1,decklist_2 -- lists of (card_name,copies) tuples (see deck.load_decklist)
+    card_library -- the CardSet the decklists' cards come from
+    max_turns -- games still running after this many turns are ties
+    seed -- seed for the NumPy random generator
+    """
+    rng = np.random.default_rng(seed)
+    cards = make_card_table([decklist_1,decklist_2],card_library)
+    state = BatchState(deck_card_ids(decklist_1,cards),deck_card_ids(decklist_2,cards),n_games,rng)
+
+    winner = np.full(n_games,-1,dtype=np.int32)
+    turns = np.zeros(n_games,dtype=np.int32)
+    final_health = np.zeros((n_games,2),dtype=np.int32)
+
+    turn = 0
+    while len(state):
+        #Games end between turns, as in runGame
+        health_1,health_2 = state.Health
+        over = (health_1 <= 0) | (health_2 <= 0)
+        if turn >= max_turns:
+            over[:] = True
+        if over.any():
+            game_ids = state.GameIds[over]
+            health_1,health_2 = health_1[over],health_2[over]
+            turns[game_ids] = turn
+            final_health[game_ids,0] = health_1
+            final_health[game_ids,1] = health_2
+            winner[game_ids] = np.where(health_2 <= 0,0,1)
+            winner[game_ids[(health_1 <= 0) == (health_2 <= 0)]] = -1
+            state.keep(~over)
+            if not len(state):
+                break
+        turn += 1
+        #Mana crystals go up by one each turn, so current mana is the turn number
+        for p in (0,1):
+            draw_phase(state,p)
+            action_phase(state,p,cards,rng)
+            play_phase(state,p,turn,cards)
+    return BatchResult(winner,turns,final_health[:,0],final_health[:,1])
+
+def outcome_rates(winners):
+    """Return the fraction of (player 1 wins,player 2 wins,ties)"""
+    winners = np.asarray(winners)
+    n = len(winners)
+    return tuple(float((winners == w).sum())/n for w in (0,1,-1))
+
+def cross_check(decklist_1,decklist_2,card_library,n_object_games=1000,n_vector_games=100000,\
+  max_turns=100,z=3.29,seed=None):
+    """Compare outcome distributions from the object engine and the vectorized engine
+
+    Returns a list of (outcome,object engine rate,(low,high),vectorized rate,agrees)
+    rows. Each row checks that the vectorized rate is inside the Wilson interval
+    (z=3.29 ~ 99.9%) around the object engine's rate. Mean turns are compared
+    within z standard errors of the object engine's mean.
+    """
+    batch = simulate_batch(decklist_1,decklist_2,card_library,n_vector_games,\
+      max_turns=max_turns,seed=seed)
+    object_winners = []
+    object_turns = []
+    for i in range(n_object_games):
+        result = simulate_game(decklist_1,decklist_2,card_library,max_turns=max_turns)
+        object_winners.append({"Player 1":0,"Player 2":1,None:-1}[result.winner])
+        object_turns.append(result.turns)
+
+    rows = []
+    labels = ("player 1 wins","player 2 wins","ties")
+    for label,object_rate,vector_rate in zip(labels,outcome_rates(object_winners),\
+      outcome_rates(batch.winner)):
+        low,high = wilson_interval(object_rate*n_object_games,n_object_games,z=z)
+        rows.append((label,object_rate,(low,high),vector_rate,low <= vector_rate <= high))
+    object_turns = np.array(object_turns)
+    mean = object_turns.mean()
+    standard_error = object_turns.std()/np.sqrt(n_object_games)
+    vector_mean = float(batch.turns.mean())
+    rows.append(("mean turns",float(mean),(mean - z*standard_error,mean + z*standard_error),\
+      vector_mean,abs(vector_mean - mean) <= z*standard_error))
+    return rows
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Vectorized creature-only games between two decklists")
+    parser.add_argument("deck_1_path")
+    parser.add_argument("deck_2_path")
+    parser.add_argument("-n","--n_games",type=int,default=100000)
+    parser.add_argument("--max_turns",type=int,default=100)
+    parser.add_argument("--seed",type=int,default=None)
+    parser.add_argument("--check",type=int,default=0,metavar="N_OBJECT_GAMES",\
+      help="Also play this many games with the object engine and compare outcomes")
+    args = parser.parse_args()
+
+    card_library = load_card_library()
+    decklist_1 = load_decklist(args.deck_1_path)
+    decklist_2 = load_decklist(args.deck_2_path)
+    start_time = time.perf_counter()
+    result = simulate_batch(decklist_1,decklist_2,card_library,args.n_games,\
+      max_turns=args.max_turns,seed=args.seed)
+    elapsed = time.perf_counter() - start_time
+    p1,p2,ties = outcome_rates(result.winner)
+    print(f"Player 1: {p1:.4f}  Player 2: {p2:.4f}  Tie: {ties:.4f}")
+    n_turns = int(result.turns.sum())
+    print(f"Mean turns: {result.turns.mean():.3f}")
+    print(f"{args.n_games} games, {n_turns} game-turns in {elapsed:.2f}s "\
+      f"({n_turns/elapsed:,.0f} game-turns/s)")
+    if args.check:
+        for label,object_rate,(low,high),vector_rate,agrees in cross_check(decklist_1,decklist_2,\
+          card_library,n_object_games=args.check,n_vector_games=args.n_games,max_turns=args.max_turns):
+            print(f"{label}: object {object_rate:.4f} [{low:.4f}-{high:.4f}] "\
+              f"vectorized {vector_rate:.4f} {'ok' if agrees else 'MISMATCH'}")
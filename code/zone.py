@@ -0,0 +1,111 @@
+"""
+Zones: the ordered collections of cards a player has (hand, board, graveyard).
+"""
+from itertools import islice
+
+class Zone(object):
+    """An ordered collection of cards with O(1) membership and removal
+
+    A Zone behaves like the list it replaces (iteration, len, indexing,
+    append, extend, pop, remove, slice assignment). Cards are kept in a
+    dict used as an ordered set, so `card in zone`, append and remove
+    don't scan the zone, and iteration is in the order cards entered.
+
+    Each card gets an integer handle when it enters. The handle stays the
+    same for as long as the card stays in the zone and is never reused by
+    the zone, so callers (e.g. a UI or a search) can refer to a card
+    without holding on to its position.
+    """
+
+    def __init__(self,cards=()):
+        self.Cards = {}
+        self.ByHandle = {}
+        self.NextHandle = 0
+        self.extend(cards)
+
+    def __repr__(self):
+        return repr(list(self.Cards))
+
+    def __len__(self):
+        return len(self.Cards)
+
+    def __bool__(self):
+        return bool(self.Cards)
+
+    def __iter__(self):
+        return iter(self.Cards)
+
+    def __reversed__(self):
+        return reversed(self.Cards)
+
+    def __contains__(self,card):
+        return card in self.Cards
+
+    def __getitem__(self,index):
+        """Return the card at index (or a list of cards, for a slice)
+
+        The first and last cards are O(1). Other positions are found by
+        walking the zone, as zones don't keep positions
+        """
+        if isinstance(index,slice):
+            return list(self.Cards)[index]
+        if index == 0 and self.Cards:
+            return next(iter(self.Cards))
+        if index == -1 and self.Cards:
+            return next(reversed(self.Cards))
+        if index < 0:
+            index += len(self.Cards)
+        if not 0 <= index < len(self.Cards):
+            raise IndexError("zone index out of range")
+        return next(islice(self.Cards,index,None))
+
+    def __setitem__(self,index,value):
+        """Replace cards by position, e.g. zone[:] = cards. Every card gets a new handle"""
+        cards = list(self.Cards)
+        cards[index] = value
+        self.clear()
+        self.extend(cards)
+
+    def append(self,card):
+        """Add card to the end of the zone and return its handle"""
+        if card in self.Cards:
+            raise ValueError(f"{card} is already in this zone")
+        handle = self.NextHandle
+        self.NextHandle += 1
+        self.Cards[card] = handle
+        self.ByHandle[handle] = card
+        return handle
+
+    def extend(self,cards):
+        for card in cards:
+            self.append(card)
+
+    def remove(self,card):
+        """Remove card from the zone and return it"""
+        try:
+            handle = self.Cards.pop(card)
+        except KeyError:
+            raise ValueError(f"{card} is not in this zone")
+        del self.ByHandle[handle]
+        return card
+
+    def discard(self,card):
+        """Remove card if it is in the zone. Returns the card, or None if it wasn't there"""
+        if card not in self.Cards:
+            return None
+        return self.remove(card)
+
+    def pop(self,index=-1):
+        return self.remove(self[index])
+
+    def clear(self):
+        self.Cards = {}
+        self.ByHandle = {}
+
+    def handle(self,card):
+        """Return card's handle"""
+        return self.Cards[card]
+
+    def get(self,handle):
+        """Return the card with handle, or None if it has left the zone"""
+        return self.ByHandle.get(handle)
@@ -0,0 +1,112 @@
+import unittest
+from rorschach.code.simulate import load_card_library
+from rorschach.code.deck import Deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+
+class TestBoard(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def setUp(self):
+        """Two players with empty boards"""
+        self.Player1 = Player(name="Player 1",deck=Deck([]))
+        self.Player2 = Player(name="Player 2",deck=Deck([]))
+        self.Game = Game(self.Player1,self.Player2)
+        self.Board = self.Player1.Board
+
+    def play(self,name,player=None):
+        """Put a new copy of a creature onto a player's board"""
+        player = player or self.Player1
+        creature = self.CardLibrary.getPrototype(name).makeCard(controller=player)
+        player.Board.append(creature)
+        return creature
+
+    def test_ability_and_type_indexes(self):
+        """Creatures are indexed by static ability and type as they enter and leave"""
+        peasant = self.play("Peasant")
+        eagles = self.play("Kyberian Eagle-Riders ")
+        archer = self.play("Archer")
+        self.assertEqual(self.Board.withAbility("Defend"),[peasant])
+        self.assertEqual(self.Board.withAbility("Ranged"),[eagles,archer])
+        self.assertEqual(self.Board.withAbility("Ranged",excluding="Flying"),[archer])
+        self.assertEqual(self.Board.withoutAbility("Flying"),[peasant,archer])
+        self.assertEqual(self.Board.withType("Warrior"),[archer])
+        self.Board.remove(eagles)
+        self.assertEqual(self.Board.withAbility("Ranged"),[archer])
+        self.assertFalse(self.Board.hasAbility("Flying"))
+
+    def test_damaged_index(self):
+        """Damage and healing keep the damaged index up to date"""
+        ogre = self.play("Ogre")
+        self.assertEqual(self.Board.damaged(),[])
+        ogre.takeDamage(2)
+        self.assertEqual(self.Board.damaged(),[ogre])
+        ogre.healDamage(2)
+        self.assertEqual(self.Board.damaged(),[])
+
+    def test_dead_creatures_leave_every_index(self):
+        """A creature that dies is removed from the board and its indexes"""
+        peasant = self.play("Peasant")
+        peasant.takeDamage(1)
+        peasant.takeDamage(peasant.CurrentHealth)
+        self.assertTrue(peasant.Dead)
+        self.assertFalse(peasant in self.Board)
+        self.assertEqual(self.Board.withAbility("Defend"),[])
+        self.assertEqual(self.Board.damaged(),[])
+
+    def test_restore_reindexes_boards(self):
+        """Game.restore rebuilds board indexes along with creature health"""
+        ogre = self.play("Ogre")
+        snapshot = self.Game.snapshot()
+        ogre.takeDamage(1)
+        self.Game.restore(snapshot)
+        self.assertEqual(self.Board.damaged(),[])
+        self.assertEqual(list(self.Board),[ogre])
+
+    def test_attack_opponent_respects_enemy_defenders(self):
+        """Attack Opponent creatures must hit enemy creatures with Defend"""
+        self.play("Ogre")
+        self.play("Peasant")
+        enemy_peasant = self.play("Peasant",player=self.Player2)
+        self.Game.actionPhase(self.Player1)
+        self.assertEqual(self.Player2.Health,20)
+        self.assertTrue(enemy_peasant.Dead)
+
+    def test_attack_opponent_ignores_own_defenders(self):
+        """Attack Opponent creatures hit the opponent past their own side's Defend creatures"""
+        ogre = self.play("Ogre")
+        peasant = self.play("Peasant")
+        self.Game.actionPhase(self.Player1)
+        self.assertEqual(self.Player2.Health,20 - ogre.Power)
+        self.assertFalse(peasant.Dead)
+        self.assertEqual(peasant.CurrentHealth,peasant.Toughness)
+
+    def test_resurrected_creatures_come_back_alive(self):
+        """A resurrected creature is back at full health, out of the damaged index, and acts"""
+        ogre = self.play("Ogre")
+        ogre.takeDamage(ogre.CurrentHealth)
+        self.Player1.Graveyard.append(ogre)
+        self.assertTrue(self.Player1.returnCreatureToPlay(ogre))
+        self.assertFalse(ogre.Dead)
+        self.assertEqual(ogre.CurrentHealth,ogre.Toughness)
+        self.assertEqual(list(self.Board),[ogre])
+        self.assertEqual(self.Board.damaged(),[])
+        self.Game.actionPhase(self.Player1)
+        self.assertLess(self.Player2.Health,20)
+
+    def test_no_resurrect_onto_a_full_board(self):
+        """A full board refuses a resurrected creature, as it refuses a played one"""
+        for _ in range(self.Player1.MaxBoardSize):
+            self.play("Peasant")
+        ogre = self.CardLibrary.getPrototype("Ogre").makeCard(controller=self.Player1)
+        self.Player1.Graveyard.append(ogre)
+        self.assertFalse(self.Player1.returnCreatureToPlay(ogre))
+        self.assertEqual(len(self.Board),self.Player1.MaxBoardSize)
+        self.assertEqual(list(self.Player1.Graveyard),[ogre])
+
+#Run the tests
+unittest.main()
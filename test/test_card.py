@@ -0,0 +1,128 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+from rorschach.code.card import CardSet,CardPrototype,Creature,Spell
+from rorschach.code.effect import EffectSet
+from rorschach.code.card_art import CardImageIndex,clear_card_image_indexes,make_card_image_variants,\
+  pick_card_image,variant_filepath
+from rorschach.code.traits import FlagRegistry,FLYING,RANGED,DEFEND
+
+class TestCardSet(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the basic card set once for all tests"""
+        effect_library = EffectSet("../data/effect_data/effect_data.txt")
+        cls.CardLibrary = CardSet("../data/card_data/basic_card_set.txt",effect_library=effect_library)
+
+    def test_makeCards_copies_share_a_prototype(self):
+        """Copies of a card point back to the same CardPrototype"""
+        first,second = self.CardLibrary.makeCards(["Ogre"],copies=2)
+        self.assertTrue(first is not second)
+        self.assertTrue(first.Prototype is second.Prototype)
+        self.assertTrue(isinstance(first.Prototype,CardPrototype))
+
+    def test_makeCards_copies_have_independent_state(self):
+        """Damaging one copy of a creature doesn't affect another"""
+        first,second = self.CardLibrary.makeCards(["Fortification"],copies=2)
+        first.CurrentHealth -= 2
+        self.assertEqual(first.CurrentHealth,3)
+        self.assertEqual(second.CurrentHealth,5)
+
+    def test_makeCards_copies_have_independent_effects(self):
+        """Each copy of a spell gets its own Effect objects"""
+        first,second = self.CardLibrary.makeCards(["Fire Blast"],copies=2)
+        self.assertTrue(isinstance(first,Spell))
+        self.assertTrue(first.Effects[0] is not second.Effects[0])
+        self.assertEqual(first.Effects[0].Magnitude,2)
+        self.assertEqual(first.Effects[0].RequiredTargets,{"random enemy minion":1})
+
+    def test_prototype_parses_stats_and_abilities(self):
+        """CardPrototype parses numeric stats and comma-separated abilities"""
+        prototype = self.CardLibrary.getPrototype("Kyberian Eagle-Riders ")
+        self.assertEqual(prototype.Name,"Kyberian Eagle-Riders")
+        self.assertEqual((prototype.Cost,prototype.Power,prototype.Toughness),(3,2,3))
+        self.assertEqual(prototype.StaticAbilities,("Flying","Ranged"))
+        self.assertTrue(prototype.CardClass is Creature)
+
+    def test_abilities_and_types_are_bitmasks(self):
+        """Abilities and types are interned as bitmasks, ignoring stray whitespace"""
+        eagles = self.CardLibrary.makeCard("Kyberian Eagle-Riders")
+        self.assertEqual(eagles.AbilityMask,FLYING|RANGED)
+        self.assertFalse(eagles.AbilityMask & DEFEND)
+        self.assertTrue(eagles.hasAbility("Flying"))
+        peasant = self.CardLibrary.makeCard("Peasant")
+        self.assertEqual(peasant.Types,("Human",))
+        self.assertTrue(peasant.hasType("Human"))
+        self.assertEqual(peasant.TypeMask & eagles.TypeMask,peasant.TypeMask)
+
+    def test_unknown_abilities_fail_at_load_time(self):
+        """A misspelled static ability is an error when the card is parsed"""
+        with self.assertRaises(ValueError):
+            CardPrototype(Creature,"Test Bat",self.CardLibrary.EffectLibrary,\
+              static_abilities="Flyng")
+
+    def test_flag_registry_ignores_whitespace(self):
+        """FlagRegistry gives whitespace variants of a name the same bit"""
+        registry = FlagRegistry("type")
+        self.assertEqual(registry.parse("Human, Warrior"),registry.parse("Human,Warrior "))
+        self.assertEqual(registry.names(registry.parse("Human, Warrior")[1]),("Human","Warrior"))
+
+    def test_makeCards_does_no_filesystem_io(self):
+        """Building cards doesn't list directories or resolve card art"""
+        with mock.patch("os.listdir",side_effect=AssertionError("listdir called")),\
+          mock.patch("os.mkdir",side_effect=AssertionError("mkdir called")):
+            cards = self.CardLibrary.makeCards(["Ogre","Fire Blast","Archer"],copies=10)
+        self.assertEqual(len(cards),30)
+
+    def test_CardImageFilepath_is_resolved_on_first_access(self):
+        """CardImageFilepath finds an existing image and is shared by all copies"""
+        clear_card_image_indexes()
+        first,second = self.CardLibrary.makeCards(["Soldier"],copies=2)
+        #Don't render over the checked in image (see test_render_cache.py for the render cache)
+        with mock.patch("rorschach.code.card.cached_game_card",return_value="kingdom_of_kyberia__soldier__1.png")\
+          as cached_game_card:
+            filepath = first.CardImageFilepath
+            self.assertTrue(os.path.isfile(filepath))
+            with mock.patch("os.listdir",side_effect=AssertionError("listdir called")):
+                self.assertEqual(second.CardImageFilepath,filepath)
+        self.assertEqual(cached_game_card.call_count,1)
+
+class TestCardImageIndex(unittest.TestCase):
+
+    def test_CardImageIndex_lists_directory_once(self):
+        """CardImageIndex answers membership queries from memory"""
+        index = CardImageIndex("../data/images/cards/kingdom_of_kyberia")
+        with mock.patch("os.listdir",side_effect=AssertionError("listdir called")):
+            self.assertTrue("kingdom_of_kyberia__ogre__1.png" in index)
+            self.assertFalse("kingdom_of_kyberia__crungus__1.png" in index)
+            index.add("kingdom_of_kyberia__crungus__1.png")
+            self.assertTrue("kingdom_of_kyberia__crungus__1.png" in index)
+
+class TestCardImageVariants(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = tempfile.mkdtemp()
+        self.ImageFp = os.path.join(self.TempDir,"kingdom_of_kyberia__ogre__1.png")
+        shutil.copy("../data/images/cards/kingdom_of_kyberia/kingdom_of_kyberia__ogre__1.png",self.ImageFp)
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def test_picks_smallest_variant_that_fits(self):
+        """Before variants are made the full image is used, then the smallest big enough variant"""
+        self.assertEqual(pick_card_image(self.ImageFp,0.10),(self.ImageFp,1.0))
+        make_card_image_variants(self.ImageFp)
+        from PIL import Image
+        with Image.open(variant_filepath(self.ImageFp,"thumbnail")) as image:
+            self.assertEqual(image.size,(82,112))
+        for scale,variant_name in ((0.05,"thumbnail"),(0.10,"thumbnail"),(0.15,"board"),(0.2,"enlarged")):
+            filepath,image_scale = pick_card_image(self.ImageFp,scale)
+            self.assertEqual(filepath,variant_filepath(self.ImageFp,variant_name))
+            self.assertAlmostEqual(image_scale,scale,delta=0.05)
+        self.assertEqual(pick_card_image(self.ImageFp,0.5),(self.ImageFp,1.0))
+
+#Run the tests
+unittest.main()
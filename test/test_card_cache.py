@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from rorschach.code.card_cache import load_card_set,cache_filepath,DEFAULT_CARD_DATA_FP,\
+  DEFAULT_EFFECT_DATA_FP
+
+class TestCardCache(unittest.TestCase):
+
+    def setUp(self):
+        """Copy the card and effect data somewhere the test can change them"""
+        self.TempDir = tempfile.mkdtemp()
+        self.CardDataFp = os.path.join(self.TempDir,"card_data","basic_card_set.txt")
+        self.EffectDataFp = os.path.join(self.TempDir,"effect_data","effect_data.txt")
+        os.makedirs(os.path.dirname(self.CardDataFp))
+        os.makedirs(os.path.dirname(self.EffectDataFp))
+        shutil.copy(DEFAULT_CARD_DATA_FP,self.CardDataFp)
+        shutil.copy(DEFAULT_EFFECT_DATA_FP,self.EffectDataFp)
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def cache_files(self):
+        return os.listdir(os.path.join(self.TempDir,"cache"))
+
+    def test_cached_set_matches_parsed_set(self):
+        """Loading through the cache gives the same cards as parsing the data files"""
+        parsed = load_card_set(self.CardDataFp,self.EffectDataFp,use_cache=False)
+        load_card_set(self.CardDataFp,self.EffectDataFp)
+        cached = load_card_set(self.CardDataFp,self.EffectDataFp)
+        self.assertEqual(list(cached.Prototypes),list(parsed.Prototypes))
+        for name,prototype in parsed.Prototypes.items():
+            cached_prototype = cached.Prototypes[name]
+            self.assertEqual(cached_prototype.CardText,prototype.CardText)
+            self.assertEqual(cached_prototype.EffectTemplates,prototype.EffectTemplates)
+            self.assertEqual(cached_prototype.AbilityMask,prototype.AbilityMask)
+
+    def test_cache_written_once(self):
+        """The first load writes a cache file named for the data's hash"""
+        load_card_set(self.CardDataFp,self.EffectDataFp)
+        filepath = cache_filepath(self.CardDataFp,self.EffectDataFp)
+        self.assertTrue(os.path.exists(filepath))
+        modified = os.path.getmtime(filepath)
+        load_card_set(self.CardDataFp,self.EffectDataFp)
+        self.assertEqual(os.path.getmtime(filepath),modified)
+
+    def test_cache_rebuilt_when_data_changes(self):
+        """Changing the card data gives a new cache file and replaces the stale one"""
+        load_card_set(self.CardDataFp,self.EffectDataFp)
+        old_filepath = cache_filepath(self.CardDataFp,self.EffectDataFp)
+        with open(self.CardDataFp) as f:
+            card_data = f.read()
+        with open(self.CardDataFp,"w") as f:
+            f.write(card_data.replace("Ogre\t","Big Ogre\t",1))
+        card_set = load_card_set(self.CardDataFp,self.EffectDataFp)
+        self.assertIn("Big Ogre",card_set.Prototypes)
+        self.assertNotEqual(cache_filepath(self.CardDataFp,self.EffectDataFp),old_filepath)
+        self.assertEqual(self.cache_files(),[os.path.basename(cache_filepath(self.CardDataFp,self.EffectDataFp))])
+
+#Run the tests
+unittest.main()
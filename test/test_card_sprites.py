@@ -0,0 +1,144 @@
+import os
+import sys
+import types
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+class Sprite(object):
+    """Stands in for arcade.Sprite: holds a texture and scale"""
+
+    def __init__(self,scale=1,texture=None,hit_box_algorithm=None):
+        self.scale = scale
+        self.texture = texture
+        self.angle = 0
+        self.SpriteLists = []
+
+    def remove_from_sprite_lists(self):
+        self.SpriteLists = []
+
+def fake_arcade():
+    """Return a stand-in arcade module whose textures are just their filepaths"""
+    arcade = types.ModuleType("arcade")
+    arcade.Sprite = Sprite
+    arcade.load_texture = mock.Mock(side_effect=lambda filepath,**kwargs:("texture",filepath))
+    arcade.Texture = mock.Mock(side_effect=lambda name,image=None,**kwargs:("texture",name))
+    arcade.TextureAtlas = mock.Mock()
+    arcade.SpriteList = mock.Mock()
+    return arcade
+
+#arcade needs a display (and may not be installed), so card_sprites is imported
+#against the stand-in. patch.dict drops the module from sys.modules again afterwards
+with mock.patch.dict(sys.modules,{"arcade":fake_arcade()}):
+    sys.modules.pop("rorschach.code.card_sprites",None)
+    from rorschach.code import card_sprites
+    from rorschach.code.card_sprites import CardSpritePool,CardTextures
+
+class Card(object):
+    def __init__(self,name,card_image_fp):
+        self.Name = name
+        self.CardImageFilepath = card_image_fp
+        self.CardImage = None
+
+class TestCardSpritePool(unittest.TestCase):
+
+    def setUp(self):
+        card_sprites.arcade.load_texture.reset_mock()
+        self.Pool = CardSpritePool(CardTextures())
+
+    def test_acquire_reuses_free_sprites(self):
+        sprite = self.Pool.acquire("archer.png",scale=0.1)
+        self.Pool.release(sprite)
+        self.assertIs(self.Pool.acquire("archer.png",scale=0.15),sprite)
+        self.assertEqual(sprite.scale,0.15)
+        #A different face gets a new sprite
+        self.assertIsNot(self.Pool.acquire("ogre.png"),sprite)
+        self.assertEqual(self.Pool.Made,2)
+
+    def test_release_unlinks_card(self):
+        card = Card("Archer","archer.png")
+        sprite = self.Pool.acquire("archer.png",card=card)
+        self.assertIs(card.CardImage,sprite)
+        self.Pool.release(sprite)
+        self.assertIsNone(card.CardImage)
+        self.assertIsNone(sprite.Card)
+        self.assertEqual(self.Pool.Free,{"archer.png":[sprite]})
+
+    def test_each_face_is_loaded_once_across_views(self):
+        faces = ["archer.png","archer.png","ogre.png"]
+        first_view = [self.Pool.acquire(face) for face in faces]
+        self.Pool.releaseAll(first_view)
+        second_view = [self.Pool.acquire(face) for face in faces + ["soldier.png"]]
+        self.assertEqual(self.Pool.Textures.Loads,3)
+        self.assertEqual(card_sprites.arcade.load_texture.call_count,3)
+        self.assertEqual(self.Pool.Made,4)
+        self.assertEqual(set(map(id,first_view)) - set(map(id,second_view)),set())
+
+class BrokenCard(Card):
+    def __init__(self,name):
+        self.Name = name
+        self.CardImage = None
+
+    @property
+    def CardImageFilepath(self):
+        raise OSError("no portrait")
+
+class TestBackgroundLoading(unittest.TestCase):
+    """Requests are loaded one at a time with loadNext (no worker threads) to be deterministic"""
+
+    def setUp(self):
+        from PIL import Image
+        self.TempDir = tempfile.mkdtemp()
+        self.Cards = {}
+        for name in ("Archer","Ogre","Soldier"):
+            card_image_fp = os.path.join(self.TempDir,f"{name.lower()}.png")
+            Image.new("RGB",(825,1125),(90,120,60)).save(card_image_fp)
+            self.Cards[name] = Card(name,card_image_fp)
+        self.Pool = CardSpritePool(CardTextures(n_workers=0))
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def test_placeholder_until_polled_in_priority_order(self):
+        sprites = {name:self.Pool.acquireAsync(self.Cards[name],scale=0.1,priority=priority)\
+          for name,priority in (("Soldier",5),("Archer",0),("Ogre",2))}
+        placeholder = self.Pool.Textures.getPlaceholder()
+        self.assertTrue(all(sprite.texture is placeholder for sprite in sprites.values()))
+        for name in ("Archer","Ogre","Soldier"):
+            self.assertTrue(self.Pool.Textures.loadNext())
+            self.assertEqual(self.Pool.Textures.poll(),1)
+            self.assertEqual(sprites[name].CardImage,self.Cards[name].CardImageFilepath)
+            self.assertEqual(sprites[name].texture,("texture",self.Cards[name].CardImageFilepath))
+        self.assertEqual(self.Pool.Textures.Loads,3)
+
+    def test_released_sprites_are_skipped(self):
+        """A request for a released sprite isn't loaded, and a load finished after the sprite
+        was reused for another card isn't shown"""
+        sprite = self.Pool.acquireAsync(BrokenCard("Broken"))
+        self.Pool.release(sprite)
+        #Skipped before the card's image is looked up, so BrokenCard doesn't raise
+        self.assertFalse(self.Pool.Textures.loadNext())
+
+        sprite = self.Pool.acquireAsync(self.Cards["Archer"])
+        self.assertTrue(self.Pool.Textures.loadNext())
+        self.Pool.release(sprite)
+        self.assertIs(self.Pool.acquireAsync(self.Cards["Ogre"]),sprite)
+        #The Archer load is dropped and the sprite waits for the Ogre
+        self.assertEqual(self.Pool.Textures.poll(),0)
+        self.assertIsNone(sprite.CardImage)
+        self.Pool.Textures.loadNext()
+        self.assertEqual(self.Pool.Textures.poll(),1)
+        self.assertEqual(sprite.CardImage,self.Cards["Ogre"].CardImageFilepath)
+
+    def test_failed_load_keeps_placeholder(self):
+        sprite = self.Pool.acquireAsync(BrokenCard("Broken"))
+        self.Pool.Textures.loadNext()
+        with mock.patch("builtins.print") as printed:
+            self.assertEqual(self.Pool.Textures.poll(),0)
+        self.assertIn("Broken",printed.call_args[0][0])
+        self.assertIs(sprite.texture,self.Pool.Textures.getPlaceholder())
+        self.assertIsNone(sprite.LoadRequest)
+
+#Run the tests
+unittest.main()
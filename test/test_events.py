@@ -0,0 +1,74 @@
+import unittest
+from rorschach.code.events import EventBus,describe_event,subscribe_interface
+
+class RecordingInterface(object):
+    """Collects reports, like GameView"""
+    EventTypes = ("draw",)
+
+    def __init__(self):
+        self.Reports = []
+
+    def report(self,free_text,specific_event,specific_event_props={}):
+        self.Reports.append((free_text,specific_event))
+
+class FakePlayer(object):
+    Name = "Tester"
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.Bus = EventBus()
+        self.Received = []
+
+    def record(self,event_type,props):
+        self.Received.append((event_type,props))
+
+    def test_wants_is_false_with_no_subscribers(self):
+        """EventBus.wants is False when nobody subscribed"""
+        self.assertFalse(self.Bus.wants("draw"))
+
+    def test_subscribers_only_receive_their_event_types(self):
+        """Subscribers opt in by event type"""
+        self.Bus.subscribe(self.record,["draw"])
+        self.assertTrue(self.Bus.wants("draw"))
+        self.assertFalse(self.Bus.wants("discard"))
+        self.Bus.publish("draw",{"n":1})
+        self.Bus.publish("discard",{"n":2})
+        self.assertEqual(self.Received,[("draw",{"n":1})])
+
+    def test_subscribe_to_all_events(self):
+        """Subscribing with no event types receives every event"""
+        self.Bus.subscribe(self.record)
+        self.assertTrue(self.Bus.wants("anything"))
+        self.Bus.publish("anything",{})
+        self.assertEqual(len(self.Received),1)
+
+    def test_unsubscribe(self):
+        """Unsubscribed callbacks stop receiving events"""
+        self.Bus.subscribe(self.record,["draw"])
+        self.Bus.unsubscribe(self.record)
+        self.assertFalse(self.Bus.wants("draw"))
+        self.Bus.publish("draw",{})
+        self.assertEqual(self.Received,[])
+
+    def test_subscribe_interface_formats_text_for_wanted_events(self):
+        """subscribe_interface forwards described events to report()"""
+        interface = RecordingInterface()
+        subscribe_interface(self.Bus,interface)
+        self.Bus.publish("draw",{"player":FakePlayer(),"drawn cards":[]})
+        self.assertEqual(interface.Reports,[("Tester drew 0:","draw")])
+        self.assertFalse(self.Bus.wants("discard"))
+
+    def test_subscribe_interface_skips_interfaces_wanting_no_events(self):
+        """Interfaces with empty EventTypes are never subscribed"""
+        interface = RecordingInterface()
+        interface.EventTypes = ()
+        self.assertEqual(subscribe_interface(self.Bus,interface),None)
+        self.assertFalse(self.Bus.wants("draw"))
+
+    def test_describe_event_falls_back_for_unknown_events(self):
+        """describe_event describes events without a registered description"""
+        self.assertEqual(describe_event("mystery",{"a":1}),"mystery: {'a': 1}")
+
+#Run the tests
+unittest.main()
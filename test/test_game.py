@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+from rorschach.code.simulate import load_card_library
+from rorschach.code.deck import Deck,build_deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+def player_summary(player):
+    """Return comparable values describing a player and their cards"""
+    return (player.Health,player.TotalMana,player.CurrentMana,\
+      [card.Name for card in player.Hand],\
+      [(card.Name,card.CurrentHealth) for card in player.Board],\
+      [card.Name for card in player.Graveyard],\
+      [card.Name for card in player.Deck.Cards])
+
+class TestGameSnapshot(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def setUp(self):
+        """Start a game and play a few turns so there is something on the board"""
+        player_1 = Player(name="Player 1",deck=Deck(build_deck(DECKLIST_1,self.CardLibrary)))
+        player_2 = Player(name="Player 2",deck=Deck(build_deck(DECKLIST_2,self.CardLibrary)))
+        self.Game = Game(player_1,player_2)
+        self.Game.runGame(wait_for_input=False,max_turns=3)
+
+    def summary(self,game):
+        return [game.Turn]+[player_summary(player) for player in game.PlayOrder]
+
+    def test_restore_undoes_later_turns(self):
+        """restore() returns the game to the state saved by snapshot()"""
+        before = self.summary(self.Game)
+        snapshot = self.Game.snapshot()
+        self.Game.runGame(wait_for_input=False,max_turns=8)
+        self.assertNotEqual(self.summary(self.Game),before)
+        self.Game.restore(snapshot)
+        self.assertEqual(self.summary(self.Game),before)
+
+    def test_clone_is_independent(self):
+        """Playing on a clone leaves the original game unchanged"""
+        before = self.summary(self.Game)
+        clone = self.Game.clone()
+        self.assertEqual(self.summary(clone),before)
+        clone.runGame(wait_for_input=False,max_turns=8)
+        self.assertEqual(self.summary(self.Game),before)
+        self.assertNotEqual(self.summary(clone),before)
+
+    def test_clone_remaps_players_and_shares_prototypes(self):
+        """Cloned cards belong to the cloned players but share prototypes"""
+        clone = self.Game.clone()
+        for original,player in zip(self.Game.PlayOrder,clone.PlayOrder):
+            self.assertIsNot(original,player)
+            self.assertIs(player.Game,clone)
+            self.assertIs(player.Opponent,clone.PlayOrder[1-clone.PlayOrder.index(player)])
+            for original_card,card in zip(original.Board,player.Board):
+                self.assertIsNot(original_card,card)
+                self.assertIs(original_card.Prototype,card.Prototype)
+                self.assertIs(card.Controller,player)
+
+    def test_play_phase_one_card_at_a_time(self):
+        """Asking for and playing cards one at a time (as the game view does) matches playPhase"""
+        player_1 = Player(name="Player 1",deck=Deck(build_deck(DECKLIST_1,self.CardLibrary)))
+        player_2 = Player(name="Player 2",deck=Deck(build_deck(DECKLIST_2,self.CardLibrary)))
+        game = Game(player_1,player_2,seed=1)
+        game.runGame(wait_for_input=False,max_turns=3)
+        player_1.refreshMana()
+        hand_size = len(player_1.Hand)
+        stepped = game.clone()
+        game.playPhase(player_1)
+        self.assertLess(len(player_1.Hand),hand_size)
+        player = stepped.PlayOrder[0]
+        while stepped.playChosenCard(player,player.Policy.chooseCard(stepped,player)):
+            pass
+        stepped.endPlayPhase(player)
+        self.assertEqual(self.summary(stepped),self.summary(game))
+
+class TestGameInterface(unittest.TestCase):
+
+    def test_no_interface_by_default(self):
+        """A Game made without an interface subscribes nothing and prints nothing"""
+        card_library = load_card_library()
+        player_1 = Player(name="Player 1",deck=Deck(build_deck(DECKLIST_1,card_library)))
+        player_2 = Player(name="Player 2",deck=Deck(build_deck(DECKLIST_2,card_library)))
+        game = Game(player_1,player_2)
+        self.assertIsNone(game.Interface)
+        self.assertFalse(game.Events.wants("board"))
+        with mock.patch("builtins.print") as printed:
+            game.runGame(wait_for_input=False,max_turns=3)
+        printed.assert_not_called()
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.deck import Deck,build_deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+from rorschach.code.policy import PlayPolicy,GreedyPolicy,RandomPolicy,MCTSPolicy
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+class StubbornPolicy(PlayPolicy):
+    """Always asks to play the first card in hand, playable or not"""
+    def chooseCard(self,game,player):
+        return player.Hand[0] if player.Hand else None
+
+class TestPolicies(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def setUp(self):
+        """Start a game and play a few turns, then give Player 1 mana to spend"""
+        player_1 = Player(name="Player 1",deck=Deck(build_deck(DECKLIST_1,self.CardLibrary)))
+        player_2 = Player(name="Player 2",deck=Deck(build_deck(DECKLIST_2,self.CardLibrary)))
+        self.Game = Game(player_1,player_2)
+        self.Game.runGame(wait_for_input=False,max_turns=2)
+        player_1.draw(3)
+        player_1.TotalMana = player_1.CurrentMana = 5
+        self.Player = player_1
+
+    def test_greedy_policy_plays_highest_cost_card(self):
+        """GreedyPolicy picks the same card as highestCostPlayableCard"""
+        card = GreedyPolicy().chooseCard(self.Game,self.Player)
+        self.assertIs(card,self.Player.highestCostPlayableCard())
+
+    def test_random_policy_chooses_playable_cards(self):
+        """RandomPolicy only returns playable cards, or None"""
+        playable = self.Player.playableCards()
+        for i in range(20):
+            card = RandomPolicy().chooseCard(self.Game,self.Player)
+            self.assertTrue(card is None or card in playable)
+
+    def test_mcts_policy_chooses_playable_card_without_changing_game(self):
+        """MCTSPolicy searches on a clone, leaving the real game untouched"""
+        before = (self.Player.Health,self.Player.CurrentMana,list(self.Player.Hand),\
+          list(self.Player.Board),list(self.Player.Deck.Cards))
+        card = MCTSPolicy(iterations=30).chooseCard(self.Game,self.Player)
+        after = (self.Player.Health,self.Player.CurrentMana,list(self.Player.Hand),\
+          list(self.Player.Board),list(self.Player.Deck.Cards))
+        self.assertEqual(before,after)
+        self.assertTrue(card is None or card in self.Player.playableCards())
+
+    def test_mcts_policy_needs_a_budget(self):
+        """MCTSPolicy refuses to search forever"""
+        self.assertRaises(ValueError,MCTSPolicy,iterations=None,time_limit=None)
+
+    def test_mcts_policy_plays_full_games(self):
+        """Games with an MCTS player run to completion"""
+        result = simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,\
+          player_1_policy=MCTSPolicy(iterations=10),max_turns=30)
+        self.assertTrue(result.winner in ("Player 1","Player 2",None))
+
+    def test_play_phase_stops_when_policy_chooses_unplayable_card(self):
+        """playPhase doesn't loop forever if a policy picks a card that can't be played"""
+        self.Player.CurrentMana = 0
+        self.Player.Policy = StubbornPolicy()
+        self.Game.playPhase(self.Player)
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from rorschach.code.profiling import GameProfiler,PHASE,EFFECT,TARGET
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.targets import TARGET_TYPES
+from rorschach.code.rng import GameRNG
+from rorschach.code.benchmark import BenchmarkCase,run_benchmarks,compare_to_baseline
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2),("Regeneration Ritual",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+class TestProfiling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.CardLibrary = load_card_library()
+
+    def test_profiler_counts_phases_effects_and_targets(self):
+        """Every phase of every turn is timed, and effects and targets are keyed by type"""
+        profiler = GameProfiler()
+        results = [simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,rng=GameRNG(4).stream(i),\
+          profiler=profiler) for i in range(3)]
+        turns = sum(r.turns for r in results)
+        phases = {name:calls for category,name,calls,seconds,per_call in profiler.rows(PHASE)}
+        self.assertEqual(set(phases),{"Gain Mana","Refresh Mana","Draw","Start of Turn",\
+          "Action","Play","End of Turn"})
+        #Both players take every phase of every turn (the last turn may end early)
+        self.assertTrue(2*turns - 1 <= phases["Draw"] <= 2*turns)
+        effect_types = {row[1] for row in profiler.rows(EFFECT)}
+        self.assertTrue(effect_types and effect_types <= set(self.CardLibrary.EffectLibrary.EffectMakers))
+        self.assertTrue({row[1] for row in profiler.rows(TARGET)} <= set(TARGET_TYPES))
+
+    def test_profiling_does_not_change_games(self):
+        """A profiled game plays out exactly as an unprofiled one"""
+        plain = simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,rng=GameRNG(5))
+        profiled = simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,rng=GameRNG(5),profiler=GameProfiler())
+        self.assertEqual(plain,profiled)
+
+    def test_merge(self):
+        profiler = GameProfiler()
+        profiler.add(PHASE,"Draw",1.0)
+        other = GameProfiler()
+        other.add(PHASE,"Draw",0.5)
+        other.add(EFFECT,"heal",0.25)
+        profiler.merge(other)
+        self.assertEqual(profiler.rows(),[(PHASE,"Draw",2,1.5,750000.0),(EFFECT,"heal",1,0.25,250000.0)])
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_benchmark_is_reproducible(self):
+        """Seeded cases play the same games every run, and compare cleanly to themselves"""
+        cases = (BenchmarkCase("small","Bloodmagic_starter_deck.txt","Frost_Wyrm_starter_deck.txt",5,1),)
+        first = run_benchmarks(cases,repeats=1)
+        second = run_benchmarks(cases,repeats=1)
+        self.assertEqual(first["small"]["turns"],second["small"]["turns"])
+        self.assertEqual(compare_to_baseline(first,first),[])
+
+    def test_compare_to_baseline_flags_regressions(self):
+        baseline = {"case":{"games_per_sec":100.0,"turns_per_sec":1000.0,"peak_kib_per_game":20.0,\
+          "retained_blocks_per_turn":0.0,"turns":50}}
+        ok = {"case":{"games_per_sec":90.0,"turns_per_sec":900.0,"peak_kib_per_game":22.0,\
+          "retained_blocks_per_turn":0.5,"turns":50}}
+        self.assertEqual(compare_to_baseline(ok,baseline),[])
+        slow = {"case":dict(ok["case"],games_per_sec=50.0,peak_kib_per_game=40.0,turns=51)}
+        regressions = compare_to_baseline(slow,baseline)
+        self.assertEqual(len(regressions),3)
+
+#Run the tests
+unittest.main()
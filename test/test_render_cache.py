@@ -0,0 +1,132 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from rorschach.code.render_cache import RenderCache,cached_game_card,output_filepath
+from rorschach.code.card_art import variant_filepath,clear_card_image_indexes
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = tempfile.mkdtemp()
+        self.CacheDir = os.path.join(self.TempDir,"render_cache")
+        self.OutputDir = os.path.join(self.TempDir,"cards")
+        os.makedirs(self.OutputDir)
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def writeImage(self,name,size=(100,100)):
+        from PIL import Image
+        image_fp = os.path.join(self.OutputDir,name)
+        Image.new("RGB",size,(90,120,60)).save(image_fp)
+        return image_fp
+
+    def test_hits_and_misses(self):
+        cache = RenderCache(self.CacheDir)
+        self.assertIsNone(cache.get("aa01"))
+        cache.put("aa01",self.writeImage("a.png"))
+        self.assertEqual(cache.get("aa01"),cache.entryFilepath("aa01"))
+        self.assertEqual((cache.Hits,cache.Misses),(1,1))
+        cache.save()
+        #Running totals are kept in the index, session counts aren't
+        cache = RenderCache(self.CacheDir)
+        self.assertEqual((cache.Hits,cache.Misses),(0,0))
+        self.assertEqual(cache.hitRate(),0.5)
+
+    def test_evicts_orphans_least_recently_used_first(self):
+        cache = RenderCache(self.CacheDir)
+        for key in ("aa01","bb02","cc03"):
+            cache.put(key,self.writeImage(f"{key}.png"))
+            cache.Index["entries"][key]["last_used"] = time.time()
+            time.sleep(0.01)
+        #Room for two of the (equal sized) entries
+        cache.MaxBytes = cache.totalBytes()*2//3
+        #aa01 is the oldest but still shown, so it is kept
+        cache.setCurrent(os.path.join(self.OutputDir,"a.png"),"aa01")
+        self.assertEqual(cache.orphans(),["bb02","cc03"])
+        self.assertEqual(cache.evict(),["bb02"])
+        self.assertEqual(sorted(cache.Index["entries"]),["aa01","cc03"])
+        self.assertFalse(any(os.path.exists(fp) for fp in cache.entryFilepaths("bb02")))
+        self.assertEqual(cache.evict(),[])
+
+class TestCachedGameCard(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = tempfile.mkdtemp()
+        self.OutputDir = os.path.join(self.TempDir,"cards")
+        self.PortraitDir = os.path.join(self.TempDir,"card_portraits")
+        os.makedirs(os.path.join(self.PortraitDir,"kingdom_of_kyberia"))
+        shutil.copy("../data/images/card_portraits/kingdom_of_kyberia/kingdom_of_kyberia__archer__1.png",\
+          os.path.join(self.PortraitDir,"kingdom_of_kyberia"))
+        self.Cache = RenderCache(os.path.join(self.TempDir,"render_cache"))
+        clear_card_image_indexes()
+        self.ImageFp = os.path.join(self.OutputDir,output_filepath("Archer","Kingdom of Kyberia"))
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def makeCard(self,cost):
+        return cached_game_card("Archer","Kingdom of Kyberia",attack=3,health=1,cost=cost,\
+          card_type="Human and Warrior",card_back_filename="card_back_Earth-01.jpg",\
+          base_card_portrait_dir=self.PortraitDir,output_dir=self.OutputDir,cache=self.Cache)
+
+    def readImage(self):
+        with open(self.ImageFp,"rb") as f:
+            return f.read()
+
+    def test_renders_again_when_cost_changes(self):
+        """Changing the cost renders the card again, and changing it back reuses the first image"""
+        self.assertEqual(self.makeCard(cost=3),os.path.basename(self.ImageFp))
+        first_image = self.readImage()
+        self.assertEqual((self.Cache.Hits,self.Cache.Misses,len(self.Cache)),(0,1,1))
+        self.makeCard(cost=3)
+        self.assertEqual((self.Cache.Hits,self.Cache.Misses),(1,1))
+        self.makeCard(cost=4)
+        self.assertEqual((self.Cache.Misses,len(self.Cache)),(2,2))
+        self.assertNotEqual(self.readImage(),first_image)
+        self.makeCard(cost=3)
+        self.assertEqual((self.Cache.Hits,self.Cache.Misses),(2,2))
+        self.assertEqual(self.readImage(),first_image)
+
+    def test_links_variants_with_the_image(self):
+        """The image's variants change with it"""
+        thumbnail_fp = variant_filepath(self.ImageFp,"thumbnail")
+        self.makeCard(cost=3)
+        with open(thumbnail_fp,"rb") as f:
+            first_thumbnail = f.read()
+        self.makeCard(cost=4)
+        with open(thumbnail_fp,"rb") as f:
+            self.assertNotEqual(f.read(),first_thumbnail)
+        self.makeCard(cost=3)
+        with open(thumbnail_fp,"rb") as f:
+            self.assertEqual(f.read(),first_thumbnail)
+
+    def test_adopts_unknown_images(self):
+        """An image the cache has never seen (e.g. a checked-in one) is kept as it is
+        until the card's inputs change"""
+        from PIL import Image
+        os.makedirs(os.path.dirname(self.ImageFp))
+        Image.new("RGB",(825,1125),(90,120,60)).save(self.ImageFp)
+        old_image = self.readImage()
+        self.makeCard(cost=3)
+        self.makeCard(cost=3)
+        self.assertEqual(self.readImage(),old_image)
+        self.assertTrue(os.path.exists(variant_filepath(self.ImageFp,"board")))
+        self.assertEqual((self.Cache.Hits,self.Cache.Misses,len(self.Cache)),(1,0,1))
+        self.makeCard(cost=4)
+        self.assertNotEqual(self.readImage(),old_image)
+        self.assertEqual((self.Cache.Misses,len(self.Cache)),(1,2))
+
+    def test_current_image_needs_no_listing_or_index_write(self):
+        """Once made, a current image is found without listing directories or rewriting the index"""
+        self.makeCard(cost=3)
+        with mock.patch("os.listdir",side_effect=AssertionError("listdir called")),\
+          mock.patch("rorschach.code.render_cache.json.dump",side_effect=AssertionError("index written")):
+            self.makeCard(cost=3)
+        self.assertEqual((self.Cache.Hits,self.Cache.Misses),(1,1))
+
+#Run the tests
+unittest.main()
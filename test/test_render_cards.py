@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import unittest
+from rorschach.code.render_cards import render_card_set,make_render_job
+from rorschach.code.render_cache import RenderCache,list_backgrounds,pick_background
+from rorschach.code.card_cache import load_card_set,DEFAULT_EFFECT_DATA_FP
+from rorschach.code import make_card_image
+from rorschach.code.make_card_image import add_text_PIL,get_font,get_background_layers,clear_asset_caches
+from PIL import Image,ImageChops
+
+CARD_DATA = """card_name\tlocation\tsupertype\ttypes\tmana_cost\tpower\ttoughness\tbehavior\teffects\tstatic_abilities
+Archer\tKingdom of Kyberia\tCreature\t"Human,Warrior"\t3\t{power}\t1\tAttack Opponent\t\tRanged
+Unpainted Wanderer\tNowhere In Particular\tCreature\tHuman\t1\t1\t1\t\t\t
+"""
+
+class TestRenderCards(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = tempfile.mkdtemp()
+        self.OutputDir = os.path.join(self.TempDir,"cards")
+        self.CacheDir = os.path.join(self.TempDir,"render_cache")
+        self.PortraitDir = os.path.join(self.TempDir,"card_portraits")
+        os.makedirs(os.path.join(self.PortraitDir,"kingdom_of_kyberia"))
+        shutil.copy("../data/images/card_portraits/kingdom_of_kyberia/kingdom_of_kyberia__archer__1.png",\
+          os.path.join(self.PortraitDir,"kingdom_of_kyberia"))
+        self.CardDataFp = os.path.join(self.TempDir,"card_data","test_set.txt")
+        os.makedirs(os.path.dirname(self.CardDataFp))
+        self.writeCardData(power=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def writeCardData(self,power):
+        with open(self.CardDataFp,"w") as f:
+            f.write(CARD_DATA.format(power=power))
+
+    def jobs(self):
+        card_set = load_card_set(self.CardDataFp,DEFAULT_EFFECT_DATA_FP)
+        backgrounds = list_backgrounds()
+        return {name:make_render_job(prototype,backgrounds,portrait_dir=self.PortraitDir)\
+          for name,prototype in card_set.Prototypes.items()}
+
+    def test_backgrounds_are_fixed_per_card(self):
+        backgrounds = list_backgrounds()
+        self.assertEqual(pick_background("Archer",backgrounds),pick_background("Archer",backgrounds))
+        self.assertEqual(pick_background("Archer",backgrounds,"card_back_Earth-01.jpg"),"card_back_Earth-01.jpg")
+
+    def test_renderer_and_cache_see_new_backgrounds(self):
+        """A background added to the directory is listed by both the renderer and the render cache"""
+        background_dir = os.path.join(self.TempDir,"card_backgrounds")
+        os.makedirs(background_dir)
+        Image.new("RGB",(10,10)).save(os.path.join(background_dir,"b.png"))
+        self.assertEqual(list_backgrounds(background_dir),["b.png"])
+        Image.new("RGB",(10,10)).save(os.path.join(background_dir,"a.jpg"))
+        #Make sure the directory's mtime moves, even on filesystems with coarse timestamps
+        os.utime(background_dir,ns=(0,os.stat(background_dir).st_mtime_ns + 1))
+        self.assertEqual(list_backgrounds(background_dir),["a.jpg","b.png"])
+        self.assertIs(make_card_image.list_card_backs(background_dir),list_backgrounds(background_dir))
+
+    def renderCardSet(self,**kwargs):
+        return render_card_set(self.CardDataFp,output_dir=self.OutputDir,portrait_dir=self.PortraitDir,\
+          cache_dir=self.CacheDir,max_workers=1,**kwargs)
+
+    def test_key_changes_with_stats(self):
+        """A card's key changes when its stats change, and cards with no portrait get no job"""
+        jobs = self.jobs()
+        self.assertIsNone(jobs["Unpainted Wanderer"])
+        self.assertEqual(self.jobs()["Archer"].key,jobs["Archer"].key)
+        self.writeCardData(power=4)
+        self.assertNotEqual(self.jobs()["Archer"].key,jobs["Archer"].key)
+
+    def test_renders_only_stale_cards(self):
+        """The first run renders the card, the next finds it up to date, a stat change renders
+        it again and changing the stat back reuses the first image"""
+        report = self.renderCardSet()
+        self.assertEqual((report.rendered,report.reused,report.up_to_date,report.failed),(1,0,0,[]))
+        self.assertEqual(report.missing_portraits,["Unpainted Wanderer"])
+        job = self.jobs()["Archer"]
+        image_fp = os.path.join(self.OutputDir,job.output_filepath)
+        self.assertTrue(os.path.exists(image_fp))
+        self.assertIn(job.key,RenderCache(self.CacheDir))
+
+        report = self.renderCardSet()
+        self.assertEqual((report.rendered,report.reused,report.up_to_date),(0,0,1))
+
+        self.writeCardData(power=5)
+        report = self.renderCardSet()
+        self.assertEqual((report.rendered,report.reused,report.up_to_date),(1,0,0))
+        self.assertEqual(len(RenderCache(self.CacheDir)),2)
+
+        self.writeCardData(power=3)
+        report = self.renderCardSet()
+        self.assertEqual((report.rendered,report.reused,report.up_to_date),(0,1,0))
+        with open(image_fp,"rb") as f, open(RenderCache(self.CacheDir).entryFilepath(job.key),"rb") as g:
+            self.assertEqual(f.read(),g.read())
+
+    def test_adopts_existing_images(self):
+        """Images the cache has never seen are cached as they are, unless force is set"""
+        job = self.jobs()["Archer"]
+        image_fp = os.path.join(self.OutputDir,job.output_filepath)
+        os.makedirs(os.path.dirname(image_fp))
+        Image.new("RGB",(825,1125),(90,120,60)).save(image_fp)
+        report = self.renderCardSet()
+        self.assertEqual((report.rendered,report.up_to_date),(0,1))
+        self.assertEqual(RenderCache(self.CacheDir).Index["current"],{os.path.abspath(image_fp):job.key})
+
+        shutil.rmtree(self.CacheDir)
+        report = self.renderCardSet(force=True)
+        self.assertEqual((report.rendered,report.up_to_date),(1,0))
+
+class TestAddTextPIL(unittest.TestCase):
+
+    def test_stroke_matches_projection(self):
+        """Stroked text looks like the old projected outline: only edge pixels differ much"""
+        images = []
+        for outline_method in ("stroke","projection"):
+            image = Image.new("RGB",(300,120),(90,120,60))
+            add_text_PIL(image,"Archer 3\u2694",x=20,y=20,fontsize=50,outline_method=outline_method)
+            images.append(image)
+        difference = ImageChops.difference(*images).convert("L")
+        changed = difference.point(lambda value:255 if value > 64 else 0).histogram()[255]
+        self.assertLess(changed/(300*120),0.02)
+        #Both drew an outline in the outline color
+        self.assertTrue((255,255,255) in [color for count,color in images[0].getcolors(100000)])
+
+class TestAssetCaches(unittest.TestCase):
+
+    def setUp(self):
+        clear_asset_caches()
+
+    def tearDown(self):
+        clear_asset_caches()
+
+    def test_fonts_are_loaded_once(self):
+        self.assertIs(get_font(fontsize=40),get_font(fontsize=40))
+        self.assertIsNot(get_font(fontsize=40),get_font(fontsize=41))
+
+    def test_backgrounds_are_reused_up_to_the_cache_size(self):
+        backgrounds = [os.path.join("../data/images/card_backgrounds",f) for f in list_backgrounds()[:3]]
+        layers = get_background_layers(backgrounds[0],825,1125,80)
+        self.assertIs(get_background_layers(backgrounds[0],825,1125,80),layers)
+        self.assertEqual(layers.card.size,(825,1125))
+        cache_size = make_card_image.BACKGROUND_CACHE_SIZE
+        make_card_image.BACKGROUND_CACHE_SIZE = 2
+        try:
+            get_background_layers(backgrounds[1],825,1125,80)
+            #backgrounds[0] was used less recently than backgrounds[1], so it is dropped
+            get_background_layers(backgrounds[2],825,1125,80)
+            self.assertIsNot(get_background_layers(backgrounds[0],825,1125,80),layers)
+        finally:
+            make_card_image.BACKGROUND_CACHE_SIZE = cache_size
+
+#Run the tests
+unittest.main()
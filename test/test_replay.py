@@ -0,0 +1,106 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.deck import Deck,build_deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+from rorschach.code.replay import ReplayWriter,Replay,write_varint,read_varint,zigzag,unzigzag
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2),("Regeneration Ritual",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+def summary(game):
+    """The state of a game, with cards named by their position in each player's deck list"""
+    return tuple((player.Health,player.TotalMana,player.CurrentMana,\
+      [c.Name for c in player.Hand],[(c.Name,c.CurrentHealth) for c in player.Board],\
+      [c.Name for c in player.Graveyard],[c.Name for c in player.Deck.Cards])\
+      for player in game.PlayOrder)
+
+class TestReplay(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.CardLibrary = load_card_library()
+
+    def record_game(self,seed,keyframe_interval=3):
+        """Play a game while recording it. Returns (replay bytes,game,summary at the start of each turn)"""
+        players = [Player(name=name,deck=Deck(build_deck(decklist,self.CardLibrary)))\
+          for name,decklist in (("Player 1",DECKLIST_1),("Player 2",DECKLIST_2))]
+        game = Game(players[0],players[1],seed=seed)
+        f = io.BytesIO()
+        writer = ReplayWriter(game,f,keyframe_interval=keyframe_interval)
+        summaries = {}
+        game.Events.subscribe(lambda event_type,props:summaries.__setitem__(props["turn"],summary(game)),\
+          ["start of turn"])
+        game.runGame(wait_for_input=False,max_turns=100)
+        writer.close()
+        return f.getvalue(),game,summaries
+
+    def test_varints(self):
+        buffer = bytearray()
+        values = [0,1,127,128,300,2**40]
+        for value in values:
+            write_varint(buffer,value)
+        offset = 0
+        for value in values:
+            decoded,offset = read_varint(buffer,offset)
+            self.assertEqual(decoded,value)
+        self.assertEqual([unzigzag(zigzag(v)) for v in (-3,-1,0,1,5)],[-3,-1,0,1,5])
+
+    def test_replay_is_small(self):
+        """A whole game is a few hundred bytes"""
+        data,game,summaries = self.record_game(seed=1)
+        self.assertLess(len(data),1000)
+
+    def test_events_match_game(self):
+        """The replay records the winner, every turn and the cards that were played"""
+        data,game,summaries = self.record_game(seed=2)
+        replay = Replay(data)
+        self.assertTrue(replay.Finished)
+        self.assertEqual(replay.Turns,game.Turn)
+        winner = replay.PlayerNames[replay.Winner] if replay.Winner is not None else None
+        self.assertEqual(winner,game.Winner.Name if game.Winner else None)
+        events = list(replay.events())
+        self.assertEqual([e.turn for e in events if e.kind == "turn"],list(range(1,game.Turn+1)))
+        later = list(replay.events(from_turn=3))
+        self.assertEqual(later,events[-len(later):])
+        self.assertTrue(any(e.kind == "play" for e in events))
+
+    def test_restore_matches_recorded_game(self):
+        """A game restored at any turn is in the state the recorded game was in, and plays out the same"""
+        data,game,summaries = self.record_game(seed=3)
+        replay = Replay(data)
+        for turn in range(1,game.Turn+1):
+            restored = replay.restoreGame(self.CardLibrary,turn)
+            self.assertEqual(restored.Turn,turn - 1)
+            self.assertEqual(summary(restored),summaries[turn])
+        restored = replay.restoreGame(self.CardLibrary,2)
+        winner = restored.runGame(wait_for_input=False,max_turns=100)
+        self.assertEqual(winner.Name if winner else None,game.Winner.Name if game.Winner else None)
+        self.assertEqual(summary(restored),summary(game))
+
+    def test_negative_seed(self):
+        """Negative seeds (allowed by GameRNG and simulate's --seed) are recorded and restored"""
+        data,game,summaries = self.record_game(seed=-5)
+        replay = Replay(data)
+        self.assertEqual(replay.Seed,-5)
+        restored = replay.restoreGame(self.CardLibrary,2)
+        self.assertEqual(summary(restored),summaries[2])
+        with self.assertRaises(ValueError):
+            write_varint(bytearray(),-1)
+
+    def test_simulate_records_replays(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(temp_dir,"game.replay")
+            result = simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,replay_filepath=filepath)
+            replay = Replay.load(filepath)
+            self.assertEqual(replay.Turns,result.turns)
+        finally:
+            shutil.rmtree(temp_dir)
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from rorschach.code.results import ColumnarWriter,ResultsSink,read_row_groups,row_group_filepaths,\
+  card_win_rates,split_cards
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.tournament import find_decks,run_tournament
+from rorschach.code.rng import GameRNG
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2),("Regeneration Ritual",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+class TestResults(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.TempDir)
+
+    def test_writer_writes_bounded_row_groups(self):
+        """Rows are written in row groups of at most row_group_size rows, and read back by column"""
+        writer = ColumnarWriter(self.TempDir,"numbers",(("n","i4"),("name","U")),row_group_size=4)
+        for n in range(10):
+            writer.append((n,f"row {n}"))
+        self.assertEqual(len(row_group_filepaths(self.TempDir,"numbers")),2)
+        writer.close()
+        row_groups = list(read_row_groups(self.TempDir,"numbers",columns=("n",)))
+        self.assertEqual([len(g["n"]) for g in row_groups],[4,4,2])
+        self.assertEqual([n for g in row_groups for n in g["n"].tolist()],list(range(10)))
+        self.assertEqual(list(row_groups[0]),["n"])
+
+    def test_sink_records_games_and_turns(self):
+        """Each game gets a games row matching its result, and a turns row per player turn"""
+        card_library = load_card_library()
+        sink = ResultsSink(self.TempDir,row_group_size=3)
+        results = [simulate_game(DECKLIST_1,DECKLIST_2,card_library,rng=GameRNG(1).stream(i),\
+          results_sink=sink,deck_names=("red","blue")) for i in range(5)]
+        sink.close()
+        games = {k:[] for k in ("winner","turns","health_1","deck_1","cards_1","game_id")}
+        for row_group in read_row_groups(self.TempDir,"games"):
+            for name in games:
+                games[name].extend(row_group[name].tolist())
+        self.assertEqual(games["turns"],[r.turns for r in results])
+        self.assertEqual(games["health_1"],[r.player_1_health for r in results])
+        winners = {"Player 1":1,"Player 2":2,None:0}
+        self.assertEqual(games["winner"],[winners[r.winner] for r in results])
+        self.assertEqual(set(games["deck_1"]),{"red"})
+        self.assertTrue(set(split_cards(games["cards_1"][0])) <= {"Ogre","Soldier","Fire Blast","Regeneration Ritual"})
+        turns = [(game_id,turn,player) for row_group in read_row_groups(self.TempDir,"turns")\
+          for game_id,turn,player in zip(row_group["game_id"].tolist(),row_group["turn"].tolist(),\
+          row_group["player"].tolist())]
+        for game_id,result in zip(games["game_id"],results):
+            game_turns = [(turn,player) for g,turn,player in turns if g == game_id]
+            self.assertEqual(game_turns[0],(1,1))
+            self.assertEqual(game_turns[-1][0],result.turns)
+
+    def test_negative_seeds_read_back(self):
+        """A game's seed is stored as it was given, negative or not, and seeds too big to store are refused"""
+        card_library = load_card_library()
+        sink = ResultsSink(self.TempDir,record_turns=False)
+        for seed in (-3,-2**63,2**63 - 1):
+            simulate_game(DECKLIST_1,DECKLIST_2,card_library,rng=GameRNG(seed).stream(0),\
+              results_sink=sink,max_turns=2)
+        with self.assertRaises(ValueError):
+            simulate_game(DECKLIST_1,DECKLIST_2,card_library,rng=GameRNG(2**64 - 3),\
+              results_sink=sink,max_turns=2)
+        sink.close()
+        seeds = [seed for row_group in read_row_groups(self.TempDir,"games",columns=("seed",))\
+          for seed in row_group["seed"].tolist()]
+        self.assertEqual(seeds,[-3,-2**63,2**63 - 1])
+
+    def test_card_win_rates(self):
+        """card_win_rates counts the games each card was played in, with ties as half wins"""
+        writer = ResultsSink(self.TempDir,row_group_size=2,record_turns=False).Games
+        rows = [(1,"Ogre|Soldier","Giant"),(2,"Ogre","Giant|Soldier"),(0,"Ogre","")]
+        for winner,cards_1,cards_2 in rows:
+            writer.append((0,0,"","a","b",winner,5,0,0,0,0,cards_1,cards_2))
+        writer.close()
+        stats = card_win_rates(self.TempDir)
+        self.assertEqual(stats["Ogre"][:3],(3,1,1))
+        self.assertAlmostEqual(stats["Ogre"].win_rate,0.5)
+        self.assertEqual(stats["Soldier"][:3],(2,2,0))
+        self.assertEqual(stats["Giant"][:3],(2,1,0))
+
+    def test_tournament_workers_write_results(self):
+        """Worker processes write their own results files, one games row per game played"""
+        deck_paths = find_decks("../data/decks/")[:3]
+        result = run_tournament(deck_paths,games_per_matchup=4,max_workers=2,chunk_size=2,\
+          seed=3,results_dir=self.TempDir)
+        n_games = sum(len(g["winner"]) for g in read_row_groups(self.TempDir,"games",columns=("winner",)))
+        self.assertEqual(n_games,12)
+        wins = sum(result.Wins[i][j] for i in range(3) for j in range(3))
+        n_won = sum(int((g["winner"] > 0).sum()) for g in read_row_groups(self.TempDir,"games",columns=("winner",)))
+        self.assertEqual(n_won,wins)
+
+#Run the tests
+unittest.main()
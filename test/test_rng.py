@@ -0,0 +1,82 @@
+import pickle
+import unittest
+from rorschach.code.rng import GameRNG
+from rorschach.code.simulate import load_card_library,simulate_game
+from rorschach.code.deck import Deck,build_deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+
+DECKLIST_1 = [("Ogre",4),("Soldier",4),("Fire Blast",2),("Regeneration Ritual",2)]
+DECKLIST_2 = [("Giant",2),("Archer",4),("Fortification",4)]
+
+def draws(rng,n=5):
+    return [rng.random() for i in range(n)]
+
+class TestGameRNG(unittest.TestCase):
+
+    def test_same_seed_same_numbers(self):
+        """Generators with the same seed and path draw the same numbers"""
+        self.assertEqual(draws(GameRNG(1)),draws(GameRNG(1)))
+        self.assertNotEqual(draws(GameRNG(1)),draws(GameRNG(2)))
+        self.assertEqual(draws(GameRNG(1).stream(3)),draws(GameRNG(1,path=(3,))))
+
+    def test_streams_ignore_parent_draws(self):
+        """A stream doesn't depend on how many numbers its parent has drawn"""
+        rng = GameRNG(7)
+        stream = draws(rng.stream(0))
+        draws(rng,100)
+        self.assertEqual(draws(rng.stream(0)),stream)
+        self.assertNotEqual(draws(rng.stream(1)),stream)
+
+    def test_split_hands_out_streams_in_order(self):
+        """split() returns stream(0), stream(1), ... and leaves the parent's numbers alone"""
+        rng = GameRNG(7)
+        parent = draws(GameRNG(7))
+        self.assertEqual(draws(rng.split()),draws(GameRNG(7).stream(0)))
+        self.assertEqual(draws(rng.split()),draws(GameRNG(7).stream(1)))
+        self.assertEqual(draws(rng),parent)
+
+    def test_jump(self):
+        """Jumping moves to a new sequence, and jump(2) is the same as two jumps"""
+        rng = GameRNG(7)
+        before = draws(rng)
+        self.assertNotEqual(draws(GameRNG(7).jump()),before)
+        self.assertEqual(draws(GameRNG(7).jump(2)),draws(GameRNG(7).jump().jump()))
+
+    def test_pickle_keeps_stream_and_position(self):
+        """A pickled generator carries on from where it was, in the same stream"""
+        rng = GameRNG(7).stream(2)
+        draws(rng)
+        copy = pickle.loads(pickle.dumps(rng))
+        self.assertEqual((copy.Seed,copy.Path),(7,(2,)))
+        self.assertEqual(draws(copy),draws(rng))
+        self.assertEqual(draws(copy.split()),draws(rng.split()))
+
+class TestReproducibleGames(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def test_same_seed_same_game(self):
+        """Games with the same seed play out the same way"""
+        for seed in range(10):
+            results = [simulate_game(DECKLIST_1,DECKLIST_2,self.CardLibrary,rng=GameRNG(seed))\
+              for i in range(2)]
+            self.assertEqual(results[0],results[1])
+
+    def test_clone_leaves_game_numbers_alone(self):
+        """Playing out a clone doesn't change the random numbers the game draws"""
+        games = []
+        for i in range(2):
+            player_1 = Player(name="Player 1",deck=Deck(build_deck(DECKLIST_1,self.CardLibrary)))
+            player_2 = Player(name="Player 2",deck=Deck(build_deck(DECKLIST_2,self.CardLibrary)))
+            games.append(Game(player_1,player_2,seed=11))
+        games[0].runGame(wait_for_input=False,max_turns=3)
+        games[1].runGame(wait_for_input=False,max_turns=3)
+        games[0].clone().runGame(wait_for_input=False,max_turns=10)
+        self.assertEqual(draws(games[0].RNG),draws(games[1].RNG))
+
+#Run the tests
+unittest.main()
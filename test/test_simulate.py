@@ -0,0 +1,61 @@
+import unittest
+import os
+import io
+import sys
+import subprocess
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from rorschach.code.simulate import simulate_games,load_card_library,GameResult
+
+class TestSimulate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def setUp(self):
+        """Write two small decklists to a temporary directory"""
+        self.TempDir = TemporaryDirectory()
+        self.Deck1Path = os.path.join(self.TempDir.name,"deck_1.tsv")
+        self.Deck2Path = os.path.join(self.TempDir.name,"deck_2.tsv")
+        with open(self.Deck1Path,"w") as f:
+            f.write("card_name\tcopies\nOgre\t4\nSoldier\t4\nFire Blast\t2\n")
+        with open(self.Deck2Path,"w") as f:
+            f.write("card_name\tcopies\nGiant\t2\nArcher\t4\nFortification\t4\n")
+
+    def tearDown(self):
+        self.TempDir.cleanup()
+
+    def test_simulate_games_returns_one_result_per_game(self):
+        """simulate_games returns a GameResult for each game"""
+        results = simulate_games(self.Deck1Path,self.Deck2Path,3,card_library=self.CardLibrary)
+        self.assertEqual(len(results),3)
+        for result in results:
+            self.assertTrue(isinstance(result,GameResult))
+            self.assertTrue(result.winner in ("Player 1","Player 2",None))
+            self.assertTrue(result.turns > 0)
+
+    def test_simulate_games_prints_nothing(self):
+        """simulate_games doesn't write to stdout"""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            simulate_games(self.Deck1Path,self.Deck2Path,1,card_library=self.CardLibrary)
+        self.assertEqual(output.getvalue(),"")
+
+    def test_simulate_games_respects_max_turns(self):
+        """simulate_games stops games at max_turns"""
+        results = simulate_games(self.Deck1Path,self.Deck2Path,2,card_library=self.CardLibrary,max_turns=1)
+        for result in results:
+            self.assertEqual(result.turns,1)
+            self.assertEqual(result.winner,None)
+
+    def test_simulation_imports_no_rendering_libraries(self):
+        """Importing the engine doesn't import pandas, rendering or scraping libraries"""
+        code = "import sys; import rorschach.code.simulate; "\
+          "print(','.join(m for m in ('pandas','matplotlib','PIL','selenium') if m in sys.modules))"
+        output = subprocess.run([sys.executable,"-c",code],capture_output=True,text=True,check=True)
+        self.assertEqual(output.stdout.strip(),"")
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from rorschach.code.simulate import load_card_library
+from rorschach.code.deck import Deck
+from rorschach.code.player import Player
+from rorschach.code.game import Game
+from rorschach.code.targets import TARGET_TYPES,register_target_type,compile_target_selectors
+
+class TestTargets(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def setUp(self):
+        """Two players with empty boards"""
+        self.Player1 = Player(name="Player 1",deck=Deck([]))
+        self.Player2 = Player(name="Player 2",deck=Deck([]))
+        self.Game = Game(self.Player1,self.Player2)
+
+    def card(self,name,controller):
+        return self.CardLibrary.getPrototype(name).makeCard(controller=controller)
+
+    def spell(self,name):
+        card = self.CardLibrary.makeCard(name)
+        card.setController(self.Player1)
+        return card
+
+    def test_has_legal_targets_matches_get_targets(self):
+        """hasLegalTargets agrees with getTargets, with and without enemy minions"""
+        fire_blast = self.spell("Fire Blast")
+        self.assertFalse(fire_blast.hasLegalTargets())
+        self.assertFalse(fire_blast.getTargets())
+        self.Player2.Board.append(self.card("Ogre",self.Player2))
+        self.assertTrue(fire_blast.hasLegalTargets())
+        self.assertTrue(fire_blast.getTargets())
+
+    def test_has_legal_targets_changes_nothing(self):
+        """hasLegalTargets doesn't choose or store targets"""
+        self.Player2.Board.append(self.card("Ogre",self.Player2))
+        fire_blast = self.spell("Fire Blast")
+        self.assertTrue(fire_blast.hasLegalTargets())
+        self.assertEqual(fire_blast.Effects[0].Targets,[])
+
+    def test_damaged_minion_targets(self):
+        """Heal effects need a damaged friendly creature"""
+        ritual = self.spell("Regeneration Ritual")
+        ogre = self.card("Ogre",self.Player1)
+        self.Player1.Board.append(ogre)
+        self.assertFalse(ritual.hasLegalTargets())
+        ogre.takeDamage(1)
+        self.assertTrue(ritual.hasLegalTargets())
+        self.assertTrue(ritual.getTargets())
+        ritual.activate()
+        self.assertFalse(ogre.isDamaged())
+
+    def test_unknown_target_types_fail_when_compiled(self):
+        """Unrecognized target types are caught when the effect is made"""
+        self.assertRaises(NotImplementedError,compile_target_selectors,{"nobody":1})
+
+    def test_register_target_type(self):
+        """New target types can be registered"""
+        register_target_type("test both players",\
+          lambda controller,n: [controller,controller.Opponent],lambda controller,n: True)
+        try:
+            (target_type,n_targets,select,has_targets), = compile_target_selectors({"test both players":1})
+            self.assertEqual(select(self.Player1,n_targets),[self.Player1,self.Player2])
+        finally:
+            del TARGET_TYPES["test both players"]
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from rorschach.code.tournament import wilson_interval,find_decks,run_tournament,TournamentResult
+
+class TestTournament(unittest.TestCase):
+
+    def test_wilson_interval_contains_observed_proportion(self):
+        """wilson_interval brackets the observed proportion"""
+        low,high = wilson_interval(30,100)
+        self.assertTrue(low < 0.30 < high)
+
+    def test_wilson_interval_narrows_with_more_trials(self):
+        """wilson_interval is narrower for larger samples"""
+        low_small,high_small = wilson_interval(5,10)
+        low_large,high_large = wilson_interval(500,1000)
+        self.assertTrue(high_large - low_large < high_small - low_small)
+
+    def test_wilson_interval_with_no_trials(self):
+        """wilson_interval is uninformative with no trials"""
+        self.assertEqual(wilson_interval(0,0),(0.0,1.0))
+
+    def test_TournamentResult_counts_ties_as_half_wins(self):
+        """TournamentResult.winRate counts ties as half a win"""
+        result = TournamentResult(["a","b"])
+        result.addResults(0,1,wins_i=2,wins_j=1,ties=1)
+        self.assertEqual(result.winRate(0,1),0.625)
+        self.assertEqual(result.winRate(1,0),0.375)
+        self.assertEqual(result.games(0,1),4)
+
+    def test_run_tournament_plays_every_matchup(self):
+        """run_tournament fills in every off-diagonal matchup"""
+        deck_paths = find_decks("../data/decks/")[:3]
+        result = run_tournament(deck_paths,games_per_matchup=4,max_workers=1,chunk_size=2)
+        matrix = result.winRateMatrix()
+        for i in range(len(deck_paths)):
+            for j in range(len(deck_paths)):
+                if i == j:
+                    self.assertEqual(matrix[i][j],None)
+                else:
+                    self.assertEqual(result.games(i,j),4)
+                    self.assertAlmostEqual(matrix[i][j] + matrix[j][i],1.0)
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,33 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from rorschach.code.tsv import read_tsv,write_tsv
+
+class TestTsv(unittest.TestCase):
+
+    def setUp(self):
+        self.TempDir = TemporaryDirectory()
+        self.Filepath = os.path.join(self.TempDir.name,"data.tsv")
+
+    def tearDown(self):
+        self.TempDir.cleanup()
+
+    def test_read_tsv(self):
+        """Quoted fields are unquoted, numbers parsed, and empty fields and rows dropped"""
+        with open(self.Filepath,"w") as f:
+            f.write('card_name\ttypes\tmana_cost\teffects\n'\
+              'Soldier\t"Human,Warrior"\t2\t\n'\
+              '\t\t\t\n'\
+              'Fire Blast\t\t1.5\t"{""Damage opponent {X}"":{""magnitude"":2}}"\n')
+        self.assertEqual(read_tsv(self.Filepath),[\
+          {"card_name":"Soldier","types":"Human,Warrior","mana_cost":2},\
+          {"card_name":"Fire Blast","mana_cost":1.5,"effects":'{"Damage opponent {X}":{"magnitude":2}}'}])
+
+    def test_write_then_read(self):
+        """Rows written with write_tsv read back the same"""
+        write_tsv(self.Filepath,["card_name","copies"],[["Ogre",2],["Kyberian Eagle-Riders ",3]])
+        self.assertEqual(read_tsv(self.Filepath),\
+          [{"card_name":"Ogre","copies":2},{"card_name":"Kyberian Eagle-Riders ","copies":3}])
+
+#Run the tests
+unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from rorschach.code.simulate import load_card_library
+from rorschach.code.vector_sim import BatchState,make_card_table,deck_card_ids,play_phase,\
+  remove_dead,simulate_batch,cross_check
+
+DECKLIST_1 = [("Ogre",3),("Soldier",3),("Archer",3),("Peasant",2),("Kyberian Eagle-Riders",2),("Giant",2)]
+DECKLIST_2 = [("Goblin Warrior",4),("Fortification",2),("Flock of Vampiric Ravens",3),\
+  ("Goblin Musketeers",3),("Ogre Bloodwitch",2)]
+
+class TestVectorSim(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the card library once for all tests"""
+        cls.CardLibrary = load_card_library()
+
+    def state(self,decklist,n_games=1):
+        cards = make_card_table([decklist],self.CardLibrary)
+        deck_ids = deck_card_ids(decklist,cards)
+        return BatchState(deck_ids,deck_ids,n_games,np.random.default_rng(0)),cards
+
+    def test_batch_result(self):
+        """Every game finishes with a winner consistent with the final health"""
+        result = simulate_batch(DECKLIST_1,DECKLIST_2,self.CardLibrary,500,seed=1)
+        self.assertEqual(len(result.winner),500)
+        self.assertTrue((result.turns > 0).all())
+        self.assertTrue((result.player_2_health[result.winner == 0] <= 0).all())
+        self.assertTrue((result.player_1_health[result.winner == 1] <= 0).all())
+
+    def test_same_seed_same_games(self):
+        """A seed makes a batch reproducible"""
+        result_1 = simulate_batch(DECKLIST_1,DECKLIST_2,self.CardLibrary,200,seed=7)
+        result_2 = simulate_batch(DECKLIST_1,DECKLIST_2,self.CardLibrary,200,seed=7)
+        self.assertTrue((result_1.winner == result_2.winner).all())
+        self.assertTrue((result_1.turns == result_2.turns).all())
+
+    def test_only_vanilla_creatures(self):
+        """Decks with spells or creature effects are rejected"""
+        self.assertRaises(ValueError,make_card_table,[[("Ogre",2),("Fire Blast",2)]],self.CardLibrary)
+
+    def test_greedy_play_matches_highest_cost_playable_card(self):
+        """play_phase keeps highestCostPlayableCard's choices, including its 0-cost quirk"""
+        state,cards = self.state([("Peasant",1),("Soldier",1),("Ogre",1),("Giant",1)])
+        hand = [cards.Ids[name] for name in ("Soldier","Peasant","Giant","Ogre")]
+        state.Hands[0][:4,0] = hand
+        state.HandSizes[0][0] = 4
+        play_phase(state,0,4,cards)
+        played = [cards.Names[i] for i in state.BoardIds[0][:state.BoardSizes[0][0],0]]
+        costs = {name:self.CardLibrary.getPrototype(name).Cost for name in played}
+        #Highest cost first, spending no more than the 4 mana available
+        self.assertEqual(sorted(played,key=costs.get,reverse=True),played)
+        self.assertLessEqual(sum(costs.values()),4)
+        self.assertEqual(state.HandSizes[0][0],4 - len(played))
+
+    def test_remove_dead_keeps_board_order(self):
+        """Dead creatures leave the board and survivors close up in order"""
+        state,cards = self.state([("Ogre",1),("Soldier",1),("Archer",1)])
+        ids = [cards.Ids[name] for name in ("Ogre","Soldier","Archer")]
+        state.BoardIds[0][:3,0] = ids
+        state.BoardHealth[0][:3,0] = [3,0,1]
+        state.BoardSizes[0][0] = 3
+        remove_dead(state,0)
+        self.assertEqual(state.BoardSizes[0][0],2)
+        self.assertEqual(list(state.BoardIds[0][:3,0]),[ids[0],ids[2],-1])
+        self.assertEqual(list(state.BoardHealth[0][:3,0]),[3,1,0])
+
+    def test_cross_check_agrees_with_object_engine(self):
+        """Outcome rates and mean game length agree with simulate_game"""
+        rows = cross_check(DECKLIST_1,DECKLIST_2,self.CardLibrary,n_object_games=400,\
+          n_vector_games=20000,seed=3)
+        for label,object_rate,interval,vector_rate,agrees in rows:
+            self.assertTrue(agrees,f"{label}: object {object_rate} {interval}, vectorized {vector_rate}")
+
+#Run the tests
+unittest.main()
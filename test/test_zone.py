@@ -0,0 +1,61 @@
+import unittest
+from rorschach.code.zone import Zone
+
+class Card(object):
+    """Cards hash by identity, like the game's Card objects"""
+    def __init__(self,name):
+        self.Name = name
+    def __repr__(self):
+        return self.Name
+
+class TestZone(unittest.TestCase):
+
+    def setUp(self):
+        self.Cards = [Card(name) for name in ("a","b","c","d")]
+        self.Zone = Zone(self.Cards)
+
+    def test_behaves_like_a_list(self):
+        """Iteration, len, indexing and slices follow the order cards entered"""
+        a,b,c,d = self.Cards
+        self.assertEqual(list(self.Zone),[a,b,c,d])
+        self.assertEqual(len(self.Zone),4)
+        self.assertIs(self.Zone[0],a)
+        self.assertIs(self.Zone[2],c)
+        self.assertIs(self.Zone[-1],d)
+        self.assertEqual(self.Zone[1:3],[b,c])
+        self.assertRaises(IndexError,lambda: self.Zone[4])
+        self.assertFalse(Zone())
+
+    def test_remove_keeps_order(self):
+        """Removing cards leaves the rest in order"""
+        a,b,c,d = self.Cards
+        self.assertIs(self.Zone.remove(b),b)
+        self.assertIs(self.Zone.pop(),d)
+        self.assertFalse(b in self.Zone)
+        self.assertEqual(list(self.Zone),[a,c])
+        self.assertRaises(ValueError,self.Zone.remove,b)
+        self.assertIsNone(self.Zone.discard(b))
+        self.assertRaises(ValueError,self.Zone.append,a)
+
+    def test_handles_are_stable(self):
+        """A card's handle doesn't change as other cards come and go, and isn't reused"""
+        a,b,c,d = self.Cards
+        handle = self.Zone.handle(c)
+        self.Zone.remove(a)
+        e = Card("e")
+        new_handle = self.Zone.append(e)
+        self.assertEqual(self.Zone.handle(c),handle)
+        self.assertIs(self.Zone.get(handle),c)
+        self.assertNotIn(new_handle,[self.Zone.handle(card) for card in (b,c,d)])
+        self.assertIsNone(self.Zone.get(self.Zone.handle(b)-1))
+
+    def test_slice_assignment(self):
+        """zone[:] = cards replaces the contents (as Player.setState does)"""
+        a,b,c,d = self.Cards
+        self.Zone[:] = (d,a)
+        self.assertEqual(list(self.Zone),[d,a])
+        self.assertTrue(d in self.Zone)
+        self.assertFalse(b in self.Zone)
+
+#Run the tests
+unittest.main()